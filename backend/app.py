@@ -1,11 +1,30 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-import pandas as pd
+import click
 import numpy as np
+import math
 import os
 from datetime import datetime, timedelta
-import joblib
+
+from models import db, EnergyReading
+from database import database_url, engine_config, configure_engines, get_writer_engine
+from ingest import bulk_load_csv, incremental_load_csv
+from schema import create_schema
+import rollups
+from query_plans import check_query_plans
+import historical
+import export
+import forecasting
+import cost_engine
+import load_shifting
+import batch_forecast
+import model_registry
+import training
+import feature_store
+from forecast_cache import ForecastCache
+from latest_window import LatestWindow
+from live_events import EventBroadcaster
+import stream_ingest
 
 # Import optimization module
 from optimization_rules import (
@@ -17,124 +36,181 @@ from optimization_rules import (
 app = Flask(__name__)
 CORS(app)
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///refit_energy_data.db'
+# Database configuration: read-only pool for queries, one writer connection
+# for ingest (see database.py). SQLite unless DATABASE_URL is set.
+app.config.update(engine_config(database_url()))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+db.init_app(app)
+with app.app_context():
+    configure_engines()
 
-# Global variable for the prediction model
-predictor_model = None
+# Parse the ontology (rules and tariff schedule) at startup, so the first
+# request or ingest does not, whichever way the app is started
+print("Loading RDF ontology for optimization engine...")
+load_ontology_graph()
 
-# Database Model
-class EnergyReading(db.Model):
-    __tablename__ = 'energy_readings'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, nullable=False, index=True)
-    household_id = db.Column(db.Integer, nullable=False, index=True)
-    energy_kwh = db.Column(db.Float, nullable=False)
-    future_energy_kwh = db.Column(db.Float, nullable=True)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'timestamp': self.timestamp.isoformat(),
-            'household_id': self.household_id,
-            'energy_kwh': self.energy_kwh,
-            'future_energy_kwh': self.future_energy_kwh
-        }
+# Prediction models: the default model plus optional per-household and
+# per-cluster models under models/, loaded on first use (see model_registry.py)
+MODEL_PATH = 'energy_predictor_model.joblib'
+predictor_models = model_registry.ModelRegistry(MODEL_PATH)
+
+# Forecasts keyed by (household, start hour, model generation)
+forecast_cache = ForecastCache()
+
+# Most recent readings per household, kept current by ingestion
+latest_window = LatestWindow()
+
+# Server-Sent Events fan-out to connected dashboards
+live_events = EventBroadcaster()
+
+# Newest readings included in one 'readings' event
+MAX_EVENT_READINGS = 500
+
+# Background micro-batch writer for streamed readings (started on first use)
+ingest_writer = None
 
 # Initialize database
 def init_db():
     """Create database file and all tables."""
     with app.app_context():
-        db.create_all()
+        create_schema(get_writer_engine())
         print("Database initialized successfully!")
 
 # Load the prediction model
 def load_predictor_model():
-    """Load the trained prediction model from disk."""
-    global predictor_model
-    model_path = 'energy_predictor_model.joblib'
+    """Load the default prediction model and report per-household models."""
+    model_path = MODEL_PATH
     
     if os.path.exists(model_path):
         try:
-            predictor_model = joblib.load(model_path)
+            predictor_models.get()
+            stats = predictor_models.stats()
             print(f"Prediction model loaded successfully from {model_path}")
+            print(f"Household models: {stats['packed_households']} packed, "
+                  f"{stats['household_models']} files, {stats['cluster_models']} clusters")
             return True
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
     else:
         print(f"Warning: Model file '{model_path}' not found. Prediction endpoint will not work.")
-        print("Please run the model_training.ipynb notebook to generate the model.")
+        print("Please run 'flask --app app train-model' to generate the model.")
         return False
 
+def refresh_predictor_model():
+    """
+    Pick up added or replaced model files and return the default model
+    (None if it is missing). Cached forecasts need no flush: the registry
+    generation is part of their key.
+    """
+    predictor_models.refresh()
+    return predictor_models.get()
+
+def get_latest_window():
+    """The in-memory latest-readings window, loaded from the database on first use."""
+    if not latest_window.loaded:
+        latest_window.load(db.session)
+    return latest_window
+
+def on_readings_ingested(readings):
+    """
+    Push newly committed readings to the in-memory views and drop cached
+    results for the households they belong to.
+    
+    Args:
+        readings (DataFrame): Appended readings in ingest.prepare_chunk() layout
+    """
+    if not len(readings):
+        return
+    latest_window.append(readings)
+    forecast_cache.invalidate_households(int(h) for h in readings['household_id'].unique())
+    try:
+        publish_live_updates(readings)
+    except Exception as e:
+        # The readings are committed; a failed push must not fail the ingest
+        print(f"Error publishing live updates: {e}")
+
+def get_ingest_writer():
+    """Start the streaming ingest writer on first use and return it."""
+    global ingest_writer
+    if ingest_writer is None:
+        def on_flush(readings):
+            with app.app_context():
+                on_readings_ingested(readings)
+        
+        ingest_writer = stream_ingest.MicroBatchWriter(get_writer_engine(), on_flush=on_flush)
+        ingest_writer.start()
+    return ingest_writer
+
+def publish_live_updates(readings):
+    """
+    Compute the live dashboard updates for a batch of new readings once and
+    fan them out to every SSE subscriber. Suggestions are only sent when
+    they changed.
+    """
+    if live_events.subscriber_count == 0:
+        return
+    
+    newest = readings.sort_values('timestamp').tail(MAX_EVENT_READINGS)
+    live_events.publish('readings', {
+        'count': len(readings),
+        'readings': [
+            {'household_id': household_id, 'timestamp': timestamp.isoformat(), 'energy_kwh': energy_kwh}
+            for household_id, timestamp, energy_kwh in zip(
+                newest['household_id'].tolist(),
+                newest['timestamp'].to_numpy().astype('datetime64[us]').tolist(),
+                newest['energy_kwh'].tolist()
+            )
+        ]
+    })
+    
+    current = current_consumption_payload()
+    current['households'] = [
+        {'household_id': household_id, 'current': round(energy_kwh * 12, 2), 'timestamp': timestamp.isoformat()}
+        for household_id, energy_kwh, timestamp in latest_window.latest_per_household()
+    ]
+    live_events.publish('current', current)
+    
+    live_events.publish('suggestions', build_frontend_suggestions(), only_if_changed=True)
+
 # Generate 24-hour forecast
-def generate_24hr_forecast(model):
+def generate_24hr_forecast(household_id=None):
     """
     Generate 24-hour energy consumption forecast.
     Returns list of predictions with timestamps and predicted energy values.
-    Note: This is a simplified forecast. For production, you'd need recent consumption data
-    to properly calculate lagged features and rolling statistics.
+    
+    Lag and rolling features are seeded from each household's latest readings
+    and rolled forward recursively (see forecasting.py), with each household's
+    own model from the registry. Without a household_id
+    the forecast is the average over all households. Forecasts stored by the
+    batch job (flask forecast-households) are served when they cover the
+    next 24 hours and come from the current model generation.
     """
-    if model is None:
+    if predictor_models.get() is None:
         return None
     
     # Start from current hour
     now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    generation = predictor_models.generation
     
-    forecasts = []
+    cache_key = ForecastCache.make_key(household_id, now, generation)
+    forecast = forecast_cache.get(cache_key)
+    if forecast is not None:
+        return forecast
     
-    # For demo purposes, we'll use average consumption for lagged features
-    # In production, fetch recent actual data from database
-    avg_consumption = 0.2  # Average kWh from training data
-    
-    for hour_offset in range(24):
-        # Generate timestamp for each hour
-        forecast_time = now + timedelta(hours=hour_offset)
-        
-        # Time category helper
-        hour = forecast_time.hour
-        if 0 <= hour < 6:
-            time_cat = 0  # Night
-        elif 6 <= hour < 12:
-            time_cat = 1  # Morning
-        elif 12 <= hour < 18:
-            time_cat = 2  # Afternoon
-        else:
-            time_cat = 3  # Evening
-        
-        # Extract features (same as training - 10 features)
-        # Note: Using avg_consumption for lagged values (simplified)
-        feature_array = np.array([[
-            forecast_time.hour,  # hour_of_day
-            forecast_time.weekday(),  # day_of_week
-            1 if forecast_time.weekday() >= 5 else 0,  # is_weekend
-            time_cat,  # time_category
-            avg_consumption,  # lag_1 (simplified)
-            avg_consumption,  # lag_2 (simplified)
-            avg_consumption,  # lag_3 (simplified)
-            avg_consumption,  # rolling_mean_3 (simplified)
-            avg_consumption,  # rolling_mean_6 (simplified)
-            0.02  # rolling_std_3 (simplified)
-        ]])
-        
-        # Make prediction
-        predicted_energy = model.predict(feature_array)[0]
-        
-        # Ensure prediction is non-negative
-        predicted_energy = max(0, predicted_energy)
-        
-        forecasts.append({
-            'timestamp': forecast_time.isoformat(),
-            'predicted_kwh': round(predicted_energy, 4),
-            'hour': forecast_time.hour,
-            'day_of_week': forecast_time.strftime('%A'),
-            'time_category': ['Night', 'Morning', 'Afternoon', 'Evening'][time_cat]
-        })
+    hourly_kwh = batch_forecast.stored_forecast(
+        db.session, now, hours=24, household_id=household_id, model_version=generation
+    )
+    if hourly_kwh is None:
+        household_ids = [household_id] if household_id is not None else None
+        _, predictions = model_registry.forecast_readings(
+            db.session, predictor_models, now, 24 * forecasting.STEPS_PER_HOUR, household_ids=household_ids
+        )
+        hourly_kwh = forecasting.hourly_means(predictions).mean(axis=0)
     
-    return forecasts
+    forecast = forecasting.format_forecast(now, hourly_kwh)
+    forecast_cache.put(cache_key, forecast)
+    return forecast
 
 # Data loading utility for energy dataset
 def load_energy_data(file_path, limit_rows=None):
@@ -142,62 +218,112 @@ def load_energy_data(file_path, limit_rows=None):
     Load energy consumption CSV data into the database.
     Format: timestamp, household_id, energy_consumption_kWh, future_consumption_kWh
     
+    Replaces any existing readings. The CSV is streamed in chunks and written
+    with bulk inserts (see ingest.bulk_load_csv).
+    
     Args:
         file_path: Path to energy CSV file
         limit_rows: Maximum rows to load (None for all)
     """
-    if not os.path.exists(file_path):
-        print(f"Error: File {file_path} not found!")
-        return 0
-    
-    print(f"Loading data from {file_path}...")
-    if limit_rows:
-        print(f"Limiting to first {limit_rows} rows for faster loading...")
-    
-    # Read CSV data
-    df = pd.read_csv(file_path, nrows=limit_rows)
-    
-    # Process timestamp column
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Handle NaN/Missing values
-    df = df.dropna(subset=['energy_consumption_kWh'])
-    
-    print(f"Loaded data: {len(df)} records")
-    print(f"Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
-    print(f"Unique households: {df['household_id'].nunique()}")
+    with app.app_context():
+        stats = bulk_load_csv(get_writer_engine(), file_path, limit_rows=limit_rows)
+        latest_window.load(db.session)
     
-    # Load data into database in batches for efficiency
-    rows_loaded = 0
-    batch_size = 1000
+    forecast_cache.clear()
+    return stats['rows']
+
+def ingest_new_energy_data(file_path):
+    """
+    Append readings from an energy CSV that are newer than what is stored.
+    Cost scales with the new tail of the file, not the full history
+    (see ingest.incremental_load_csv).
     
+    Args:
+        file_path: Path to energy CSV file
+    """
     with app.app_context():
-        # Clear existing data first
-        EnergyReading.query.delete()
-        db.session.commit()
-        print("Cleared existing data from database")
-        
-        # Load in batches
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
-            for _, row in batch.iterrows():
-                reading = EnergyReading(
-                    timestamp=row['timestamp'],
-                    household_id=int(row['household_id']),
-                    energy_kwh=row['energy_consumption_kWh'],
-                    future_energy_kwh=row.get('future_consumption_kWh', None)
-                )
-                db.session.add(reading)
-                rows_loaded += 1
-            
-            db.session.commit()
-            if (i + batch_size) % 5000 == 0:
-                print(f"  Loaded {rows_loaded} rows...")
-        
-        db.session.commit()
+        get_latest_window()
+        stats = incremental_load_csv(get_writer_engine(), file_path, on_readings=on_readings_ingested)
     
-    print(f"Successfully loaded {rows_loaded} readings!")
-    return rows_loaded
+    return stats['rows']
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the hourly/daily/weekly rollup tables from raw readings."""
+    rollups.rebuild_all(get_writer_engine())
+
+@app.cli.command('rebuild-features')
+def rebuild_features_command():
+    """Recompute the feature store from raw readings."""
+    with get_writer_engine().begin() as conn:
+        feature_store.rebuild_feature_store(conn)
+    print("Feature store rebuilt")
+
+@app.cli.command('check-feature-parity')
+@click.option('--household-id', 'household_ids', type=int, multiple=True,
+              help='Household to check (repeatable; default: the first 100 in the store)')
+@click.option('--tolerance', type=float, default=feature_store.PARITY_TOLERANCE, show_default=True)
+def check_feature_parity_command(household_ids, tolerance):
+    """Fail if stored features differ from the notebook's pandas features."""
+    result = feature_store.check_parity(db.session, household_ids or None, tolerance=tolerance)
+    print(f"Checked {result['checked']} households "
+          f"({result['skipped']} skipped with fewer than 4 readings)")
+    for column, difference in result['max_difference'].items():
+        print(f"  {column}: max difference {difference:.3g}")
+    for mismatch in result['mismatches']:
+        print(f"MISMATCH household {mismatch['household_id']} {mismatch['column']}: "
+              f"stored {mismatch['stored']}, expected {mismatch['expected']}")
+    if result['mismatches']:
+        raise SystemExit(1)
+
+@app.cli.command('forecast-households')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+@click.option('--hours', type=int, default=batch_forecast.DEFAULT_HOURS)
+def forecast_households_command(workers, hours):
+    """Forecast every household in a process pool and store the results."""
+    if not os.path.exists(MODEL_PATH):
+        raise click.ClickException(f"Model file '{MODEL_PATH}' not found")
+    batch_forecast.run_batch_forecast(get_writer_engine(), MODEL_PATH, workers=workers, hours=hours)
+
+@app.cli.command('train-model')
+@click.option('--full', is_flag=True, help='Ignore the saved training state and read every reading')
+@click.option('--chunk-size', type=int, default=training.DEFAULT_CHUNK_ROWS, show_default=True)
+def train_model_command(full, chunk_size):
+    """Fit the prediction model from the readings table, incrementally by default."""
+    try:
+        training.train_model(db.engine, MODEL_PATH, full=full, chunk_rows=chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@app.cli.command('pack-models')
+@click.option('--models-dir', default=model_registry.MODELS_DIR, show_default=True)
+def pack_models_command(models_dir):
+    """Pack per-household linear models into one coefficient matrix."""
+    if not os.path.isdir(models_dir):
+        raise click.ClickException(f"Models directory '{models_dir}' not found")
+    model_registry.pack_household_models(models_dir)
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any endpoint query full-scans the readings or rollup tables or sorts in a temp B-tree."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('check-query-plans reads SQLite query plans; use EXPLAIN on PostgreSQL')
+    if check_query_plans(app, db.engine):
+        raise SystemExit(1)
+
+@app.cli.command('export-readings')
+@click.argument('path')
+@click.option('--format', 'file_format', type=click.Choice(['arrow', 'parquet']), default='arrow',
+              help='arrow writes a memory-mappable Arrow IPC file')
+@click.option('--household-id', type=int, default=None)
+def export_readings_command(path, file_format, household_id):
+    """Export readings to an Arrow IPC or Parquet file."""
+    if not export.is_available():
+        raise click.ClickException('pyarrow is required for columnar export')
+    
+    query = historical.build_historical_query(household_id, columns=export.EXPORT_COLUMNS)
+    rows_written = export.export_to_file(query, db.engine, path, file_format)
+    print(f"Exported {rows_written} readings to {path}")
 
 # API Routes
 @app.route('/')
@@ -206,34 +332,41 @@ def hello():
 
 # ============ Frontend-Compatible API Endpoints ============
 
+def current_consumption_payload(household_id=None):
+    """Latest reading as {'current': kW, 'unit', 'timestamp'}, from the in-memory ring buffers."""
+    latest_reading = get_latest_window().latest(household_id)
+    
+    if not latest_reading:
+        return {
+            'current': 0,
+            'unit': 'kW',
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    # Convert kWh to kW (assuming 5-minute intervals)
+    # kWh per 5 min = (kWh * 12) to get hourly rate in kW
+    _, energy_kwh, timestamp = latest_reading
+    current_kw = energy_kwh * 12
+    
+    return {
+        'current': round(current_kw, 2),
+        'unit': 'kW',
+        'timestamp': timestamp.isoformat()
+    }
+
 @app.route('/api/energy/current', methods=['GET'])
 def get_current_consumption():
     """
     Get current energy consumption (latest reading).
     Frontend-compatible endpoint.
+    
+    Query Parameters:
+    - household_id (optional): Latest reading of one household instead of overall
     """
+    household_id = request.args.get('household_id', type=int)
+    
     try:
-        # Get the most recent reading
-        latest_reading = EnergyReading.query.order_by(
-            EnergyReading.timestamp.desc()
-        ).first()
-        
-        if not latest_reading:
-            return jsonify({
-                'current': 0,
-                'unit': 'kW',
-                'timestamp': datetime.now().isoformat()
-            })
-        
-        # Convert kWh to kW (assuming 5-minute intervals)
-        # kWh per 5 min = (kWh * 12) to get hourly rate in kW
-        current_kw = latest_reading.energy_kwh * 12
-        
-        return jsonify({
-            'current': round(current_kw, 2),
-            'unit': 'kW',
-            'timestamp': latest_reading.timestamp.isoformat()
-        })
+        return jsonify(current_consumption_payload(household_id))
     
     except Exception as e:
         return jsonify({
@@ -258,27 +391,32 @@ def get_energy_usage_range():
     now = datetime.now()
     if time_range == '24h':
         cutoff = now - timedelta(hours=24)
-        interval_minutes = 60  # Hourly aggregation
     elif time_range == '7d':
         cutoff = now - timedelta(days=7)
-        interval_minutes = 1440  # Daily aggregation
     elif time_range == '30d':
         cutoff = now - timedelta(days=30)
-        interval_minutes = 10080  # Weekly aggregation
     else:
         cutoff = now - timedelta(hours=24)
-        interval_minutes = 60
+    
+    # Bucket layout: hourly for 24h, daily for 7d, weekly otherwise
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if time_range == '24h':
+        window_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+        bucket_seconds, bucket_count = 3600, 24
+    elif time_range == '7d':
+        window_start = today_start - timedelta(days=6)
+        bucket_seconds, bucket_count = 86400, 7
+    else:
+        window_start = today_start - timedelta(days=28)
+        bucket_seconds, bucket_count = 7 * 86400, 4
     
     try:
-        # Query readings
-        query = EnergyReading.query.filter(EnergyReading.timestamp >= cutoff)
-        
-        if household_id:
-            query = query.filter(EnergyReading.household_id == household_id)
+        # Read per-bucket totals from the rollup tables
+        found, totals, counts, costs = rollups.usage_by_bucket(
+            db.session, cutoff, window_start, bucket_seconds, bucket_count, household_id
+        )
         
-        readings = query.order_by(EnergyReading.timestamp).all()
-        
-        if not readings:
+        if not found:
             return jsonify([])
         
         # Aggregate data based on time range
@@ -286,14 +424,9 @@ def get_energy_usage_range():
             # Hourly data
             aggregated = []
             for i in range(24):
-                hour_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23-i)
-                hour_end = hour_start + timedelta(hours=1)
-                
-                hour_readings = [r for r in readings if hour_start <= r.timestamp < hour_end]
-                
-                if hour_readings:
-                    avg_consumption = sum(r.energy_kwh for r in hour_readings) / len(hour_readings)
-                    cost = avg_consumption * 0.12  # $0.12 per kWh
+                if counts[i]:
+                    avg_consumption = totals[i] / counts[i]
+                    cost = costs[i] / counts[i]  # Time-of-use cost per reading
                 else:
                     avg_consumption = 0
                     cost = 0
@@ -312,14 +445,11 @@ def get_energy_usage_range():
             aggregated = []
             
             for i in range(7):
-                day_start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=6-i)
-                day_end = day_start + timedelta(days=1)
-                
-                day_readings = [r for r in readings if day_start <= r.timestamp < day_end]
+                day_start = window_start + timedelta(days=i)
                 
-                if day_readings:
-                    total_consumption = sum(r.energy_kwh for r in day_readings)
-                    cost = total_consumption * 0.12
+                if counts[i]:
+                    total_consumption = totals[i]
+                    cost = costs[i]
                 else:
                     total_consumption = 0
                     cost = 0
@@ -336,14 +466,9 @@ def get_energy_usage_range():
         else:  # 30d - weekly aggregation
             aggregated = []
             for week in range(4):
-                week_start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=28-week*7)
-                week_end = week_start + timedelta(days=7)
-                
-                week_readings = [r for r in readings if week_start <= r.timestamp < week_end]
-                
-                if week_readings:
-                    total_consumption = sum(r.energy_kwh for r in week_readings)
-                    cost = total_consumption * 0.12
+                if counts[week]:
+                    total_consumption = totals[week]
+                    cost = costs[week]
                 else:
                     total_consumption = 0
                     cost = 0
@@ -369,23 +494,16 @@ def get_appliances():
     Frontend-compatible endpoint.
     """
     try:
-        # Get distinct households with their latest readings
-        households = db.session.query(
-            EnergyReading.household_id
-        ).distinct().all()
+        # Latest reading of every household, from the in-memory window
+        latest_readings = get_latest_window().latest_per_household()
         
         appliances = []
         appliance_types = ['heating_cooling', 'appliance', 'appliance', 'appliance', 'electronics']
         appliance_names = ['HVAC', 'Refrigerator', 'Washer', 'Water Heater', 'Electronics']
         
-        for idx, (household_id,) in enumerate(households):
-            # Get latest reading for this household
-            latest = EnergyReading.query.filter(
-                EnergyReading.household_id == household_id
-            ).order_by(EnergyReading.timestamp.desc()).first()
-            
+        for idx, (household_id, energy_kwh, _) in enumerate(latest_readings):
             # Convert kWh to W (5-min reading * 12 * 1000)
-            power_rating = int(latest.energy_kwh * 12 * 1000) if latest else 0
+            power_rating = int(energy_kwh * 12 * 1000)
             status = 'active' if power_rating > 100 else 'idle'
             
             appliances.append({
@@ -420,16 +538,21 @@ def get_appliance_usage(appliance_id):
         else:
             cutoff = now - timedelta(hours=24)
         
-        readings = EnergyReading.query.filter(
+        # Only the columns of the covering (household_id, timestamp, energy_kwh) index
+        readings = db.session.query(EnergyReading.timestamp, EnergyReading.energy_kwh).filter(
             EnergyReading.household_id == appliance_id,
             EnergyReading.timestamp >= cutoff
         ).order_by(EnergyReading.timestamp).all()
         
+        reading_costs = cost_engine.price_readings(
+            [r.timestamp for r in readings], [r.energy_kwh for r in readings]
+        ).tolist()
+        
         usage_data = [{
             'timestamp': r.timestamp.isoformat(),
             'consumption': round(r.energy_kwh, 3),
-            'cost': round(r.energy_kwh * 0.12, 2)
-        } for r in readings]
+            'cost': round(cost, 2)
+        } for r, cost in zip(readings, reading_costs)]
         
         return jsonify(usage_data)
     
@@ -449,15 +572,8 @@ def get_appliance_breakdown():
         # Get last 24 hours of data
         cutoff = datetime.now() - timedelta(hours=24)
         
-        # Group by household and sum consumption
-        household_totals = db.session.query(
-            EnergyReading.household_id,
-            db.func.sum(EnergyReading.energy_kwh).label('total_kwh')
-        ).filter(
-            EnergyReading.timestamp >= cutoff
-        ).group_by(
-            EnergyReading.household_id
-        ).all()
+        # Sum consumption per household (hourly rollups + partial first hour)
+        household_totals = rollups.household_totals_since(db.session, cutoff)
         
         # Calculate total for percentages
         grand_total = sum(total for _, total in household_totals)
@@ -490,17 +606,22 @@ def get_predictions_frontend():
     """
     Get energy predictions in frontend-compatible format.
     Frontend-compatible endpoint.
+    
+    Query Parameters:
+    - hours (optional): Number of hours returned (default: 24)
+    - household_id (optional): Forecast a single household instead of the average
     """
     hours = request.args.get('hours', default=24, type=int)
+    household_id = request.args.get('household_id', type=int)
     
-    if predictor_model is None:
+    if refresh_predictor_model() is None:
         return jsonify({
             'error': 'Prediction model not loaded',
-            'message': 'Please run model_training.ipynb to generate the model file'
+            'message': 'Please run flask --app app train-model to generate the model file'
         }), 503
     
     try:
-        forecast = generate_24hr_forecast(predictor_model)
+        forecast = generate_24hr_forecast(household_id)
         
         if forecast is None:
             return jsonify({
@@ -517,16 +638,11 @@ def get_predictions_frontend():
             })
         
         # Calculate summary
-        total_predicted_kwh = sum(p['predicted_kwh'] for p in forecast)
-        predicted_cost = total_predicted_kwh * 0.12
+        predicted_cost = cost_engine.price_forecast(forecast)
         
         # Get actual cost today
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_readings = EnergyReading.query.filter(
-            EnergyReading.timestamp >= today_start
-        ).all()
-        actual_kwh_today = sum(r.energy_kwh for r in today_readings)
-        actual_cost_today = actual_kwh_today * 0.12
+        actual_cost_today = rollups.total_cost_for_day(db.session, today_start)
         
         return jsonify({
             'next24Hours': next24Hours,
@@ -552,58 +668,106 @@ def get_historical_usage():
     - household_id: Filter by specific household (e.g., 1, 2, 3)
     - start_date: Filter by start date (ISO format: YYYY-MM-DD)
     - end_date: Filter by end date (ISO format: YYYY-MM-DD)
+    - limit: Page size; enables cursor pagination (max 10000)
+    - cursor: `next_cursor` from the previous page
+    - format: 'ndjson' to stream one reading per line, 'arrow' (IPC stream)
+      or 'parquet' for columnar output; also negotiable via the Accept header
+    
+    Without limit/cursor the full result is streamed as {"data": [...], "count": N},
+    so memory use does not grow with the size of the history. Columnar formats
+    always stream the whole filtered range.
     """
     # Get query parameters
     household_id = request.args.get('household_id')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    output_format = export.negotiate_format(
+        request.headers.get('Accept'), request.args.get('format')
+    )
     
-    # Build query
-    query = EnergyReading.query
-    
-    # Apply filters
-    if household_id:
-        query = query.filter(EnergyReading.household_id == int(household_id))
+    start_dt = end_dt = None
     
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
-            query = query.filter(EnergyReading.timestamp >= start_dt)
         except ValueError:
             return jsonify({'error': 'Invalid start_date format. Use YYYY-MM-DD'}), 400
     
     if end_date:
         try:
             end_dt = datetime.fromisoformat(end_date)
-            query = query.filter(EnergyReading.timestamp <= end_dt)
         except ValueError:
             return jsonify({'error': 'Invalid end_date format. Use YYYY-MM-DD'}), 400
     
-    # Order by timestamp and execute query
-    readings = query.order_by(EnergyReading.timestamp).all()
+    household_filter = int(household_id) if household_id else None
     
-    # Convert to JSON
-    result = [reading.to_dict() for reading in readings]
+    # Columnar export
+    if output_format in ('arrow', 'parquet'):
+        if not export.is_available():
+            return jsonify({
+                'error': 'Columnar export unavailable',
+                'message': 'Install pyarrow to enable Arrow/Parquet output'
+            }), 406
+        
+        query = historical.build_historical_query(
+            household_filter, start_dt, end_dt, columns=export.EXPORT_COLUMNS
+        )
+        if output_format == 'arrow':
+            body, mimetype = export.stream_arrow(query, db.engine), export.ARROW_STREAM_MIMETYPE
+        else:
+            body, mimetype = export.stream_parquet(query, db.engine), export.PARQUET_MIMETYPE
+        return Response(stream_with_context(body), mimetype=mimetype)
     
-    return jsonify({
-        'count': len(result),
-        'data': result
-    })
+    # Build query (ordered by timestamp, id)
+    query = historical.build_historical_query(household_filter, start_dt, end_dt)
+    
+    # Keyset pagination
+    if limit is not None or cursor:
+        limit = min(max(limit or historical.MAX_PAGE_SIZE, 1), historical.MAX_PAGE_SIZE)
+        try:
+            result, next_cursor = historical.fetch_page(query, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'count': len(result),
+            'data': result,
+            'next_cursor': next_cursor
+        })
+    
+    # Streaming
+    if output_format == 'ndjson':
+        return Response(
+            stream_with_context(historical.stream_ndjson(query)),
+            mimetype='application/x-ndjson'
+        )
+    
+    return Response(
+        stream_with_context(historical.stream_json(query)),
+        mimetype='application/json'
+    )
 
 @app.route('/api/v1/usage/predict', methods=['GET'])
 def get_prediction():
     """
     Get 24-hour energy usage forecast.
     Returns predicted power consumption for the next 24 hours.
+    
+    Query Parameters:
+    - household_id (optional): Forecast a single household instead of the average
     """
-    if predictor_model is None:
+    household_id = request.args.get('household_id', type=int)
+    
+    if refresh_predictor_model() is None:
         return jsonify({
             'error': 'Prediction model not loaded',
-            'message': 'Please run model_training.ipynb to generate the model file'
+            'message': 'Please run flask --app app train-model to generate the model file'
         }), 503
     
     try:
-        forecast = generate_24hr_forecast(predictor_model)
+        forecast = generate_24hr_forecast(household_id)
         
         if forecast is None:
             return jsonify({
@@ -622,12 +786,118 @@ def get_prediction():
             'message': str(e)
         }), 500
 
+@app.route('/api/v1/simulation', methods=['POST'])
+def run_load_shifting_simulation():
+    """
+    Minimum-cost load-shifting schedule for shiftable appliances under the
+    time-of-use tariff, for one household or thousands (see load_shifting.py).
+    
+    Body (JSON):
+    - appliances: [{name, power_kw, duration_minutes, earliest, deadline,
+      preferred_start, household_ids}]; times are 'HH:MM', all but the
+      first three optional. preferred_start (default: the earliest start)
+      is when the appliance would run without shifting.
+    - hours (optional): Horizon in hours (default: 24, max: 48)
+    - household_ids (optional): Households to forecast (default: all)
+    - forecasts (optional): {household_id: [kWh per 5-minute step]} to use
+      instead of the model's base load forecast
+    - max_kw (optional): Per-household power limit for base load plus appliances
+    
+    Returns:
+        Totals (baseline vs optimized cost), a per-step profile, per-household
+        costs and each run's baseline and optimized start
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': 'Expected a JSON object with an appliances list'
+        }), 400
+    
+    try:
+        hours = int(payload.get('hours', 24))
+        max_kw = payload.get('max_kw')
+        max_kw = float(max_kw) if max_kw is not None else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': 'hours and max_kw must be numbers'
+        }), 400
+    if max_kw is not None and not math.isfinite(max_kw):
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': 'max_kw must be a finite number'
+        }), 400
+    if not 1 <= hours <= load_shifting.MAX_HORIZON_HOURS:
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': f'hours must be between 1 and {load_shifting.MAX_HORIZON_HOURS}'
+        }), 400
+    
+    requested_households = payload.get('household_ids')
+    if requested_households is not None and not (
+        isinstance(requested_households, list) and all(isinstance(h, int) for h in requested_households)
+    ):
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': 'household_ids must be a list of integers'
+        }), 400
+    
+    start_time = load_shifting.horizon_start()
+    steps = hours * load_shifting.STEPS_PER_HOUR
+    forecasts = payload.get('forecasts')
+    
+    if forecasts is not None:
+        try:
+            household_ids = np.array([int(h) for h in forecasts], dtype=np.int64)
+            base_kwh = np.array([forecasts[h] for h in forecasts], dtype=np.float64)
+        except (TypeError, ValueError):
+            return jsonify({
+                'error': 'Invalid simulation request',
+                'message': 'forecasts must map household ids to lists of kWh values'
+            }), 400
+        if base_kwh.ndim != 2 or base_kwh.shape[1] != steps:
+            return jsonify({
+                'error': 'Invalid simulation request',
+                'message': f'each forecast needs {steps} 5-minute values for {hours} hours'
+            }), 400
+        if not np.isfinite(base_kwh).all():
+            return jsonify({
+                'error': 'Invalid simulation request',
+                'message': 'forecast values must be finite numbers'
+            }), 400
+    else:
+        if refresh_predictor_model() is None:
+            return jsonify({
+                'error': 'Prediction model not loaded',
+                'message': 'Provide forecasts or run flask --app app train-model to generate the model file'
+            }), 503
+        household_ids, base_kwh = model_registry.forecast_readings(
+            db.session, predictor_models, start_time, steps,
+            household_ids=requested_households
+        )
+    
+    try:
+        result = load_shifting.simulate_load_shifting(
+            household_ids, base_kwh, payload.get('appliances'), start_time, max_kw=max_kw
+        )
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid simulation request',
+            'message': str(e)
+        }), 400
+    
+    return jsonify(result)
+
 # Utility function to get latest usage data for optimization
 def get_latest_usage_data(time_window_minutes=60):
     """
     Retrieve the latest energy readings within the specified time window.
     For demo purposes with historical data, if no recent data exists,
-    retrieves the most recent 100 readings from the database.
+    retrieves the most recent 100 readings.
+    
+    Readings come from the in-memory latest window, which holds at least
+    the newest 100 readings of every household, so no query is needed.
     
     Args:
         time_window_minutes (int): Time window in minutes (default: 60 minutes)
@@ -636,29 +906,80 @@ def get_latest_usage_data(time_window_minutes=60):
         list: List of dictionaries with recent usage data
     """
     cutoff_time = datetime.now() - timedelta(minutes=time_window_minutes)
+    window = get_latest_window()
     
-    # Query latest readings for all households
-    latest_readings = EnergyReading.query.filter(
-        EnergyReading.timestamp >= cutoff_time
-    ).order_by(EnergyReading.timestamp.desc()).limit(100).all()
-    
-    # If no recent data (historical dataset), get the most recent readings from database
-    if not latest_readings:
-        latest_readings = EnergyReading.query.order_by(
-            EnergyReading.timestamp.desc()
-        ).limit(100).all()
-    
-    # Convert to dictionary format
-    usage_data = []
-    for reading in latest_readings:
-        usage_data.append({
-            'household_id': reading.household_id,
-            'energy_kwh': reading.energy_kwh,
-            'timestamp': reading.timestamp
-        })
+    # Latest readings for all households
+    usage_data = window.recent(since=cutoff_time, limit=100)
+    
+    # If no recent data (historical dataset), use the most recent readings
+    if not usage_data:
+        usage_data = window.recent(limit=100)
     
     return usage_data
 
+def build_frontend_suggestions(time_window=60):
+    """
+    Optimization suggestions for the latest readings in the frontend format.
+    
+    Args:
+        time_window (int): Minutes of recent readings to analyze
+    
+    Returns:
+        list: Suggestion dicts as served by /api/optimization/suggestions
+    """
+    # Retrieve latest usage data
+    current_usage = get_latest_usage_data(time_window)
+    
+    if not current_usage:
+        return []
+    
+    # Generate optimization suggestions using rule engine
+    backend_suggestions = get_optimization_suggestions(current_usage)
+    
+    # Transform backend suggestions to frontend format
+    frontend_suggestions = []
+    for idx, suggestion in enumerate(backend_suggestions, start=1):
+        # Extract energy and cost savings
+        energy_saving = suggestion.get('potential_savings_kwh', 0) * 24  # Daily savings
+        # Savings are already scaled by the slot multiplier, so price at the base rate
+        cost_saving = energy_saving * cost_engine.BASE_RATE_PER_KWH
+        
+        # Determine priority based on impact
+        impact_level = suggestion.get('impact', 'Medium')
+        if impact_level == 'High':
+            priority = 'high'
+            score = 8.5 + (idx * 0.1)
+        elif impact_level == 'Medium':
+            priority = 'medium'
+            score = 6.0 + (idx * 0.1)
+        else:
+            priority = 'low'
+            score = 4.0 + (idx * 0.1)
+        
+        # Format suggestion text for title and description
+        text = suggestion.get('text', '')
+        parts = text.split('. ', 1)
+        title = parts[0] if parts else text
+        description = parts[1] if len(parts) > 1 else f"Time slot: {suggestion.get('time_slot', 'N/A')}"
+        
+        frontend_suggestions.append({
+            'id': suggestion.get('id', idx),
+            'title': title[:100],  # Limit title length
+            'description': description,
+            'impact': {
+                'energySaving': f"{energy_saving:.1f} kWh/day",
+                'costSaving': f"${cost_saving:.2f}/day",
+                'score': min(10.0, score)
+            },
+            'priority': priority,
+            'status': 'pending',
+            'category': suggestion.get('category', 'General'),
+            'timeSlot': suggestion.get('time_slot', 'N/A'),
+            'householdId': suggestion.get('household_id')
+        })
+    
+    return frontend_suggestions
+
 @app.route('/api/optimization/suggestions', methods=['GET'])
 @app.route('/api/v1/optimization/suggestions', methods=['GET'])
 def get_suggestions():
@@ -678,60 +999,7 @@ def get_suggestions():
         # Get time window parameter (default: 60 minutes)
         time_window = request.args.get('time_window', default=60, type=int)
         
-        # Retrieve latest usage data
-        current_usage = get_latest_usage_data(time_window)
-        
-        if not current_usage:
-            return jsonify([])
-        
-        # Generate optimization suggestions using rule engine
-        backend_suggestions = get_optimization_suggestions(current_usage)
-        
-        # Get current time slot info
-        time_slot_info = get_time_slot_info()
-        
-        # Transform backend suggestions to frontend format
-        frontend_suggestions = []
-        for idx, suggestion in enumerate(backend_suggestions, start=1):
-            # Extract energy and cost savings
-            energy_saving = suggestion.get('potential_savings_kwh', 0) * 24  # Daily savings
-            cost_saving = energy_saving * 0.12  # $0.12 per kWh
-            
-            # Determine priority based on impact
-            impact_level = suggestion.get('impact', 'Medium')
-            if impact_level == 'High':
-                priority = 'high'
-                score = 8.5 + (idx * 0.1)
-            elif impact_level == 'Medium':
-                priority = 'medium'
-                score = 6.0 + (idx * 0.1)
-            else:
-                priority = 'low'
-                score = 4.0 + (idx * 0.1)
-            
-            # Format suggestion text for title and description
-            text = suggestion.get('text', '')
-            parts = text.split('. ', 1)
-            title = parts[0] if parts else text
-            description = parts[1] if len(parts) > 1 else f"Time slot: {suggestion.get('time_slot', 'N/A')}"
-            
-            frontend_suggestions.append({
-                'id': suggestion.get('id', idx),
-                'title': title[:100],  # Limit title length
-                'description': description,
-                'impact': {
-                    'energySaving': f"{energy_saving:.1f} kWh/day",
-                    'costSaving': f"${cost_saving:.2f}/day",
-                    'score': min(10.0, score)
-                },
-                'priority': priority,
-                'status': 'pending',
-                'category': suggestion.get('category', 'General'),
-                'timeSlot': suggestion.get('time_slot', 'N/A'),
-                'householdId': suggestion.get('household_id')
-            })
-        
-        return jsonify(frontend_suggestions)
+        return jsonify(build_frontend_suggestions(time_window))
     
     except Exception as e:
         return jsonify({
@@ -756,14 +1024,135 @@ def get_current_timeslot():
             'message': str(e)
         }), 500
 
+@app.route('/api/v1/energy/live/<int:household_id>', methods=['GET'])
+def get_live_stats(household_id):
+    """
+    Current kW and rolling statistics for one household, from memory.
+    
+    Query Parameters:
+    - minutes (optional): Rolling window length in minutes (default: 60, max: 1440)
+    - include_readings (optional): 'true' to also return the window's readings
+    """
+    minutes = min(max(request.args.get('minutes', default=60, type=int), 5), 24 * 60)
+    include_readings = request.args.get('include_readings', 'false').lower() == 'true'
+    
+    window = get_latest_window()
+    stats = window.household_stats(household_id, minutes)
+    if stats is None:
+        return jsonify({
+            'error': 'Unknown household',
+            'message': f'No recent readings for household {household_id}'
+        }), 404
+    
+    if include_readings:
+        since = datetime.fromisoformat(stats['timestamp']) - timedelta(minutes=minutes)
+        stats['readings'] = [
+            {'timestamp': r['timestamp'].isoformat(), 'energy_kwh': round(r['energy_kwh'], 4)}
+            for r in window.recent(since=since, limit=window.window_size, household_id=household_id)
+            if r['timestamp'] > since
+        ]
+    
+    return jsonify(stats)
+
+@app.route('/api/v1/readings', methods=['POST'])
+def post_readings():
+    """
+    Queue meter readings for ingestion.
+    
+    Body: a JSON list of readings, or {"readings": [...]}. Each reading has
+    timestamp, household_id and energy_kwh (future_energy_kwh optional);
+    timestamps with a UTC offset are stored as naive UTC, like the rest.
+    Readings are written in micro-batches by a background writer; readings
+    at or before a household's latest stored timestamp are skipped.
+    
+    Returns:
+        202 with the number accepted, 400 for invalid input, or 503 with
+        Retry-After when the ingest queue is full
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('readings')
+    
+    try:
+        readings = stream_ingest.parse_readings(payload)
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid readings',
+            'message': str(e)
+        }), 400
+    
+    writer = get_ingest_writer()
+    try:
+        queued = writer.submit(readings)
+    except ValueError as e:
+        return jsonify({
+            'error': 'Batch too large',
+            'message': str(e)
+        }), 413
+    
+    if not queued:
+        response = jsonify({
+            'error': 'Ingest queue full',
+            'message': 'Too many readings are waiting to be written; retry shortly'
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    return jsonify({
+        'accepted': len(readings),
+        'queued': writer.queued
+    }), 202
+
+@app.route('/api/v1/monitoring/ingest', methods=['GET'])
+def get_ingest_stats():
+    """Streaming ingest queue depth, throughput counters and last flush time."""
+    if ingest_writer is None:
+        return jsonify({'running': False})
+    return jsonify(ingest_writer.stats())
+
+@app.route('/api/v1/stream', methods=['GET'])
+def stream_live_updates():
+    """
+    Server-Sent Events stream of live dashboard updates.
+    
+    Events:
+    - readings: newly ingested readings ({'count', 'readings'})
+    - current: current kW overall and per household
+    - suggestions: optimization suggestions, sent when they change
+    """
+    subscriber = live_events.subscribe()
+    return Response(
+        live_events.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/v1/monitoring/memory', methods=['GET'])
+def get_memory_stats():
+    """Memory held by the in-memory latest-readings ring buffers."""
+    return jsonify({'latest_window': get_latest_window().memory_report()})
+
+@app.route('/api/v1/monitoring/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Forecast cache and model registry size and hit/miss counters.
+    
+    Returns:
+        JSON with entries, hits, misses, hit_rate, evictions and invalidations
+        per cache
+    """
+    stats = forecast_cache.stats()
+    stats['model_version'] = predictor_models.generation
+    return jsonify({
+        'forecast_cache': stats,
+        'model_registry': predictor_models.stats(),
+        'live_events': live_events.stats()
+    })
+
 if __name__ == '__main__':
     # Initialize database
     init_db()
     
-    # Load RDF ontology for optimization rules
-    print("\nLoading RDF ontology for optimization engine...")
-    load_ontology_graph()
-    
     # Load prediction model
     load_predictor_model()
     
@@ -780,7 +1169,20 @@ if __name__ == '__main__':
             load_energy_data(energy_file)
         else:
             print(f"\nDatabase already contains {existing_count} records.")
-            print("Skipping data load. Delete instance/refit_energy_data.db to reload.")
+            print(f"Checking {energy_file} for new readings...")
+            ingest_new_energy_data(energy_file)
+        
+        # Fill the in-memory ring buffers before serving
+        memory = get_latest_window().memory_report()
+        print(f"Latest window: {memory['households']} households, "
+              f"{memory['bytes_per_household']} bytes each ({memory['total_bytes'] / 1024:.1f} KiB)")
+    
+    # Optional line-protocol listener for streamed readings
+    # (debug=True runs this block in the reloader parent too; only the child serves)
+    socket_port = os.environ.get('INGEST_SOCKET_PORT')
+    if socket_port and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            stream_ingest.start_line_listener(get_ingest_writer(), port=int(socket_port))
     
     # Run Flask app
     print("\nStarting Flask server...")
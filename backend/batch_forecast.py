@@ -0,0 +1,192 @@
+"""
+Batch Forecast Module
+
+Forecasts every household and stores the results in the forecasts table,
+from which the prediction endpoints serve them. Households are split into
+shards that run in a process pool. Each worker has its own model registry
+and read-only connection, reads a shard's windows from the feature store
+and forecasts it with each household's model (see model_registry.py). The
+parent writes each shard's results in one transaction through the writer
+engine, so the batch queues behind ingest like every other write.
+
+Every row of a run carries the run's generated_at. Forecasts are served
+only when one run covers every household at every requested hour, so a
+run in progress, or one that failed part way, never serves a partial mean.
+Ingest drops the stored forecasts of households that receive readings, so
+they are forecast live again until the next run.
+
+Usage:
+    flask --app app forecast-households --workers 8 --hours 48
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from models import db, HouseholdForecast, HouseholdWatermark
+from feature_store import household_history
+from forecasting import STEPS_PER_HOUR, hourly_means
+from model_registry import MODELS_DIR, ModelRegistry, forecast_history
+from storage import get_storage
+
+# Hours forecast per run. Nightly runs cover the whole next day at every
+# hour, so the endpoints' 24-hour window never runs past the stored rows.
+DEFAULT_HOURS = 48
+
+# Upper bound on one shard, which is also the size of its IN (...) list
+MAX_SHARD_HOUSEHOLDS = 5000
+
+# Shards per worker, so faster workers pick up the slack at the end
+SHARDS_PER_WORKER = 4
+
+# Stored forecasts older than this are pruned at the start of a run
+RETENTION = timedelta(days=7)
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(database_uri, model_path, models_dir):
+    _worker['engine'] = create_engine(database_uri)
+    _worker['registry'] = ModelRegistry(model_path, models_dir)
+
+
+def write_forecasts(storage, cursor, household_ids, start_time, hourly_kwh, generated_at, model_version):
+    """Store forecasts of `household_ids`, replacing those stored for the same hours."""
+    timestamps = [start_time + timedelta(hours=hour) for hour in range(hourly_kwh.shape[1])]
+    storage.upsert_forecasts(cursor, household_ids, timestamps, hourly_kwh, generated_at, model_version)
+
+
+def forecast_shard(household_ids, start_time, hours):
+    """
+    Forecast one shard (runs in a worker process; the parent stores it).
+
+    Returns:
+        tuple: (household_ids ndarray, (H, hours) hourly kWh, seconds)
+    """
+    started = time.perf_counter()
+    with Session(_worker['engine']) as session:
+        ids, history = household_history(session, household_ids)
+    if len(ids) == 0:
+        return ids, np.empty((0, hours)), time.perf_counter() - started
+
+    predictions = forecast_history(_worker['registry'], ids, history, start_time, hours * STEPS_PER_HOUR)
+    return ids, hourly_means(predictions), time.perf_counter() - started
+
+
+def shard_households(household_ids, workers):
+    """Split household ids into contiguous shards for `workers` processes."""
+    if len(household_ids) == 0:
+        return []
+    shard_count = max(workers * SHARDS_PER_WORKER, -(-len(household_ids) // MAX_SHARD_HOUSEHOLDS))
+    shard_count = min(shard_count, len(household_ids))
+    return [shard.tolist() for shard in np.array_split(np.asarray(household_ids), shard_count)]
+
+
+def run_batch_forecast(engine, model_path, workers=None, hours=DEFAULT_HOURS, start_time=None,
+                       models_dir=MODELS_DIR):
+    """
+    Forecast every household with ingested readings and store the results.
+
+    Args:
+        engine: Writer engine (database.get_writer_engine()); workers open
+                their own connections to its database for reading
+        model_path (str): joblib file of the default model
+        workers (int): Worker processes (default: CPU count)
+        hours (int): Hours forecast per household
+        start_time (datetime): First forecast hour (default: the current hour)
+        models_dir (str): Per-household and per-cluster models
+
+    Returns:
+        dict: households, shards, workers, seconds and households_per_sec
+    """
+    workers = workers or os.cpu_count() or 1
+    start_time = start_time or datetime.now().replace(minute=0, second=0, microsecond=0)
+    generated_at = datetime.now()
+    model_version = ModelRegistry(model_path, models_dir).generation
+    storage = get_storage(engine)
+
+    with engine.begin() as conn:
+        household_ids = conn.execute(
+            select(HouseholdWatermark.household_id).order_by(HouseholdWatermark.household_id)
+        ).scalars().all()
+        conn.execute(HouseholdForecast.__table__.delete().where(
+            HouseholdForecast.timestamp < start_time - RETENTION
+        ))
+
+    shards = shard_households(household_ids, workers)
+    print(f"Forecasting {len(household_ids)} households from {start_time.isoformat()} "
+          f"({hours}h) in {len(shards)} shards on {workers} workers...")
+
+    started = time.perf_counter()
+    forecast_count = 0
+    # spawn: workers open their own connections instead of inheriting the parent's
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(engine.url.render_as_string(hide_password=False), model_path, models_dir)
+    ) as pool:
+        futures = [pool.submit(forecast_shard, shard, start_time, hours) for shard in shards]
+        for future in as_completed(futures):
+            ids, hourly_kwh, _ = future.result()
+            if len(ids):
+                with storage.write_connection(engine) as (_, cursor):
+                    write_forecasts(storage, cursor, ids, start_time, hourly_kwh, generated_at, model_version)
+            forecast_count += len(ids)
+
+    seconds = time.perf_counter() - started
+    rate = forecast_count / seconds if seconds > 0 else 0.0
+    print(f"Forecast {forecast_count} households in {seconds:.2f}s ({rate:,.0f} households/sec)")
+    return {
+        'households': forecast_count,
+        'shards': len(shards),
+        'workers': workers,
+        'seconds': seconds,
+        'households_per_sec': rate
+    }
+
+
+def stored_forecast(session, start_time, hours=24, household_id=None, model_version=None):
+    """
+    Hourly predicted kWh from the forecasts table: one household's, or the
+    mean over households. With `model_version`, only rows produced by that
+    model generation count.
+
+    Returns:
+        list: predicted_kwh per hour from `start_time`, or None unless one
+              run stored every hour of every household (of `household_id`)
+    """
+    end_time = start_time + timedelta(hours=hours)
+    query = session.query(
+        HouseholdForecast.timestamp,
+        db.func.avg(HouseholdForecast.predicted_kwh),
+        db.func.count(),
+        db.func.min(HouseholdForecast.generated_at),
+        db.func.max(HouseholdForecast.generated_at)
+    ).filter(
+        HouseholdForecast.timestamp >= start_time,
+        HouseholdForecast.timestamp < end_time
+    )
+    if household_id is not None:
+        query = query.filter(HouseholdForecast.household_id == household_id)
+        expected = 1
+    else:
+        expected = session.query(db.func.count(HouseholdWatermark.household_id)).scalar()
+    if model_version is not None:
+        query = query.filter(HouseholdForecast.model_version == model_version)
+
+    rows = query.group_by(HouseholdForecast.timestamp).order_by(HouseholdForecast.timestamp).all()
+    if len(rows) != hours or any(count != expected for _, _, count, _, _ in rows):
+        return None
+    # Rows of an earlier run mixed with those of a run still writing (or one that failed)
+    runs = {first for _, _, _, first, _ in rows} | {last for _, _, _, _, last in rows}
+    if len(runs) != 1:
+        return None
+    return [predicted_kwh for _, predicted_kwh, _, _, _ in rows]
@@ -0,0 +1,55 @@
+"""
+Cost Engine Module
+
+Time-of-use pricing for energy readings. A reading costs
+
+    energy_kwh * BASE_RATE_PER_KWH * cost multiplier of its time slot
+
+where the multiplier comes from the ontology's tariff schedule (see
+tariffs.py). Batches of readings are priced in one vectorized pass: the
+multipliers are a single gather from the schedule's lookup table.
+"""
+
+import numpy as np
+
+from optimization_rules import get_tariff_schedule
+
+# Price of one kWh at a 1.0x multiplier (the former flat rate)
+BASE_RATE_PER_KWH = 0.12
+
+
+def price_readings(timestamps, energy_kwh, schedule=None):
+    """
+    Cost of each reading at its time-of-use rate.
+
+    Args:
+        timestamps: Array-like of datetime64-compatible reading times
+        energy_kwh: Array-like of energy per reading
+        schedule (TariffSchedule): Defaults to the ontology schedule
+
+    Returns:
+        ndarray: Cost per reading
+    """
+    schedule = schedule or get_tariff_schedule()
+    energy = np.asarray(energy_kwh, dtype=np.float64)
+    if energy.size == 0:
+        return np.zeros(0)
+    return energy * (BASE_RATE_PER_KWH * schedule.multipliers_for(timestamps))
+
+
+def price_at(moment, energy_kwh, schedule=None):
+    """Cost of `energy_kwh` used at a single datetime."""
+    schedule = schedule or get_tariff_schedule()
+    return energy_kwh * BASE_RATE_PER_KWH * schedule.slot_at(moment).cost_multiplier
+
+
+def price_forecast(forecast, schedule=None):
+    """
+    Total cost of a forecast from forecasting.format_forecast, pricing each
+    hour's predicted_kwh at that hour's rate.
+    """
+    if not forecast:
+        return 0.0
+    timestamps = np.array([point['timestamp'] for point in forecast], dtype='datetime64[m]')
+    energy = [point['predicted_kwh'] for point in forecast]
+    return float(price_readings(timestamps, energy, schedule).sum())
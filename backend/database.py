@@ -0,0 +1,121 @@
+"""
+Database Engine Module
+
+Connection setup with read/write separation. Flask-SQLAlchemy's default
+engine (used by db.session and every query) is a pool of read-only
+connections. All writes go through a dedicated single-connection writer
+engine: schema upgrades, CSV loads, rollup rebuilds and streamed ingest.
+With SQLite in WAL mode (or on PostgreSQL), readers work from the last
+committed snapshot and never wait for an ingest transaction. The single
+writer also keeps ingest transactions, and their watermark updates,
+strictly one after another.
+
+The database is SQLite by default; set DATABASE_URL to use PostgreSQL,
+e.g. postgresql+psycopg://energy@localhost/energy, after installing
+requirements-postgres.txt (see storage.py).
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+DEFAULT_DATABASE_URL = 'sqlite:///refit_energy_data.db'
+
+WRITER_BIND = 'writer'
+
+# Concurrent read-only connections
+READ_POOL_SIZE = 8
+
+# Applied to every connection. NORMAL is durable in WAL mode except for the
+# last transactions before a power loss, and avoids an fsync per commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# journal_mode is stored in the database file; the writer sets it on connect
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA cache_size = -65536",
+)
+
+READER_PRAGMAS = (
+    "PRAGMA cache_size = -16384",
+    "PRAGMA query_only = ON",
+)
+
+# PostgreSQL equivalent of query_only for the read pool
+POSTGRES_READER_OPTIONS = '-c default_transaction_read_only=on'
+
+
+def database_url():
+    """DATABASE_URL from the environment, or the local SQLite file."""
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Hosting providers often hand out the scheme SQLAlchemy no longer accepts;
+    # it gets the psycopg driver from requirements-postgres.txt
+    if url.startswith('postgres://'):
+        url = 'postgresql+psycopg://' + url[len('postgres://'):]
+    return url
+
+
+def engine_config(database_uri, read_pool_size=READ_POOL_SIZE):
+    """
+    Flask config entries for the read pool and the writer bind.
+
+    Args:
+        database_uri (str): SQLite or PostgreSQL URI shared by both engines
+        read_pool_size (int): Number of pooled read-only connections
+
+    Returns:
+        dict: Entries to merge into app.config before db.init_app(app)
+    """
+    reader_options = {
+        'pool_size': read_pool_size,
+        'max_overflow': 0,
+    }
+    if make_url(database_uri).get_backend_name() == 'postgresql':
+        reader_options['connect_args'] = {'options': POSTGRES_READER_OPTIONS}
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': reader_options,
+        'SQLALCHEMY_BINDS': {
+            WRITER_BIND: {
+                'url': database_uri,
+                'pool_size': 1,
+                'max_overflow': 0,
+                'pool_timeout': 120,
+            },
+        },
+    }
+
+
+def _apply_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+
+def configure_engines():
+    """
+    Install the SQLite connection pragmas on both engines (PostgreSQL needs
+    none beyond engine_config). Call inside an app context after
+    db.init_app(app), before any connection is opened.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    event.listen(get_writer_engine(), 'connect', _apply_pragmas(CONNECTION_PRAGMAS + WRITER_PRAGMAS))
+    event.listen(db.engine, 'connect', _apply_pragmas(CONNECTION_PRAGMAS + READER_PRAGMAS))
+
+
+def get_writer_engine():
+    """The single-connection engine used for every write."""
+    return db.engines[WRITER_BIND]
@@ -0,0 +1,170 @@
+"""
+Columnar Export Module
+
+Arrow IPC and Parquet output for historical readings. Query results are
+fetched in row partitions and transposed straight into Arrow column arrays,
+so no per-reading dicts or ISO timestamp strings are created.
+
+pyarrow is optional: when it is not installed the JSON paths keep working
+and columnar requests are rejected.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from models import db, EnergyReading
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARROW_FILE_MIMETYPE = 'application/vnd.apache.arrow.file'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+
+# Rows per Arrow record batch / Parquet row group
+BATCH_SIZE = 65536
+
+# Timestamps are selected as stored text and parsed once per batch
+EXPORT_COLUMNS = (
+    EnergyReading.id,
+    db.type_coerce(EnergyReading.timestamp, db.String).label('timestamp'),
+    EnergyReading.household_id,
+    EnergyReading.energy_kwh,
+    EnergyReading.future_energy_kwh,
+)
+
+
+def is_available():
+    return pa is not None
+
+
+def reading_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+        ('household_id', pa.int64()),
+        ('energy_kwh', pa.float64()),
+        ('future_energy_kwh', pa.float64()),
+    ])
+
+
+def rows_to_record_batch(rows, schema):
+    """Transpose a partition of row tuples into one Arrow record batch."""
+    ids, timestamps, household_ids, energy, future = zip(*rows)
+    parsed = pd.to_datetime(pd.Index(timestamps), format='ISO8601').values.astype('datetime64[us]')
+
+    return pa.RecordBatch.from_arrays([
+        pa.array(np.fromiter(ids, dtype=np.int64, count=len(ids))),
+        pa.array(parsed),
+        pa.array(np.fromiter(household_ids, dtype=np.int64, count=len(ids))),
+        pa.array(np.fromiter(energy, dtype=np.float64, count=len(ids))),
+        pa.array(future, type=pa.float64()),
+    ], schema=schema)
+
+
+def iter_record_batches(query, engine, batch_size=BATCH_SIZE):
+    """Stream the query result as Arrow record batches."""
+    schema = reading_schema()
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(batch_size):
+            yield rows_to_record_batch(rows, schema)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_arrow(query, engine):
+    """Generate an Arrow IPC stream, one record batch at a time."""
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, reading_schema())
+    for batch in iter_record_batches(query, engine):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_parquet(query, engine):
+    """Generate a Parquet file, one row group per record batch."""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, reading_schema(), compression='zstd')
+    for batch in iter_record_batches(query, engine):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_to_file(query, engine, path, file_format='arrow'):
+    """
+    Write the query result to `path` as an Arrow IPC file (memory-mappable,
+    for zero-copy reads) or a Parquet file.
+
+    Returns:
+        int: Number of readings written
+    """
+    rows_written = 0
+    schema = reading_schema()
+
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    try:
+        for batch in iter_record_batches(query, engine):
+            writer.write_batch(batch)
+            rows_written += batch.num_rows
+    finally:
+        writer.close()
+
+    return rows_written
+
+
+def negotiate_format(accept_header, requested_format=None):
+    """
+    Pick the output format ('json', 'ndjson', 'arrow' or 'parquet') from
+    ?format= or, failing that, the Accept header.
+    """
+    if requested_format in ('arrow', 'parquet', 'json', 'ndjson'):
+        return requested_format
+
+    accept = (accept_header or '').lower()
+    if ARROW_STREAM_MIMETYPE in accept or ARROW_FILE_MIMETYPE in accept:
+        return 'arrow'
+    if PARQUET_MIMETYPE in accept:
+        return 'parquet'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return 'json'
@@ -0,0 +1,207 @@
+"""
+Feature Store Module
+
+Maintains the features table: one row per household with its latest
+reading's model features and the window of 6 readings behind them (see
+models.HouseholdFeatures). Ingest extends the stored windows with each
+batch of new readings and upserts the recomputed rows in the same
+transaction, as it does for rollups. Forecasts then read a household's
+window with a primary-key lookup instead of reading its last day of raw
+readings.
+
+Features are computed with features.py, the same code training uses.
+check_parity() recomputes them the notebook's way from raw readings and
+compares them with the store.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from models import EnergyReading, HouseholdFeatures, HouseholdWatermark
+from features import (
+    FEATURE_COLUMNS, HISTORY_LENGTH, feature_matrix, household_windows, notebook_features
+)
+from latest_window import recent_readings
+from storage import WINDOW_KWH_COLUMNS, get_storage
+
+# Households compared by check_parity unless given
+DEFAULT_PARITY_HOUSEHOLDS = 100
+
+# Absolute difference allowed between stored and recomputed features
+PARITY_TOLERANCE = 1e-9
+
+
+def recent_history(session, household_ids=None, length=HISTORY_LENGTH):
+    """
+    Last `length` readings of each household from raw readings, however
+    far back they go, like the notebook's features (see
+    latest_window.recent_readings, which reads them through the covering
+    index).
+
+    Returns:
+        tuple: (household_ids ndarray, (H, length) ndarray oldest first, NaN-padded)
+    """
+    rows = recent_readings(session, length, household_ids)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, length))
+
+    households = np.array([row[0] for row in rows], dtype=np.int64)
+    energy = np.array([row[2] for row in rows], dtype=np.float64)
+
+    unique_ids, positions, counts = np.unique(households, return_inverse=True, return_counts=True)
+    # Rows are oldest first, so a household's last row goes in the last column
+    ends = np.cumsum(counts)
+    columns = length - (ends[positions] - np.arange(len(rows)))
+    history = np.full((len(unique_ids), length), np.nan)
+    history[positions, columns] = energy
+    return unique_ids, history
+
+
+def household_history(session, household_ids=None):
+    """
+    Latest 6 readings of every household (or the given ones) from the
+    feature store. Households it does not hold yet are read with
+    recent_history().
+
+    Returns:
+        tuple: (household_ids ndarray, (H, 6) ndarray oldest first, NaN-padded)
+    """
+    query = session.query(
+        HouseholdFeatures.household_id,
+        *[getattr(HouseholdFeatures, name) for name in WINDOW_KWH_COLUMNS]
+    )
+    if household_ids is not None:
+        query = query.filter(HouseholdFeatures.household_id.in_([int(h) for h in household_ids]))
+    rows = query.order_by(HouseholdFeatures.household_id).all()
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    history = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), HISTORY_LENGTH)
+
+    if household_ids is None:
+        missing = None if len(rows) == 0 else []
+    else:
+        missing = np.setdiff1d(np.asarray(list(household_ids), dtype=np.int64), ids).tolist()
+    if missing is None or len(missing):
+        missing_ids, missing_history = recent_history(session, missing)
+        ids = np.concatenate([ids, missing_ids])
+        history = np.concatenate([history, missing_history])
+        order = np.argsort(ids, kind='stable')
+        ids, history = ids[order], history[order]
+    return ids, history
+
+
+def apply_readings(storage, cursor, readings):
+    """
+    Extend the stored windows of the households in `readings` and upsert
+    their latest features.
+
+    Args:
+        storage: Storage backend of the database (see storage.py)
+        cursor: DBAPI cursor inside the ingest transaction
+        readings (DataFrame): Readings in ingest.prepare_chunk() layout that
+                              were actually inserted (all newer than each
+                              household's watermark)
+    """
+    if not len(readings):
+        return
+
+    readings = readings.sort_values(['household_id', 'timestamp'], kind='stable')
+    household_ids = readings['household_id'].to_numpy(dtype=np.int64)
+    segment_ids = np.unique(household_ids)
+
+    stored = storage.feature_windows(cursor, segment_ids.tolist())
+    empty = (None,) * HISTORY_LENGTH
+    tails = np.array([stored.get(int(h), empty) for h in segment_ids], dtype=np.float64)
+
+    windows, _, ends = household_windows(household_ids, readings['energy_kwh'].to_numpy(dtype=np.float64), tails)
+    timestamps = readings['timestamp'].to_numpy()[ends]
+    storage.upsert_features(
+        cursor, segment_ids, timestamps, feature_matrix(timestamps, windows[ends]), windows[ends]
+    )
+
+
+def rebuild_feature_store(conn):
+    """
+    Recompute the features table from raw readings (after a bulk load, or
+    when it is empty). Runs inside the caller's transaction.
+
+    Args:
+        conn: SQLAlchemy connection; household_watermarks must be current
+    """
+    storage = get_storage(conn)
+    with Session(bind=conn) as session:
+        ids, history = recent_history(session)
+        marks = dict(session.query(HouseholdWatermark.household_id, HouseholdWatermark.last_timestamp).all())
+
+    cursor = conn.connection.cursor()
+    storage.clear_table(cursor, HouseholdFeatures.__tablename__)
+    if len(ids):
+        timestamps = pd.DatetimeIndex([marks[int(h)] for h in ids]).values
+        storage.upsert_features(cursor, ids, timestamps, feature_matrix(timestamps, history), history)
+    cursor.close()
+
+
+def check_parity(session, household_ids=None, tolerance=PARITY_TOLERANCE):
+    """
+    Compare stored features with features.notebook_features() computed from
+    each household's raw readings.
+
+    Args:
+        session: SQLAlchemy session
+        household_ids (list): Households to check (default: the first
+                              DEFAULT_PARITY_HOUSEHOLDS in the store)
+        tolerance (float): Largest absolute difference accepted
+
+    Returns:
+        dict: checked, skipped (too few readings for the notebook's
+              features), max_difference per feature and mismatches
+              [{household_id, column, stored, expected}]
+    """
+    query = session.query(HouseholdFeatures).order_by(HouseholdFeatures.household_id)
+    if household_ids is not None:
+        query = query.filter(HouseholdFeatures.household_id.in_(list(household_ids)))
+    else:
+        query = query.limit(DEFAULT_PARITY_HOUSEHOLDS)
+
+    max_difference = dict.fromkeys(FEATURE_COLUMNS, 0.0)
+    mismatches = []
+    checked = skipped = 0
+    for row in query.all():
+        # The latest row's features only look back HISTORY_LENGTH readings
+        readings = session.query(
+            EnergyReading.household_id, EnergyReading.timestamp, EnergyReading.energy_kwh
+        ).filter(
+            EnergyReading.household_id == row.household_id
+        ).order_by(EnergyReading.timestamp.desc()).limit(2 * HISTORY_LENGTH).all()
+        expected = notebook_features(pd.DataFrame(
+            readings[::-1], columns=['household_id', 'timestamp', 'energy_kwh']
+        ))
+        if len(expected) == 0:
+            skipped += 1
+            continue
+
+        checked += 1
+        latest = expected.iloc[-1]
+        if pd.Timestamp(latest['timestamp']) != pd.Timestamp(row.timestamp):
+            mismatches.append({
+                'household_id': row.household_id, 'column': 'timestamp',
+                'stored': str(row.timestamp), 'expected': str(latest['timestamp'])
+            })
+            continue
+        for column in FEATURE_COLUMNS:
+            stored, value = getattr(row, column), float(latest[column])
+            difference = abs(stored - value)
+            max_difference[column] = max(max_difference[column], difference)
+            if difference > tolerance:
+                mismatches.append({
+                    'household_id': row.household_id, 'column': column,
+                    'stored': stored, 'expected': value
+                })
+
+    return {
+        'checked': checked,
+        'skipped': skipped,
+        'max_difference': max_difference,
+        'mismatches': mismatches
+    }
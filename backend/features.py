@@ -0,0 +1,160 @@
+"""
+Feature Engineering Module
+
+The one definition of the prediction model's 10 features, used by
+training (training.py), serving (forecasting.py) and the feature store
+(feature_store.py):
+
+    hour_of_day, day_of_week, is_weekend, time_category,
+    lag_1, lag_2, lag_3, rolling_mean_3, rolling_mean_6, rolling_std_3
+
+The features of a reading are its calendar features plus lag and rolling
+features over a window of the household's latest 6 readings, ending with the
+reading itself. notebook_features() is the pandas formulation from
+model_training.ipynb, kept as the reference the vectorized code is checked
+against (flask --app app check-feature-parity).
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+CALENDAR_COLUMNS = ['hour_of_day', 'day_of_week', 'is_weekend', 'time_category']
+
+WINDOW_COLUMNS = ['lag_1', 'lag_2', 'lag_3', 'rolling_mean_3', 'rolling_mean_6', 'rolling_std_3']
+
+FEATURE_COLUMNS = CALENDAR_COLUMNS + WINDOW_COLUMNS
+
+TIME_CATEGORY_NAMES = ['Night', 'Morning', 'Afternoon', 'Evening']
+
+# Readings needed to compute one feature row (rolling_mean_6)
+HISTORY_LENGTH = 6
+
+# Readings a row needs for lag_3 to exist; the notebook drops shorter rows
+MIN_HISTORY = 4
+
+
+def time_category(hours):
+    """0 Night (0-5), 1 Morning (6-11), 2 Afternoon (12-17), 3 Evening (18-23)."""
+    return np.asarray(hours) // 6
+
+
+def calendar_features(timestamps):
+    """
+    Time-based features for an array of datetime64 values.
+
+    Returns:
+        ndarray: (n, 4) hour_of_day, day_of_week, is_weekend, time_category
+    """
+    timestamps = np.asarray(timestamps, dtype='datetime64[m]')
+    days = timestamps.astype('datetime64[D]')
+    hours = (timestamps - days).astype(np.int64) // 60
+    # 1970-01-01 was a Thursday (Monday=0 convention gives 3)
+    day_of_week = (days.astype(np.int64) + 3) % 7
+
+    return np.column_stack([
+        hours,
+        day_of_week,
+        (day_of_week >= 5).astype(np.int64),
+        time_category(hours)
+    ]).astype(np.float64)
+
+
+def window_features(window):
+    """
+    Lag and rolling features from each row's most recent readings.
+
+    Args:
+        window (ndarray): (H, 6) readings, oldest first; missing history is NaN
+
+    Returns:
+        ndarray: (H, 6) lag_1, lag_2, lag_3, rolling_mean_3, rolling_mean_6, rolling_std_3
+    """
+    present = ~np.isnan(window)
+    values = np.where(present, window, 0.0)
+
+    count3 = present[:, -3:].sum(axis=1)
+    mean3 = values[:, -3:].sum(axis=1) / count3
+    mean6 = values.sum(axis=1) / present.sum(axis=1)
+
+    # pandas rolling std: ddof=1, and NaN (filled with 0) for a single value
+    deviations = np.where(present[:, -3:], window[:, -3:] - mean3[:, None], 0.0)
+    squares = (deviations ** 2).sum(axis=1)
+    std3 = np.sqrt(np.divide(squares, count3 - 1, out=np.zeros_like(squares), where=count3 > 1))
+
+    lags = window[:, -2:-5:-1]
+    # Short histories: fall back to the mean of what is there
+    lags = np.where(np.isnan(lags), mean6[:, None], lags)
+
+    return np.column_stack([lags, mean3, mean6, std3])
+
+
+def feature_matrix(timestamps, windows):
+    """
+    The 10 model features of readings at `timestamps` with their windows.
+
+    Returns:
+        ndarray: (n, 10) in FEATURE_COLUMNS order
+    """
+    return np.column_stack([calendar_features(timestamps), window_features(windows)])
+
+
+def household_windows(household_ids, energy, tails):
+    """
+    The window of 6 readings ending at each reading, continuing each
+    household's earlier readings.
+
+    Args:
+        household_ids (ndarray): (n,) sorted so each household's readings
+                                 are contiguous and in time order
+        energy (ndarray): (n,) kWh of each reading
+        tails (ndarray): (m, 6) each household's readings before these,
+                         oldest first, NaN-padded; one row per household
+                         in order of first appearance
+
+    Returns:
+        tuple: (windows (n, 6), starts, ends) where starts/ends index each
+               household's first and last reading
+    """
+    boundaries = np.r_[True, household_ids[1:] != household_ids[:-1]]
+    starts = np.flatnonzero(boundaries)
+    ends = np.r_[starts[1:], len(household_ids)] - 1
+    segment = np.cumsum(boundaries) - 1
+
+    # Each tail goes right before its household's readings, so the window
+    # ending at a reading never reaches another household
+    positions = np.arange(len(energy)) + HISTORY_LENGTH * (segment + 1)
+    series = np.empty(len(energy) + HISTORY_LENGTH * len(starts))
+    series[positions] = energy
+    series[positions[starts][:, None] + np.arange(-HISTORY_LENGTH, 0)] = tails
+    windows = sliding_window_view(series, HISTORY_LENGTH)[positions - (HISTORY_LENGTH - 1)]
+    return windows, starts, ends
+
+
+def notebook_features(readings):
+    """
+    Features as model_training.ipynb computes them, per household, with
+    pandas shift and rolling. Rows without lag_3 are dropped, as in the
+    notebook's dropna().
+
+    Args:
+        readings (DataFrame): household_id, timestamp, energy_kwh sorted by
+                              household and time
+
+    Returns:
+        DataFrame: readings with the FEATURE_COLUMNS added
+    """
+    df = readings.copy()
+    energy = df.groupby('household_id')['energy_kwh']
+    df['hour_of_day'] = df['timestamp'].dt.hour
+    df['day_of_week'] = df['timestamp'].dt.dayofweek
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+    df['time_category'] = df['hour_of_day'].apply(
+        lambda hour: 0 if hour < 6 else 1 if hour < 12 else 2 if hour < 18 else 3
+    )
+    df['lag_1'] = energy.shift(1)
+    df['lag_2'] = energy.shift(2)
+    df['lag_3'] = energy.shift(3)
+    df['rolling_mean_3'] = energy.transform(lambda s: s.rolling(window=3, min_periods=1).mean())
+    df['rolling_mean_6'] = energy.transform(lambda s: s.rolling(window=6, min_periods=1).mean())
+    df['rolling_std_3'] = energy.transform(lambda s: s.rolling(window=3, min_periods=1).std()).fillna(0)
+    return df.dropna(subset=['lag_1', 'lag_2', 'lag_3'])
@@ -0,0 +1,87 @@
+"""
+Forecast Cache Module
+
+Bounded LRU cache for generated forecasts, keyed by
+(household_id, forecast start hour, model version). Entries for a household
+are dropped when new readings arrive for it, and a new model file produces
+a new version, so stale forecasts are never served.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def model_file_version(model_path):
+    """Version stamp of a model file (mtime + size), or None if it is missing."""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class ForecastCache:
+    """Thread-safe LRU cache with hit/miss counters."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(household_id, start_time, model_version):
+        return (household_id, start_time.isoformat(), model_version)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_households(self, household_ids):
+        """
+        Drop forecasts for the given households, plus the all-household
+        aggregate (household_id None) which depends on every household.
+        """
+        affected = set(household_ids) | {None}
+        with self._lock:
+            stale = [key for key in self._entries if key[0] in affected]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
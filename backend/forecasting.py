@@ -0,0 +1,102 @@
+"""
+Forecasting Engine Module
+
+Recursive multi-step energy forecasts built from the households' actual
+recent readings, with the features defined in features.py. Each household's
+latest readings come from the feature store (see feature_store.py and
+model_registry.forecast_readings).
+
+The model predicts the next 5-minute reading from the features of the
+current one. Forecasts are rolled forward one 5-minute step at a time for
+all households at once: the calendar part of the linear model is a single
+matrix product over every step, and each step updates an (H x 6) window of
+recent readings with array operations.
+"""
+
+from datetime import timedelta
+import numpy as np
+
+from features import FEATURE_COLUMNS, TIME_CATEGORY_NAMES, calendar_features, window_features
+
+READING_INTERVAL = timedelta(minutes=5)
+STEPS_PER_HOUR = 12
+
+# Seed window used when a household has no readings at all (the old
+# hardcoded forecast assumed 0.2 kWh per reading)
+DEFAULT_READING_KWH = 0.2
+
+
+def linear_parameters(model):
+    """(coef, intercept) of a fitted linear model, or None for other estimators."""
+    coef = getattr(model, 'coef_', None)
+    if coef is None:
+        return None
+    return np.asarray(coef, dtype=np.float64), np.asarray(model.intercept_, dtype=np.float64)
+
+
+def forecast_batch(history, start_time, coef, intercept, steps=24 * STEPS_PER_HOUR, model=None):
+    """
+    Recursive 5-minute forecasts for many households at once.
+
+    Args:
+        history (ndarray): (H, 6) latest readings per household, oldest first
+        start_time (datetime): Timestamp of the first forecast step
+        coef (ndarray): (10,) shared or (H, 10) per-household coefficients
+        intercept: Scalar or (H,) intercepts
+        steps (int): Number of 5-minute steps
+        model: Fallback estimator with predict() when coef is None
+
+    Returns:
+        ndarray: (H, steps) predicted kWh per 5-minute reading (clipped at 0)
+    """
+    household_count = history.shape[0]
+    window = np.array(history, dtype=np.float64)
+
+    # Each step is predicted from the features of the reading before it
+    step_times = np.datetime64(start_time, 'm') + np.arange(steps) * np.timedelta64(5, 'm')
+    calendar = calendar_features(step_times - np.timedelta64(5, 'm'))
+
+    if coef is not None:
+        coef = np.broadcast_to(coef, (household_count, len(FEATURE_COLUMNS)))
+        intercept = np.broadcast_to(intercept, (household_count,))
+        # (steps, H): calendar contribution for every step in one product
+        calendar_part = calendar @ coef[:, :4].T + intercept
+        window_coef = coef[:, 4:]
+
+    predictions = np.empty((household_count, steps))
+    for step in range(steps):
+        dynamic = window_features(window)
+        if coef is not None:
+            predicted = calendar_part[step] + np.einsum('hk,hk->h', dynamic, window_coef)
+        else:
+            features = np.column_stack([np.broadcast_to(calendar[step], (household_count, 4)), dynamic])
+            predicted = np.asarray(model.predict(features), dtype=np.float64)
+
+        predicted = np.maximum(predicted, 0.0)
+        predictions[:, step] = predicted
+        window[:, :-1] = window[:, 1:]
+        window[:, -1] = predicted
+
+    return predictions
+
+
+def hourly_means(predictions):
+    """Average 5-minute predictions within each hour: (H, steps) -> (H, steps // 12)."""
+    household_count, steps = predictions.shape
+    hours = steps // STEPS_PER_HOUR
+    return predictions[:, :hours * STEPS_PER_HOUR].reshape(household_count, hours, STEPS_PER_HOUR).mean(axis=2)
+
+
+def format_forecast(start_time, hourly_kwh):
+    """Forecast list in the /api/v1/usage/predict response format."""
+    forecasts = []
+    for hour_offset, predicted_kwh in enumerate(hourly_kwh):
+        forecast_time = start_time + timedelta(hours=hour_offset)
+        forecasts.append({
+            'timestamp': forecast_time.isoformat(),
+            'predicted_kwh': round(float(predicted_kwh), 4),
+            'hour': forecast_time.hour,
+            'day_of_week': forecast_time.strftime('%A'),
+            'time_category': TIME_CATEGORY_NAMES[forecast_time.hour // 6]
+        })
+    return forecasts
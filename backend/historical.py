@@ -0,0 +1,123 @@
+"""
+Historical Usage Module
+
+Query helpers behind /api/v1/usage/historical. Readings are read as plain
+column rows (no ORM objects) ordered by (timestamp, id), which gives a
+stable keyset for cursor pagination and lets full-history responses be
+streamed in fixed-size chunks instead of built in memory.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from models import db, EnergyReading
+
+# Rows fetched from the database per streamed chunk
+STREAM_CHUNK_SIZE = 2000
+
+# Upper bound on ?limit= for paginated requests
+MAX_PAGE_SIZE = 10000
+
+READING_COLUMNS = (
+    EnergyReading.id,
+    EnergyReading.timestamp,
+    EnergyReading.household_id,
+    EnergyReading.energy_kwh,
+    EnergyReading.future_energy_kwh,
+)
+
+
+def build_historical_query(household_id=None, start_dt=None, end_dt=None, columns=READING_COLUMNS):
+    """Core SELECT of reading columns with the endpoint filters, in keyset order."""
+    query = db.select(*columns)
+
+    if household_id is not None:
+        query = query.where(EnergyReading.household_id == household_id)
+    if start_dt is not None:
+        query = query.where(EnergyReading.timestamp >= start_dt)
+    if end_dt is not None:
+        query = query.where(EnergyReading.timestamp <= end_dt)
+
+    return query.order_by(EnergyReading.timestamp, EnergyReading.id)
+
+
+def encode_cursor(timestamp, reading_id):
+    """Opaque cursor pointing just after the given (timestamp, id)."""
+    raw = f"{timestamp.isoformat()}|{reading_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, reading_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(reading_id)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def fetch_page(query, limit, cursor=None):
+    """
+    Fetch one page of readings after `cursor`.
+
+    Returns:
+        tuple: (list of reading dicts, next cursor or None when exhausted)
+    """
+    if cursor is not None:
+        after_timestamp, after_id = decode_cursor(cursor)
+        query = query.where(
+            db.tuple_(EnergyReading.timestamp, EnergyReading.id) > db.tuple_(after_timestamp, after_id)
+        )
+
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+    return [reading_row_to_dict(row) for row in rows], next_cursor
+
+
+def reading_row_to_dict(row):
+    """Same payload as EnergyReading.to_dict, for a column row."""
+    return {
+        'id': row.id,
+        'timestamp': row.timestamp.isoformat(),
+        'household_id': row.household_id,
+        'energy_kwh': row.energy_kwh,
+        'future_energy_kwh': row.future_energy_kwh
+    }
+
+
+def iter_row_chunks(query, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield lists of rows from a server-side cursor without buffering the result."""
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(chunk_size):
+            yield rows
+
+
+def stream_ndjson(query):
+    """Generate newline-delimited JSON, one reading per line."""
+    for rows in iter_row_chunks(query):
+        yield ''.join(json.dumps(reading_row_to_dict(row)) + '\n' for row in rows)
+
+
+def stream_json(query):
+    """
+    Generate the classic {"data": [...], "count": N} document incrementally.
+    `count` is emitted last because it is only known once the rows are out.
+    """
+    count = 0
+    yield '{"data": ['
+    for rows in iter_row_chunks(query):
+        chunk = ', '.join(json.dumps(reading_row_to_dict(row)) for row in rows)
+        yield (', ' if count else '') + chunk
+        count += len(rows)
+    yield f'], "count": {count}}}\n'
@@ -0,0 +1,366 @@
+"""
+Bulk Ingest Module
+
+Loads energy CSV exports into the energy_readings table. The CSV is read in
+chunks and each chunk is converted column-wise and written in one batch
+(executemany on SQLite, COPY on PostgreSQL; see storage.py), so no ORM
+objects (or per-row Python loops) are involved.
+
+Two modes are supported:
+- bulk_load_csv: full reload, replacing everything in the table
+- incremental_load_csv: append-only, resuming from the byte offset reached
+  last time and skipping readings at or before each household's watermark
+
+Rollup tables and the feature store are kept in step inside the same
+transaction (see rollups.py and feature_store.py), and the stored forecasts
+of households that receive readings are dropped (see batch_forecast.py).
+"""
+
+import io
+import os
+import time
+from datetime import datetime
+import pandas as pd
+
+from schema import rebuild_watermarks
+from rollups import apply_readings, rebuild_rollups
+import feature_store
+from storage import get_storage
+
+# Rows per CSV chunk / insert batch
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def parse_timestamps(values):
+    """
+    Parse timestamps to naive datetime64. Timestamps with an offset or zone
+    ('2026-10-17T04:10:00Z') are converted to UTC and stored without it, as
+    every stored timestamp is naive; naive ones are kept as they are.
+    """
+    try:
+        # The exports are ISO 8601; a fixed format parses much faster than inference
+        timestamps = pd.to_datetime(values, format='ISO8601', utc=True)
+    except ValueError:
+        timestamps = pd.to_datetime(values, utc=True)
+    return timestamps.dt.tz_localize(None)
+
+
+def prepare_chunk(df):
+    """
+    Normalise a raw CSV chunk into the energy_readings column layout.
+
+    Args:
+        df (DataFrame): Chunk with timestamp, household_id,
+                        energy_consumption_kWh and optionally
+                        future_consumption_kWh columns
+
+    Returns:
+        DataFrame: Columns timestamp (naive datetime64, UTC for timestamps
+                   that carried an offset), household_id (int64),
+                   energy_kwh (float64), future_energy_kwh (float64)
+    """
+    df = df.dropna(subset=['energy_consumption_kWh'])
+    if 'future_consumption_kWh' in df.columns:
+        future = df['future_consumption_kWh'].astype('float64')
+    else:
+        future = pd.Series(float('nan'), index=df.index)
+
+    return pd.DataFrame({
+        'timestamp': parse_timestamps(df['timestamp']),
+        'household_id': df['household_id'].astype('int64'),
+        'energy_kwh': df['energy_consumption_kWh'].astype('float64'),
+        'future_energy_kwh': future
+    })
+
+
+def iter_csv_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, limit_rows=None, names=None):
+    """
+    Yield prepared chunks from an energy CSV.
+
+    Args:
+        source: File path or binary file object
+        chunk_size (int): Rows per chunk
+        limit_rows (int): Maximum rows to read (None for all)
+        names (list): Column names when `source` starts mid-file (no header)
+    """
+    read_kwargs = {'chunksize': chunk_size, 'nrows': limit_rows}
+    if names is not None:
+        read_kwargs.update(header=None, names=names)
+
+    for raw_chunk in pd.read_csv(source, **read_kwargs):
+        chunk = prepare_chunk(raw_chunk)
+        if len(chunk):
+            yield chunk
+
+
+def filter_new_readings(chunk, watermarks):
+    """
+    Drop readings at or before their household's watermark and duplicate
+    (household_id, timestamp) pairs within the chunk.
+
+    Args:
+        chunk (DataFrame): Prepared chunk
+        watermarks (dict): household_id -> last ingested pd.Timestamp
+
+    Returns:
+        DataFrame: Readings that are new
+    """
+    if watermarks:
+        household_marks = chunk['household_id'].map(watermarks)
+        is_new = household_marks.isna() | (chunk['timestamp'] > household_marks)
+        chunk = chunk[is_new]
+
+    return chunk.drop_duplicates(subset=['household_id', 'timestamp'])
+
+
+def advance_watermarks(watermarks, chunk):
+    """Raise in-memory watermarks to the newest timestamp per household in `chunk`."""
+    for household_id, last_ts in chunk.groupby('household_id')['timestamp'].max().items():
+        current = watermarks.get(household_id)
+        if current is None or last_ts > current:
+            watermarks[household_id] = last_ts
+
+
+def load_watermarks(cursor):
+    """Read household_watermarks into a {household_id: pd.Timestamp} dict."""
+    cursor.execute("SELECT household_id, last_timestamp FROM household_watermarks")
+    return {household_id: pd.Timestamp(last_ts) for household_id, last_ts in cursor.fetchall()}
+
+
+def save_watermarks(storage, cursor, watermarks):
+    if watermarks:
+        storage.upsert_watermarks(cursor, watermarks)
+
+
+class _BoundedReader(io.RawIOBase):
+    """Raw reader exposing bytes [start, end) of a file, for tail ingestion."""
+
+    def __init__(self, fh, start, end):
+        self._fh = fh
+        self._fh.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        size = min(len(buffer), self._remaining)
+        data = self._fh.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _complete_lines_end(fh, file_size):
+    """Offset just past the last newline, so a partially written row is left for next time."""
+    block = 65536
+    position = file_size
+    while position > 0:
+        start = max(0, position - block)
+        fh.seek(start)
+        data = fh.read(position - start)
+        newline = data.rfind(b'\n')
+        if newline != -1:
+            return start + newline + 1
+        position = start
+    return 0
+
+
+def _save_file_offset(storage, cursor, abs_path, header, byte_offset):
+    storage.save_file_offset(cursor, abs_path, header, byte_offset, datetime.now())
+
+
+def _record_file_offset(storage, cursor, file_path):
+    """Mark `file_path` as ingested up to its last complete line."""
+    abs_path = os.path.abspath(file_path)
+    with open(abs_path, 'rb') as fh:
+        header = fh.readline().decode('utf-8').strip()
+        end_offset = _complete_lines_end(fh, os.path.getsize(abs_path))
+    _save_file_offset(storage, cursor, abs_path, header, end_offset)
+
+
+def _report(label, rows_loaded, started):
+    elapsed = time.perf_counter() - started
+    rate = rows_loaded / elapsed if elapsed > 0 else 0.0
+    print(f"{label} {rows_loaded} readings in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return {'rows': rows_loaded, 'seconds': elapsed, 'rows_per_sec': rate}
+
+
+def append_readings(engine, readings):
+    """
+    Append already-parsed readings, applying the same watermark and dedupe
+    rules as incremental_load_csv.
+
+    Args:
+        engine: SQLAlchemy engine bound to the energy database
+        readings (DataFrame): Readings in prepare_chunk() layout
+
+    Returns:
+        DataFrame: The readings that were appended
+    """
+    storage = get_storage(engine)
+    with storage.write_connection(engine) as (raw_conn, cursor):
+        watermarks = load_watermarks(cursor)
+        new_rows = filter_new_readings(readings, watermarks)
+        if len(new_rows):
+            storage.insert_readings(cursor, new_rows)
+            apply_readings(storage, cursor, new_rows)
+            feature_store.apply_readings(storage, cursor, new_rows)
+            storage.delete_forecasts(cursor, new_rows['household_id'].unique())
+            touched = {}
+            advance_watermarks(touched, new_rows)
+            save_watermarks(storage, cursor, touched)
+
+    return new_rows
+
+
+def bulk_load_csv(engine, file_path, limit_rows=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  replace=True):
+    """
+    Load an energy CSV into energy_readings using chunked batch inserts.
+
+    On a full reload the secondary indexes are dropped first and rebuilt
+    after the last chunk, which is cheaper than maintaining them row by row.
+    Rollups, watermarks and the feature store are rebuilt once the readings
+    are in; that time is reported separately from the load itself.
+
+    Args:
+        engine: SQLAlchemy engine bound to the energy database
+        file_path (str): Path to energy CSV file
+        limit_rows (int): Maximum rows to read (None for all)
+        chunk_size (int): Rows per chunk
+        replace (bool): Delete existing readings first (same transaction)
+
+    Returns:
+        dict: {'rows': rows inserted, 'seconds': load time incl. indexes,
+               'rows_per_sec': load rate, 'derived_seconds': rollup,
+               watermark and feature store rebuild time}
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: File {file_path} not found!")
+        return {'rows': 0, 'seconds': 0.0, 'rows_per_sec': 0.0, 'derived_seconds': 0.0}
+
+    print(f"Bulk loading data from {file_path} (chunks of {chunk_size} rows)...")
+    if limit_rows:
+        print(f"Limiting to first {limit_rows} rows for faster loading...")
+
+    started = time.perf_counter()
+    rows_loaded = 0
+    storage = get_storage(engine)
+
+    with storage.write_connection(engine, bulk_load=replace) as (raw_conn, cursor):
+        index_statements = []
+        # Stored forecasts were seeded from the readings being replaced
+        storage.clear_table(cursor, 'forecasts')
+        if replace:
+            storage.clear_table(cursor, 'energy_readings')
+            storage.clear_table(cursor, 'ingested_files')
+            index_statements = storage.drop_secondary_indexes(cursor)
+
+        for chunk in iter_csv_chunks(file_path, chunk_size, limit_rows):
+            # Rows already stored (or repeated in the file) are not counted
+            rows_loaded += storage.insert_readings(cursor, chunk)
+            print(f"  Loaded {rows_loaded} rows...")
+
+        for statement in index_statements:
+            cursor.execute(statement)
+
+        if limit_rows is None:
+            # The whole file is in; later incremental runs start from its end
+            _record_file_offset(storage, cursor, file_path)
+
+        stats = _report("Successfully loaded", rows_loaded, started)
+
+        derived_started = time.perf_counter()
+        rebuild_rollups(storage, raw_conn)
+
+    with engine.begin() as conn:
+        rebuild_watermarks(conn)
+        feature_store.rebuild_feature_store(conn)
+
+    stats['derived_seconds'] = time.perf_counter() - derived_started
+    print(f"Rebuilt rollups, watermarks and features in {stats['derived_seconds']:.2f}s")
+    return stats
+
+
+def incremental_load_csv(engine, file_path, chunk_size=DEFAULT_CHUNK_SIZE, on_readings=None):
+    """
+    Append new readings from an energy CSV without touching existing data.
+
+    Only bytes appended since the previous run are parsed (when the file has
+    shrunk or its header changed it is re-read from the start). Readings at
+    or before a household's watermark are skipped, as are duplicate
+    (household_id, timestamp) pairs, so re-running on the same file is a no-op.
+
+    Args:
+        engine: SQLAlchemy engine bound to the energy database
+        file_path (str): Path to energy CSV file
+        chunk_size (int): Rows per chunk
+        on_readings (callable): Called with each DataFrame of appended
+                                readings once the load has committed
+
+    Returns:
+        dict: {'rows': rows appended, 'skipped': rows already present,
+               'households': ids that received readings,
+               'seconds': elapsed, 'rows_per_sec': rate}
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: File {file_path} not found!")
+        return {'rows': 0, 'skipped': 0, 'households': [], 'seconds': 0.0, 'rows_per_sec': 0.0}
+
+    started = time.perf_counter()
+    abs_path = os.path.abspath(file_path)
+    file_size = os.path.getsize(abs_path)
+    rows_loaded = 0
+    rows_skipped = 0
+    households = set()
+    appended = []
+    storage = get_storage(engine)
+
+    with storage.write_connection(engine) as (raw_conn, cursor), open(abs_path, 'rb') as fh:
+        header_line = fh.readline()
+        header = header_line.decode('utf-8').strip()
+        names = header.split(',')
+
+        previous = storage.file_offset(cursor, abs_path)
+        if previous and previous[0] == header and previous[1] <= file_size:
+            start_offset = previous[1]
+        else:
+            start_offset = len(header_line)
+
+        end_offset = _complete_lines_end(fh, file_size)
+        print(f"Incremental load from {file_path}: "
+              f"{max(0, end_offset - start_offset)} new bytes")
+
+        watermarks = load_watermarks(cursor)
+
+        if end_offset > start_offset:
+            tail = io.BufferedReader(_BoundedReader(fh, start_offset, end_offset))
+            for chunk in iter_csv_chunks(tail, chunk_size, names=names):
+                new_rows = filter_new_readings(chunk, watermarks)
+                rows_skipped += len(chunk) - len(new_rows)
+                if len(new_rows):
+                    storage.insert_readings(cursor, new_rows)
+                    apply_readings(storage, cursor, new_rows)
+                    feature_store.apply_readings(storage, cursor, new_rows)
+                    storage.delete_forecasts(cursor, new_rows['household_id'].unique())
+                    advance_watermarks(watermarks, new_rows)
+                    households.update(int(h) for h in new_rows['household_id'].unique())
+                    rows_loaded += len(new_rows)
+                    if on_readings is not None:
+                        appended.append(new_rows)
+
+        save_watermarks(storage, cursor, watermarks)
+        _save_file_offset(storage, cursor, abs_path, header, max(end_offset, start_offset))
+
+    for new_rows in appended:
+        on_readings(new_rows)
+
+    stats = _report("Appended", rows_loaded, started)
+    stats['skipped'] = rows_skipped
+    stats['households'] = sorted(households)
+    if rows_skipped:
+        print(f"Skipped {rows_skipped} readings already ingested")
+    return stats
@@ -0,0 +1,316 @@
+"""
+Latest Window Module
+
+In-memory window of the last 24 hours of 5-minute readings of every
+household, kept current by ingestion. Endpoints that only need the newest
+readings (current consumption, appliance status, optimization suggestions,
+live rolling stats) read from here instead of querying SQLite on every poll.
+
+Each household has a fixed-size ring buffer: preallocated int64 timestamps
+(microseconds since the epoch) and float64 energy values, so memory per
+household is constant and appends never reallocate. Energy keeps the
+database's float64 values, so rule thresholds compare exactly as in SQL.
+"""
+
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from models import db, EnergyReading, HouseholdWatermark
+from storage import days_before
+
+# 24 hours of 5-minute readings. Also covers the 100-reading fallback of
+# get_latest_usage_data even when a single household has all of them.
+DEFAULT_WINDOW_SIZE = 288
+
+KWH_TO_KW = 12  # 5-minute reading -> hourly rate
+
+
+def to_epoch_us(timestamps):
+    return np.asarray(timestamps, dtype='datetime64[us]').astype(np.int64)
+
+
+def from_epoch_us(value):
+    return np.datetime64(int(value), 'us').astype(datetime)
+
+
+def recent_readings(session, length, household_ids=None, max_age_days=None):
+    """
+    Last `length` readings of every household (or the given ones), oldest
+    first per household; with `max_age_days`, only those within that many
+    days of the household's newest reading.
+
+    A materialized CTE first finds, once per household, where its last
+    `length` readings start (its length-th newest timestamp, or else its
+    oldest one or the age bound). Each household's readings are then one
+    range search of the covering (household_id, timestamp, energy_kwh)
+    index, with no window function ranking or sorting readings in SQL.
+
+    Returns:
+        list: [(household_id, timestamp, energy_kwh)]
+    """
+    newer = db.aliased(EnergyReading)
+    newest_first = db.select(newer.timestamp).where(
+        newer.household_id == HouseholdWatermark.household_id
+    ).order_by(newer.timestamp.desc())
+    nth_newest = newest_first.limit(1).offset(length - 1).scalar_subquery()
+    if max_age_days is None:
+        oldest = db.select(db.func.min(newer.timestamp)).where(
+            newer.household_id == HouseholdWatermark.household_id
+        ).scalar_subquery()
+    else:
+        oldest = days_before(HouseholdWatermark.last_timestamp, max_age_days)
+
+    bounds = db.select(
+        HouseholdWatermark.household_id,
+        # Households with fewer readings have no length-th newest one
+        db.func.coalesce(nth_newest, oldest).label('window_start')
+    )
+    if max_age_days is not None:
+        bounds = bounds.add_columns(oldest.label('recent_start'))
+    if household_ids is not None:
+        bounds = bounds.where(HouseholdWatermark.household_id.in_([int(h) for h in household_ids]))
+    # Materialized, so the subqueries run once per household rather than
+    # once per candidate reading
+    bounds = bounds.cte('bounds').prefix_with('MATERIALIZED')
+
+    query = session.query(
+        bounds.c.household_id,
+        EnergyReading.timestamp,
+        EnergyReading.energy_kwh
+    ).join(
+        EnergyReading, EnergyReading.household_id == bounds.c.household_id
+    ).filter(
+        EnergyReading.timestamp >= bounds.c.window_start
+    )
+    if max_age_days is not None:
+        query = query.filter(EnergyReading.timestamp >= bounds.c.recent_start)
+    rows = query.all()
+
+    # Usually already in this order (bounds in household order, each range
+    # in index order), which the sort detects in one pass
+    return sorted(rows, key=lambda row: (row[0], row[1]))
+
+
+class ReadingRing:
+    """Fixed-capacity ring of (timestamp, energy_kwh) for one household."""
+
+    __slots__ = ('timestamps', 'energy', 'appended')
+
+    def __init__(self, capacity):
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.energy = np.zeros(capacity, dtype=np.float64)
+        self.appended = 0
+
+    @property
+    def capacity(self):
+        return len(self.timestamps)
+
+    @property
+    def size(self):
+        return min(self.appended, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.energy.nbytes
+
+    def extend(self, timestamps, energy):
+        """Append readings given oldest first; only the newest `capacity` are kept."""
+        count = len(timestamps)
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            energy = energy[-self.capacity:]
+            self.appended += count - self.capacity
+            count = self.capacity
+
+        positions = (self.appended + np.arange(count)) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.energy[positions] = energy
+        self.appended += count
+
+    def latest(self):
+        """(timestamp_us, energy_kwh) of the newest reading."""
+        position = (self.appended - 1) % self.capacity
+        return self.timestamps[position], self.energy[position]
+
+    def ordered(self):
+        """(timestamps, energy) oldest first."""
+        if self.appended <= self.capacity:
+            return self.timestamps[:self.appended], self.energy[:self.appended]
+        split = self.appended % self.capacity
+        return (
+            np.concatenate([self.timestamps[split:], self.timestamps[:split]]),
+            np.concatenate([self.energy[split:], self.energy[:split]])
+        )
+
+
+class LatestWindow:
+    """Per-household ring buffers of the most recent readings."""
+
+    def __init__(self, window_size=DEFAULT_WINDOW_SIZE):
+        self.window_size = window_size
+        self.loaded = False
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def _extend(self, rings, household_ids, timestamps, energy):
+        """Append arrays sorted by (household_id, timestamp) to `rings`."""
+        if not len(household_ids):
+            return
+        boundaries = np.flatnonzero(np.diff(household_ids)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(household_ids)]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            household_id = int(household_ids[start])
+            if household_id not in rings:
+                rings[household_id] = ReadingRing(self.window_size)
+            rings[household_id].extend(timestamps[start:end], energy[start:end])
+
+    def load(self, session):
+        """Replace the window with the latest readings from the database."""
+        rows = recent_readings(session, self.window_size, max_age_days=1)
+        rings = {}
+        if rows:
+            household_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            timestamps = to_epoch_us([row[1] for row in rows])
+            energy = np.array([row[2] for row in rows], dtype=np.float64)
+            self._extend(rings, household_ids, timestamps, energy)
+
+        with self._lock:
+            self._rings = rings
+            self.loaded = True
+
+    def append(self, readings):
+        """
+        Add newly ingested readings.
+
+        Args:
+            readings (DataFrame): Readings in ingest.prepare_chunk() layout that
+                                  are newer than anything already in the window
+        """
+        if not len(readings):
+            return
+
+        ordered = readings.sort_values(['household_id', 'timestamp'])
+        household_ids = ordered['household_id'].to_numpy(dtype=np.int64)
+        timestamps = to_epoch_us(ordered['timestamp'].values)
+        energy = ordered['energy_kwh'].to_numpy(dtype=np.float64)
+        with self._lock:
+            self._extend(self._rings, household_ids, timestamps, energy)
+
+    def latest_per_household(self):
+        """
+        Returns:
+            list: [(household_id, energy_kwh, timestamp)] ordered by household_id
+        """
+        with self._lock:
+            latest = [(household_id, ring.latest()) for household_id, ring in sorted(self._rings.items())]
+        return [
+            (household_id, float(energy_kwh), from_epoch_us(timestamp))
+            for household_id, (timestamp, energy_kwh) in latest
+        ]
+
+    def latest(self, household_id=None):
+        """
+        Newest reading of one household, or across all households.
+
+        Returns:
+            tuple: (household_id, energy_kwh, timestamp), or None if there is none
+        """
+        with self._lock:
+            if household_id is not None:
+                candidates = [(household_id, self._rings[household_id])] if household_id in self._rings else []
+            else:
+                candidates = list(self._rings.items())
+            latest = [(ring.latest(), household_id) for household_id, ring in candidates]
+
+        if not latest:
+            return None
+        (timestamp, energy_kwh), household_id = max(latest, key=lambda reading: reading[0][0])
+        return household_id, float(energy_kwh), from_epoch_us(timestamp)
+
+    def recent(self, since=None, limit=100, household_id=None):
+        """
+        Newest readings across all households (or one), newest first.
+
+        Args:
+            since (datetime): Only readings at or after this time
+            limit (int): Maximum readings returned
+            household_id (int): Optional household filter
+
+        Returns:
+            list: [{'household_id', 'energy_kwh', 'timestamp'}]
+        """
+        with self._lock:
+            parts = [
+                (ring_household, ring.ordered()) for ring_household, ring in self._rings.items()
+                if household_id is None or ring_household == household_id
+            ]
+            if not parts:
+                return []
+            # Concatenating copies the ring contents before the lock is released
+            household_ids = np.concatenate([
+                np.full(len(timestamps), ring_household, dtype=np.int64)
+                for ring_household, (timestamps, _) in parts
+            ])
+            timestamps = np.concatenate([timestamps for _, (timestamps, _) in parts])
+            energy = np.concatenate([values for _, (_, values) in parts])
+
+        if since is not None:
+            keep = timestamps >= to_epoch_us(since)
+            household_ids, timestamps, energy = household_ids[keep], timestamps[keep], energy[keep]
+
+        newest = np.argsort(-timestamps, kind='stable')[:limit]
+        return [
+            {'household_id': household_id, 'energy_kwh': energy_kwh, 'timestamp': from_epoch_us(timestamp)}
+            for household_id, energy_kwh, timestamp in zip(
+                household_ids[newest].tolist(), energy[newest].tolist(), timestamps[newest].tolist()
+            )
+        ]
+
+    def household_stats(self, household_id, minutes=60):
+        """
+        Rolling statistics over a household's readings in the last `minutes`
+        before its newest reading.
+
+        Returns:
+            dict: current_kw, reading_count, total_kwh, mean/min/max kW and
+                  std of kW, or None for an unknown household
+        """
+        with self._lock:
+            ring = self._rings.get(household_id)
+            if ring is None or ring.size == 0:
+                return None
+            timestamps, energy = ring.ordered()
+            timestamps, energy = timestamps.copy(), energy.copy()
+
+        window_start = timestamps[-1] - minutes * 60 * 1000000
+        values = energy[timestamps > window_start]
+        kw = values * KWH_TO_KW
+        return {
+            'household_id': household_id,
+            'timestamp': from_epoch_us(timestamps[-1]).isoformat(),
+            'current_kw': round(float(kw[-1]), 3),
+            'window_minutes': minutes,
+            'reading_count': int(len(values)),
+            'total_kwh': round(float(values.sum()), 4),
+            'mean_kw': round(float(kw.mean()), 3),
+            'min_kw': round(float(kw.min()), 3),
+            'max_kw': round(float(kw.max()), 3),
+            'std_kw': round(float(kw.std()), 3)
+        }
+
+    def memory_report(self):
+        """Fixed per-household buffer size and total array memory in bytes."""
+        with self._lock:
+            household_count = len(self._rings)
+            total_bytes = sum(ring.nbytes for ring in self._rings.values())
+        return {
+            'households': household_count,
+            'window_size': self.window_size,
+            'bytes_per_household': self.window_size * (
+                np.dtype(np.int64).itemsize + np.dtype(np.float64).itemsize
+            ),
+            'total_bytes': total_bytes
+        }
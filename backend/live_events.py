@@ -0,0 +1,119 @@
+"""
+Live Events Module
+
+Server-Sent Events fan-out for dashboard clients. Each event is computed
+and serialized once when ingestion produces it, then queued to every
+subscriber, so backend work scales with ingest rate rather than with the
+number of clients times their poll rate.
+"""
+
+import json
+import queue
+import threading
+
+# Messages buffered per client; a client that falls further behind loses
+# its oldest messages rather than blocking ingestion
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+# Clients reconnect after this many milliseconds if the stream drops
+RETRY_MILLISECONDS = 3000
+
+
+def format_event(event, data, event_id=None):
+    """One SSE message: optional id, event name and a single JSON data line."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroadcaster:
+    """Fans serialized events out to per-subscriber queues."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._last_data = {}
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data, only_if_changed=False):
+        """
+        Send an event to every subscriber.
+
+        Args:
+            event (str): SSE event name
+            data: JSON-serializable payload
+            only_if_changed (bool): Skip the event if its payload equals the
+                                    last one published under this name
+
+        Returns:
+            bool: Whether the event was sent
+        """
+        serialized = json.dumps(data, sort_keys=True)
+        with self._lock:
+            if only_if_changed and self._last_data.get(event) == serialized:
+                return False
+            self._last_data[event] = serialized
+            message = format_event(event, data, self._next_id)
+            self._next_id += 1
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Slow client: drop its oldest message to make room
+                try:
+                    subscriber.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self.dropped += 1
+
+        self.published += 1
+        return True
+
+    def stream(self, subscriber, heartbeat_seconds=HEARTBEAT_SECONDS):
+        """Generate the SSE response body for one subscriber until it disconnects."""
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            'subscribers': self.subscriber_count,
+            'published': self.published,
+            'dropped': self.dropped
+        }
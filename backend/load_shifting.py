@@ -0,0 +1,381 @@
+"""
+Load Shifting Module
+
+Minimum-cost scheduling of shiftable appliance runs (dishwasher, EV
+charging, ...) on top of each household's forecast base load, priced with
+the time-of-use schedule in 5-minute steps.
+
+A run of d steps drawing p kW costs p / 12 times the sum of the step prices
+it covers. That sum for every possible start comes from one cumulative sum
+of the price vector, so evaluating all candidate starts of all runs is a
+masked argmin over a (runs x starts) matrix rather than a loop.
+
+With a per-household power limit (max_kw), runs are placed greedily, largest
+first: each round places one run per household at the cheapest start whose
+window keeps base load plus already placed runs under the limit. Runs that
+fit nowhere stay at their preferred start and are reported as unplaced.
+"""
+
+import math
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from cost_engine import BASE_RATE_PER_KWH
+from optimization_rules import get_tariff_schedule
+from tariffs import MINUTES_PER_DAY, parse_clock
+
+STEP_MINUTES = 5
+STEPS_PER_HOUR = 60 // STEP_MINUTES
+
+MAX_HORIZON_HOURS = 48
+
+# Runs (appliances x households) accepted in one simulation
+MAX_RUNS = 200000
+
+# Upper bound on cells in one (runs x starts) cost block
+SCHEDULE_BLOCK_CELLS = 1 << 22
+
+# Columnar description of the runs to schedule; households are row indices
+# into the base load matrix, appliances index into the appliance names
+Runs = namedtuple('Runs', [
+    'households', 'appliances', 'power_kw', 'durations', 'earliest', 'latest_start', 'preferred'
+])
+
+
+def horizon_start(moment=None):
+    """First 5-minute boundary at or after `moment` (default: now)."""
+    moment = moment or datetime.now()
+    floored = moment.replace(second=0, microsecond=0) - timedelta(minutes=moment.minute % STEP_MINUTES)
+    return floored if floored == moment else floored + timedelta(minutes=STEP_MINUTES)
+
+
+def step_times(start_time, steps):
+    return np.datetime64(start_time, 'm') + np.arange(steps) * np.timedelta64(STEP_MINUTES, 'm')
+
+
+def step_prices(start_time, steps, schedule=None):
+    """Time-of-use price per kWh of each 5-minute step."""
+    schedule = schedule or get_tariff_schedule()
+    return BASE_RATE_PER_KWH * schedule.multipliers_for(step_times(start_time, steps))
+
+
+def window_sums(values, duration):
+    """Sum over every run of `duration` consecutive steps: (T,) -> (T - duration + 1,)."""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    return cumulative[duration:] - cumulative[:-duration]
+
+
+def clock_step(start_time, clock, after_step=0):
+    """
+    First step at or after `after_step` whose time of day is `clock`.
+
+    Raises:
+        ValueError: If `clock` is not an 'HH:MM' time
+    """
+    try:
+        minute_of_day = parse_clock(clock)
+    except (IndexError, ValueError):
+        raise ValueError(f"Invalid time '{clock}', expected HH:MM")
+    current = start_time.hour * 60 + start_time.minute + after_step * STEP_MINUTES
+    minutes_ahead = (minute_of_day - current) % MINUTES_PER_DAY
+    return after_step + -(-minutes_ahead // STEP_MINUTES)
+
+
+def build_runs(appliances, household_ids, start_time, steps):
+    """
+    Expand appliance specs into one run per (appliance, household).
+
+    Args:
+        appliances (list): Dicts with name, power_kw and duration_minutes, and
+                           optionally earliest, deadline and preferred_start
+                           ('HH:MM', next occurrence) and household_ids
+                           (default: every household)
+        household_ids (ndarray): Household of each base load row
+        start_time (datetime): Time of step 0
+        steps (int): Horizon length in 5-minute steps
+
+    Returns:
+        tuple: (appliance names, Runs)
+
+    Raises:
+        ValueError: If a spec is invalid or its run cannot fit in the horizon
+    """
+    if not isinstance(appliances, list) or not appliances:
+        raise ValueError("Expected a non-empty list of appliances")
+
+    row_of = {int(household_id): row for row, household_id in enumerate(household_ids)}
+    all_rows = np.arange(len(household_ids))
+    names = []
+    columns = {field: [] for field in Runs._fields}
+
+    for index, spec in enumerate(appliances):
+        if not isinstance(spec, dict):
+            raise ValueError("Each appliance must be an object")
+        name = str(spec.get('name') or f"Appliance {index + 1}")
+        try:
+            power_kw = float(spec['power_kw'])
+            duration_minutes = float(spec['duration_minutes'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{name}: power_kw and duration_minutes are required numbers")
+        if not (math.isfinite(power_kw) and math.isfinite(duration_minutes)):
+            raise ValueError(f"{name}: power_kw and duration_minutes must be finite numbers")
+        if not (power_kw > 0 and duration_minutes > 0):
+            raise ValueError(f"{name}: power_kw and duration_minutes must be positive")
+
+        duration = int(np.ceil(duration_minutes / STEP_MINUTES))
+        earliest = clock_step(start_time, spec['earliest']) if spec.get('earliest') else 0
+        end = steps
+        if spec.get('deadline'):
+            end = min(end, clock_step(start_time, spec['deadline'], earliest + 1))
+        latest_start = end - duration
+        if latest_start < earliest:
+            raise ValueError(
+                f"{name}: a {duration * STEP_MINUTES}-minute run does not fit between "
+                f"its earliest start and deadline within the horizon"
+            )
+        preferred = earliest
+        if spec.get('preferred_start'):
+            preferred = min(max(clock_step(start_time, spec['preferred_start']), earliest), latest_start)
+
+        if spec.get('household_ids') is None:
+            rows = all_rows
+        elif not isinstance(spec['household_ids'], list):
+            raise ValueError(f"{name}: household_ids must be a list")
+        else:
+            unknown = [h for h in spec['household_ids'] if row_of.get(h) is None]
+            if unknown:
+                raise ValueError(f"{name}: no forecast for households {unknown[:10]}")
+            rows = np.array([row_of[h] for h in spec['household_ids']], dtype=np.int64)
+
+        count = len(rows)
+        names.append(name)
+        columns['households'].append(rows)
+        columns['appliances'].append(np.full(count, index))
+        columns['power_kw'].append(np.full(count, power_kw))
+        columns['durations'].append(np.full(count, duration))
+        columns['earliest'].append(np.full(count, earliest))
+        columns['latest_start'].append(np.full(count, latest_start))
+        columns['preferred'].append(np.full(count, preferred))
+
+    runs = Runs(**{field: np.concatenate(values) for field, values in columns.items()})
+    if len(runs.households) > MAX_RUNS:
+        raise ValueError(f"{len(runs.households)} runs requested; the limit is {MAX_RUNS}")
+    return names, runs
+
+
+def cheapest_starts(runs, prices, block_cells=SCHEDULE_BLOCK_CELLS):
+    """
+    Cheapest allowed start of every run, ignoring power limits.
+
+    Returns:
+        ndarray: Start step per run
+    """
+    starts = np.empty(len(runs.durations), dtype=np.int64)
+    for duration in np.unique(runs.durations):
+        selected = np.flatnonzero(runs.durations == duration)
+        costs = window_sums(prices, duration)
+        candidates = np.arange(len(costs))
+        block = max(1, block_cells // len(costs))
+        for first in range(0, len(selected), block):
+            rows = selected[first:first + block]
+            allowed = (
+                (candidates >= runs.earliest[rows, None]) & (candidates <= runs.latest_start[rows, None])
+            )
+            starts[rows] = np.where(allowed, costs, np.inf).argmin(axis=1)
+    return starts
+
+
+def limited_starts(runs, base_kw, max_kw, prices):
+    """
+    Greedy placement under a per-household power limit.
+
+    Args:
+        runs (Runs): Runs to place
+        base_kw (ndarray): (H, T) forecast base load in kW
+        max_kw (float): Limit on base load plus running appliances
+        prices (ndarray): (T,) price per kWh of each step
+
+    Returns:
+        tuple: (start step per run, bool mask of runs placed under the limit)
+    """
+    run_count = len(runs.durations)
+    starts = runs.preferred.copy()
+    placed = np.zeros(run_count, dtype=bool)
+    load = np.array(base_kw, dtype=np.float64)
+
+    # Rank runs within their household, largest energy first; round r
+    # places every household's r-th run
+    order = np.lexsort((-(runs.power_kw * runs.durations), runs.households))
+    group_starts = np.flatnonzero(np.r_[True, np.diff(runs.households[order]) != 0])
+    group_sizes = np.diff(np.r_[group_starts, run_count])
+    rounds = np.empty(run_count, dtype=np.int64)
+    rounds[order] = np.arange(run_count) - np.repeat(group_starts, group_sizes)
+
+    window_costs = {}
+    for round_number in range(int(rounds.max()) + 1 if run_count else 0):
+        in_round = np.flatnonzero(rounds == round_number)
+        for duration in np.unique(runs.durations[in_round]):
+            rows = in_round[runs.durations[in_round] == duration]
+            if duration not in window_costs:
+                window_costs[duration] = window_sums(prices, duration)
+            costs = window_costs[duration]
+            candidates = np.arange(len(costs))
+            households = runs.households[rows]
+
+            # Smallest headroom over each candidate window
+            headroom = max_kw - load[households]
+            window_headroom = sliding_window_view(headroom, duration, axis=1).min(axis=2)
+            allowed = (
+                (window_headroom >= runs.power_kw[rows, None])
+                & (candidates >= runs.earliest[rows, None])
+                & (candidates <= runs.latest_start[rows, None])
+            )
+            masked = np.where(allowed, costs, np.inf)
+            best = masked.argmin(axis=1)
+            fits = np.isfinite(masked[np.arange(len(rows)), best])
+
+            chosen = np.where(fits, best, runs.preferred[rows])
+            starts[rows] = chosen
+            placed[rows] = fits
+            # Each household appears once per round, so no index repeats
+            covered = chosen[:, None] + np.arange(duration)
+            load[households[:, None], covered] += runs.power_kw[rows, None]
+
+    return starts, placed
+
+
+def run_costs(runs, starts, cumulative_prices):
+    """Cost of every run starting at `starts`, from the cumulative price vector."""
+    step_kwh = runs.power_kw / STEPS_PER_HOUR
+    return step_kwh * (cumulative_prices[starts + runs.durations] - cumulative_prices[starts])
+
+
+def run_profile(runs, starts, steps):
+    """Total kWh drawn by the runs in each step."""
+    step_kwh = runs.power_kw / STEPS_PER_HOUR
+    delta = np.zeros(steps + 1)
+    np.add.at(delta, starts, step_kwh)
+    np.add.at(delta, starts + runs.durations, -step_kwh)
+    return np.cumsum(delta[:-1])
+
+
+def step_labels(start_time, steps):
+    """ISO timestamps ('YYYY-MM-DDTHH:MM:SS') of the given step numbers."""
+    times = np.datetime64(start_time, 's') + np.asarray(steps) * np.timedelta64(STEP_MINUTES * 60, 's')
+    return times.astype(str).tolist()
+
+
+def simulate_load_shifting(household_ids, base_kwh, appliances, start_time, max_kw=None, schedule=None):
+    """
+    Schedule shiftable appliance runs at minimum time-of-use cost.
+
+    Args:
+        household_ids (ndarray): (H,) household of each base load row
+        base_kwh (ndarray): (H, T) forecast kWh per 5-minute step
+        appliances (list): Appliance specs (see build_runs)
+        start_time (datetime): Time of step 0, on a 5-minute boundary
+        max_kw (float): Optional per-household power limit
+        schedule (TariffSchedule): Defaults to the ontology schedule
+
+    Returns:
+        dict: Totals, per-step profile, per-household costs and run schedules
+
+    Raises:
+        ValueError: If an appliance spec is invalid
+    """
+    started = time.perf_counter()
+    base_kwh = np.asarray(base_kwh, dtype=np.float64)
+    steps = base_kwh.shape[1]
+    prices = step_prices(start_time, steps, schedule)
+    names, runs = build_runs(appliances, household_ids, start_time, steps)
+
+    if max_kw is None:
+        starts = cheapest_starts(runs, prices)
+        placed = np.ones(len(starts), dtype=bool)
+    else:
+        starts, placed = limited_starts(runs, base_kwh * STEPS_PER_HOUR, max_kw, prices)
+
+    cumulative_prices = np.concatenate([[0.0], np.cumsum(prices)])
+    baseline_costs = run_costs(runs, runs.preferred, cumulative_prices)
+    optimized_costs = run_costs(runs, starts, cumulative_prices)
+
+    household_count = len(household_ids)
+    base_costs = base_kwh @ prices
+    household_baseline = base_costs + np.bincount(runs.households, baseline_costs, minlength=household_count)
+    household_optimized = base_costs + np.bincount(runs.households, optimized_costs, minlength=household_count)
+
+    base_profile = base_kwh.sum(axis=0)
+    baseline_profile = base_profile + run_profile(runs, runs.preferred, steps)
+    optimized_profile = base_profile + run_profile(runs, starts, steps)
+
+    baseline_total = float(household_baseline.sum())
+    optimized_total = float(household_optimized.sum())
+    savings = baseline_total - optimized_total
+    profile_labels = step_labels(start_time, np.arange(steps))
+    baseline_labels = step_labels(start_time, runs.preferred)
+    optimized_labels = step_labels(start_time, starts)
+
+    return {
+        'start_time': start_time.isoformat(),
+        'interval_minutes': STEP_MINUTES,
+        'steps': steps,
+        'household_count': household_count,
+        'max_kw': max_kw,
+        'totals': {
+            'base_load_kwh': round(float(base_profile.sum()), 3),
+            'shiftable_kwh': round(float((runs.power_kw * runs.durations).sum() / STEPS_PER_HOUR), 3),
+            'baseline_cost': round(baseline_total, 4),
+            'optimized_cost': round(optimized_total, 4),
+            'savings': round(savings, 4),
+            'savings_percent': round(100 * savings / baseline_total, 2) if baseline_total else 0.0,
+            'runs': len(starts),
+            'unplaced_runs': int((~placed).sum())
+        },
+        'profile': [
+            {
+                'timestamp': timestamp,
+                'price_per_kwh': round(price, 4),
+                'base_kwh': round(base, 4),
+                'baseline_kwh': round(baseline, 4),
+                'optimized_kwh': round(optimized, 4)
+            }
+            for timestamp, price, base, baseline, optimized in zip(
+                profile_labels, prices.tolist(), base_profile.tolist(),
+                baseline_profile.tolist(), optimized_profile.tolist()
+            )
+        ],
+        'households': [
+            {
+                'household_id': household_id,
+                'baseline_cost': round(baseline, 4),
+                'optimized_cost': round(optimized, 4),
+                'savings': round(baseline - optimized, 4)
+            }
+            for household_id, baseline, optimized in zip(
+                np.asarray(household_ids).tolist(), household_baseline.tolist(), household_optimized.tolist()
+            )
+        ],
+        'runs': [
+            {
+                'household_id': household_id,
+                'appliance': names[appliance],
+                'baseline_start': baseline_start,
+                'optimized_start': optimized_start,
+                'duration_minutes': duration * STEP_MINUTES,
+                'baseline_cost': round(baseline, 4),
+                'optimized_cost': round(optimized, 4),
+                'placed': is_placed
+            }
+            for household_id, appliance, baseline_start, optimized_start, duration, baseline, optimized, is_placed
+            in zip(
+                np.asarray(household_ids)[runs.households].tolist(), runs.appliances.tolist(),
+                baseline_labels, optimized_labels, runs.durations.tolist(),
+                baseline_costs.tolist(), optimized_costs.tolist(), placed.tolist()
+            )
+        ],
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
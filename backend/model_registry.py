@@ -0,0 +1,417 @@
+"""
+Model Registry Module
+
+Resolves the forecasting model of each household and holds loaded models in
+an LRU cache bounded by bytes. A household's model is, in order:
+
+    1. models/household_<id>.joblib, if newer than the packed matrix
+    2. its row in models/household_coefficients.npz (see pack_household_models)
+    3. models/cluster_<name>.joblib, if models/clusters.json lists the household
+       under <name>
+    4. the default model (energy_predictor_model.joblib)
+
+Models load on first use. refresh() checks the version stamps of the default
+model, the models directory, the packed matrix and clusters.json, and picks
+up changed files with no restart. New model files should be written under
+another name and renamed into place. The rename updates the directory stamp,
+and the packed matrix is written that way. The registry's generation joins
+these stamps. It versions cached and stored forecasts.
+
+A per-household LinearRegression is 10 coefficients and an intercept.
+pack_household_models() stacks them into one (N x 10) matrix. Thousands of
+households then cost a row lookup each, not thousands of unpickled sklearn
+objects in the cache.
+
+Usage:
+    flask --app app pack-models
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+import joblib
+import numpy as np
+
+from forecast_cache import model_file_version
+from features import FEATURE_COLUMNS, HISTORY_LENGTH
+from feature_store import household_history
+from forecasting import DEFAULT_READING_KWH, forecast_batch, linear_parameters
+
+MODELS_DIR = 'models'
+PACKED_FILE = 'household_coefficients.npz'
+CLUSTERS_FILE = 'clusters.json'
+
+HOUSEHOLD_FILE_PATTERN = re.compile(r'^household_(\d+)\.joblib$')
+CLUSTER_FILE_PATTERN = re.compile(r'^cluster_([\w-]+)\.joblib$')
+
+# Loaded models kept in memory, by on-disk size
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# model: the estimator; version: model_file_version of its file;
+# nbytes: file size charged to the budget; parameters: linear_parameters(model)
+ModelEntry = namedtuple('ModelEntry', ['model', 'version', 'nbytes', 'parameters'])
+
+# Sorted household ids with their coefficient rows and intercepts
+PackedCoefficients = namedtuple('PackedCoefficients', ['household_ids', 'coef', 'intercept', 'mtime_ns'])
+
+
+def household_model_path(models_dir, household_id):
+    return os.path.join(models_dir, f'household_{int(household_id)}.joblib')
+
+
+def load_packed(path):
+    """Packed coefficients from an .npz written by pack_household_models, or None."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        with np.load(path) as packed:
+            return PackedCoefficients(
+                packed['household_id'].astype(np.int64),
+                packed['coef'].astype(np.float64),
+                packed['intercept'].astype(np.float64),
+                mtime_ns
+            )
+    except (OSError, KeyError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"Error loading packed coefficients from {path}: {e}")
+        return None
+
+
+class ModelRegistry:
+    """Thread-safe model lookup with lazy loading, hot reload and an LRU byte budget."""
+
+    def __init__(self, default_path, models_dir=MODELS_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.default_path = default_path
+        self.models_dir = models_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stamps = None
+        self._override_ids = np.empty(0, dtype=np.int64)
+        self._clusters = {}
+        self._packed = None
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    @property
+    def packed_path(self):
+        return os.path.join(self.models_dir, PACKED_FILE)
+
+    @property
+    def clusters_path(self):
+        return os.path.join(self.models_dir, CLUSTERS_FILE)
+
+    def _current_stamps(self):
+        return (
+            model_file_version(self.default_path),
+            model_file_version(self.models_dir),
+            model_file_version(self.packed_path),
+            model_file_version(self.clusters_path)
+        )
+
+    @property
+    def generation(self):
+        """Version of the whole model set, as of the last refresh()."""
+        with self._lock:
+            if self._stamps is None:
+                self.refresh()
+            return '/'.join(stamp or '-' for stamp in self._stamps)
+
+    def refresh(self):
+        """
+        Pick up added, removed or replaced model files.
+
+        Returns:
+            bool: True if the model set changed since the last refresh
+        """
+        stamps = self._current_stamps()
+        with self._lock:
+            if stamps == self._stamps:
+                return False
+            if self._stamps is not None:
+                self.reloads += 1
+            self._scan()
+            self._stamps = stamps
+            return True
+
+    def _scan(self):
+        """Re-read the models directory and drop cached models whose file changed."""
+        packed = load_packed(self.packed_path)
+        packed_mtime = packed.mtime_ns if packed is not None else -1
+
+        override_ids = []
+        cluster_names = set()
+        try:
+            with os.scandir(self.models_dir) as entries:
+                for entry in entries:
+                    match = HOUSEHOLD_FILE_PATTERN.match(entry.name)
+                    if match and entry.stat().st_mtime_ns > packed_mtime:
+                        override_ids.append(int(match.group(1)))
+                    match = CLUSTER_FILE_PATTERN.match(entry.name)
+                    if match:
+                        cluster_names.add(match.group(1))
+        except OSError:
+            pass
+
+        clusters = {}
+        if os.path.exists(self.clusters_path):
+            try:
+                with open(self.clusters_path) as f:
+                    members = json.load(f)
+                clusters = {
+                    name: np.unique(np.asarray(ids, dtype=np.int64))
+                    for name, ids in members.items() if name in cluster_names
+                }
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Error loading {self.clusters_path}: {e}")
+
+        self._packed = packed
+        self._override_ids = np.unique(np.asarray(override_ids, dtype=np.int64))
+        self._clusters = clusters
+        for path in list(self._entries):
+            if model_file_version(path) != self._entries[path].version:
+                self._evict(path)
+
+    def _evict(self, path):
+        entry = self._entries.pop(path)
+        self._bytes -= entry.nbytes
+
+    def _load(self, path):
+        """Cached model of one file, loading it (and evicting others) if needed."""
+        version = model_file_version(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._evict(path)
+            if version is None:
+                return None
+
+            model = joblib.load(path)
+            entry = ModelEntry(model, version, os.path.getsize(path), linear_parameters(model))
+            self.loads += 1
+            self._entries[path] = entry
+            self._bytes += entry.nbytes
+            # The model just loaded stays even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+            return entry
+
+    def model_path(self, household_id=None):
+        """
+        File of the model serving `household_id` (the default model for None).
+
+        Returns:
+            str: Path, or None when the household's row of the packed matrix
+                 serves it
+        """
+        with self._lock:
+            if self._stamps is None:
+                self.refresh()
+            if household_id is None:
+                return self.default_path
+            ids = np.array([household_id], dtype=np.int64)
+            if np.isin(ids, self._override_ids)[0]:
+                return household_model_path(self.models_dir, household_id)
+            if self._packed_rows(self._packed, ids)[0] >= 0:
+                return None
+            for name, members in self._clusters.items():
+                if np.isin(ids, members)[0]:
+                    return os.path.join(self.models_dir, f'cluster_{name}.joblib')
+            return self.default_path
+
+    def get(self, household_id=None):
+        """
+        Estimator serving `household_id`, loaded on first use.
+
+        Returns:
+            The estimator, or None if its file is missing. Households served
+            by the packed matrix have no estimator; use household_parameters.
+        """
+        path = self.model_path(household_id)
+        if path is None:
+            return None
+        entry = self._load(path)
+        return entry.model if entry is not None else None
+
+    @staticmethod
+    def _packed_rows(packed, household_ids):
+        """Row of each household in the packed matrix, or -1."""
+        if packed is None or len(packed.household_ids) == 0:
+            return np.full(len(household_ids), -1, dtype=np.int64)
+        positions = np.searchsorted(packed.household_ids, household_ids)
+        positions = np.minimum(positions, len(packed.household_ids) - 1)
+        return np.where(packed.household_ids[positions] == household_ids, positions, -1)
+
+    def household_parameters(self, household_ids):
+        """
+        Model parameters for many households, packed for forecast_batch.
+
+        Args:
+            household_ids (ndarray): Households to look up
+
+        Returns:
+            tuple: (coef (H, 10), intercept (H,), estimators) where estimators
+                   is a list of (model, rows) for households whose model is not
+                   linear; their coef/intercept rows are NaN
+
+        Raises:
+            FileNotFoundError: If a household falls back to a missing default model
+        """
+        household_ids = np.asarray(household_ids, dtype=np.int64)
+        count = len(household_ids)
+        coef = np.full((count, len(FEATURE_COLUMNS)), np.nan)
+        intercept = np.full(count, np.nan)
+        estimators = []
+
+        with self._lock:
+            if self._stamps is None:
+                self.refresh()
+            packed = self._packed
+            override_ids = self._override_ids
+            clusters = self._clusters
+
+        # (path, rows) groups resolved in registry order
+        groups = []
+        remaining = np.ones(count, dtype=bool)
+
+        override_rows = np.flatnonzero(np.isin(household_ids, override_ids))
+        for row in override_rows:
+            groups.append((household_model_path(self.models_dir, household_ids[row]), [row]))
+        remaining[override_rows] = False
+
+        if packed is not None:
+            packed_rows = self._packed_rows(packed, household_ids)
+            hit = remaining & (packed_rows >= 0)
+            coef[hit] = packed.coef[packed_rows[hit]]
+            intercept[hit] = packed.intercept[packed_rows[hit]]
+            remaining &= ~hit
+
+        for name, members in clusters.items():
+            rows = np.flatnonzero(remaining & np.isin(household_ids, members))
+            if len(rows):
+                groups.append((os.path.join(self.models_dir, f'cluster_{name}.joblib'), rows))
+                remaining[rows] = False
+
+        if remaining.any():
+            groups.append((self.default_path, np.flatnonzero(remaining)))
+
+        for path, rows in groups:
+            entry = self._load(path)
+            if entry is None:
+                raise FileNotFoundError(f"Model file '{path}' not found")
+            if entry.parameters is not None:
+                coef[rows], intercept[rows] = entry.parameters
+            else:
+                estimators.append((entry.model, np.asarray(rows)))
+
+        return coef, intercept, estimators
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.loads
+            return {
+                'generation': self.generation,
+                'loaded_models': len(self._entries),
+                'loaded_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'packed_households': len(self._packed.household_ids) if self._packed is not None else 0,
+                'household_models': len(self._override_ids),
+                'cluster_models': len(self._clusters),
+                'hits': self.hits,
+                'loads': self.loads,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'reloads': self.reloads
+            }
+
+
+def forecast_history(registry, household_ids, history, start_time, steps):
+    """
+    Recursive 5-minute forecasts with each household's own model.
+
+    Linear models (packed rows included) run in one forecast_batch call with
+    per-household coefficients; other estimators run once per model.
+
+    Returns:
+        ndarray: (H, steps) predicted kWh per 5-minute reading
+    """
+    coef, intercept, estimators = registry.household_parameters(household_ids)
+    predictions = np.empty((len(household_ids), steps))
+
+    linear = ~np.isnan(intercept)
+    if linear.all():
+        return forecast_batch(history, start_time, coef, intercept, steps=steps)
+    if linear.any():
+        predictions[linear] = forecast_batch(
+            history[linear], start_time, coef[linear], intercept[linear], steps=steps
+        )
+    for model, rows in estimators:
+        predictions[rows] = forecast_batch(history[rows], start_time, None, None, steps=steps, model=model)
+    return predictions
+
+
+def forecast_readings(session, registry, start_time, steps, household_ids=None):
+    """
+    5-minute forecasts for every household (or the given ones), each from
+    its registry model.
+
+    Returns:
+        tuple: (household_ids ndarray, (H, steps) predicted kWh per 5-minute reading)
+    """
+    ids, history = household_history(session, household_ids)
+    if len(ids) == 0:
+        ids = np.array([0], dtype=np.int64)
+        history = np.full((1, HISTORY_LENGTH), DEFAULT_READING_KWH)
+    return ids, forecast_history(registry, ids, history, start_time, steps)
+
+
+def pack_household_models(models_dir=MODELS_DIR):
+    """
+    Stack the coefficients of every linear household_<id>.joblib into
+    household_coefficients.npz. The matrix is written beside the models and
+    renamed into place. Its mtime is newer than every model it packs, so
+    the registry serves those households from the matrix from then on.
+    Non-linear models are skipped and keep being loaded from their files.
+
+    Returns:
+        dict: packed, skipped and bytes (size of the .npz)
+    """
+    household_ids, coefs, intercepts = [], [], []
+    skipped = 0
+    for name in sorted(os.listdir(models_dir)):
+        match = HOUSEHOLD_FILE_PATTERN.match(name)
+        if not match:
+            continue
+        parameters = linear_parameters(joblib.load(os.path.join(models_dir, name)))
+        if parameters is None or parameters[0].shape != (len(FEATURE_COLUMNS),):
+            skipped += 1
+            continue
+        household_ids.append(int(match.group(1)))
+        coefs.append(parameters[0])
+        intercepts.append(float(parameters[1]))
+
+    order = np.argsort(household_ids)
+    path = os.path.join(models_dir, PACKED_FILE)
+    temp_path = path + '.tmp.npz'
+    np.savez(
+        temp_path,
+        household_id=np.asarray(household_ids, dtype=np.int64)[order],
+        coef=np.asarray(coefs, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))[order],
+        intercept=np.asarray(intercepts, dtype=np.float64)[order]
+    )
+    os.replace(temp_path, path)
+
+    size = os.path.getsize(path)
+    print(f"Packed {len(household_ids)} household models into {path} ({size / 1024:.1f} KiB), "
+          f"skipped {skipped} non-linear")
+    return {'packed': len(household_ids), 'skipped': skipped, 'bytes': size}
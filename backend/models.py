@@ -0,0 +1,131 @@
+"""
+Database Models Module
+
+Holds the shared SQLAlchemy instance and table definitions so that the
+ingest and query helpers can use them without importing the Flask app.
+"""
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+# Storage format SQLAlchemy uses for DateTime columns on SQLite. Bulk writers
+# that bypass the ORM must format timestamps identically so range filters
+# (string comparisons in SQLite) keep matching ORM-written rows.
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class EnergyReading(db.Model):
+    __tablename__ = 'energy_readings'
+    __table_args__ = (
+        # One reading per household per timestamp; also the dedupe key for
+        # incremental ingest (INSERT OR IGNORE relies on it)
+        db.Index('ux_energy_readings_household_ts', 'household_id', 'timestamp', unique=True),
+        # Covering index for per-household range reads: the household/time
+        # filter, timestamp ordering and the energy value all come from it
+        db.Index('ix_energy_readings_household_ts_kwh', 'household_id', 'timestamp', 'energy_kwh'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True)
+    household_id = db.Column(db.Integer, nullable=False)
+    energy_kwh = db.Column(db.Float, nullable=False)
+    future_energy_kwh = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(),
+            'household_id': self.household_id,
+            'energy_kwh': self.energy_kwh,
+            'future_energy_kwh': self.future_energy_kwh
+        }
+
+
+class HouseholdWatermark(db.Model):
+    """High-water mark of ingested readings per household."""
+    __tablename__ = 'household_watermarks'
+
+    household_id = db.Column(db.Integer, primary_key=True)
+    last_timestamp = db.Column(db.DateTime, nullable=False)
+
+
+class IngestedFile(db.Model):
+    """Byte offset up to which a CSV export has been ingested."""
+    __tablename__ = 'ingested_files'
+
+    path = db.Column(db.String, primary_key=True)
+    header = db.Column(db.String, nullable=False)
+    byte_offset = db.Column(db.BigInteger, nullable=False)
+    ingested_at = db.Column(db.DateTime, nullable=False)
+
+
+class RollupMixin:
+    """Per-household energy totals for one time bucket."""
+    household_id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True, index=True)
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    # Time-of-use cost of the bucket's readings (see cost_engine.py)
+    total_cost = db.Column(db.Float, nullable=False, default=0.0)
+    reading_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class HourlyRollup(RollupMixin, db.Model):
+    __tablename__ = 'energy_rollup_hourly'
+
+
+class DailyRollup(RollupMixin, db.Model):
+    __tablename__ = 'energy_rollup_daily'
+
+
+class WeeklyRollup(RollupMixin, db.Model):
+    """Calendar weeks starting on Monday 00:00."""
+    __tablename__ = 'energy_rollup_weekly'
+
+
+class HouseholdForecast(db.Model):
+    """
+    Stored hourly forecast of one household, written by the batch forecast
+    job (see batch_forecast.py). predicted_kwh is the mean 5-minute reading
+    within the hour, as in forecasting.format_forecast.
+    """
+    __tablename__ = 'forecasts'
+
+    household_id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, primary_key=True, index=True)
+    predicted_kwh = db.Column(db.Float, nullable=False)
+    generated_at = db.Column(db.DateTime, nullable=False)
+    # model_registry generation of the models that produced the row
+    model_version = db.Column(db.String, nullable=True)
+
+
+class HouseholdFeatures(db.Model):
+    """
+    Feature store: each household's latest reading with its model features
+    (see features.py) and the window of readings they were computed from,
+    kept current by ingest (see feature_store.py).
+    """
+    __tablename__ = 'features'
+
+    household_id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+    hour_of_day = db.Column(db.Float, nullable=False)
+    day_of_week = db.Column(db.Float, nullable=False)
+    is_weekend = db.Column(db.Float, nullable=False)
+    time_category = db.Column(db.Float, nullable=False)
+    lag_1 = db.Column(db.Float, nullable=False)
+    lag_2 = db.Column(db.Float, nullable=False)
+    lag_3 = db.Column(db.Float, nullable=False)
+    rolling_mean_3 = db.Column(db.Float, nullable=False)
+    rolling_mean_6 = db.Column(db.Float, nullable=False)
+    rolling_std_3 = db.Column(db.Float, nullable=False)
+
+    # Latest readings, oldest first; kwh_6 is the reading at `timestamp`.
+    # NULL while the household has fewer than 6 readings.
+    kwh_1 = db.Column(db.Float, nullable=True)
+    kwh_2 = db.Column(db.Float, nullable=True)
+    kwh_3 = db.Column(db.Float, nullable=True)
+    kwh_4 = db.Column(db.Float, nullable=True)
+    kwh_5 = db.Column(db.Float, nullable=True)
+    kwh_6 = db.Column(db.Float, nullable=True)
@@ -5,10 +5,16 @@ This module loads the smart home energy ontology and generates
 optimization suggestions based on current usage patterns and time-of-use pricing.
 """
 
-from rdflib import Graph, Namespace, Literal
+from rdflib import Graph, Namespace
+from rdflib.namespace import RDF
 from rdflib.plugins.sparql import prepareQuery
+from collections import namedtuple
 from datetime import datetime
 import os
+import numpy as np
+
+from rule_engine import usage_arrays, first_rule_matches
+from tariffs import DEFAULT_SCHEDULE, TariffSchedule, load_time_slots, format_clock
 
 # Global ontology graph
 KNOWLEDGE_GRAPH = None
@@ -16,6 +22,39 @@ KNOWLEDGE_GRAPH = None
 # Define the smart energy namespace
 SMART_ENERGY = Namespace("http://smartenergy.org/ontology#")
 
+ONTOLOGY_PATH = os.path.join(os.path.dirname(__file__), 'smart_home_ontology.ttl')
+
+# Rules applicable to a time slot. Parsed once at import; ?slot is bound
+# per time slot when the rule index is compiled (see compile_rule_index).
+RULES_QUERY = prepareQuery("""
+    PREFIX : <http://smartenergy.org/ontology#>
+    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+    
+    SELECT ?rule ?description ?impact ?category ?threshold
+    WHERE {
+        ?rule a :OptimizationRule ;
+              :appliesTo ?slot ;
+              :ruleDescription ?description ;
+              :impact ?impact ;
+              :category ?category ;
+              :threshold ?threshold .
+    }
+    """)
+
+# A rule with its literals already converted to Python types
+CompiledRule = namedtuple('CompiledRule', ['rule', 'description', 'impact', 'category', 'threshold_kwh'])
+
+# {time slot name: [CompiledRule, ...]}, rebuilt when the .ttl changes
+RULE_INDEX = {}
+ONTOLOGY_VERSION = None
+
+# Time-of-use slots from the ontology (hardcoded defaults until it is loaded)
+TARIFF_SCHEDULE = DEFAULT_SCHEDULE
+
+# next_transition wording the API used before slots came from the ontology,
+# where it differs from "<label> begin"
+TRANSITION_LABELS = {'OffPeakHours': 'Off-Peak begins'}
+
 # Appliances to monitor (can be extended based on household_id)
 MONITORED_APPLIANCES = ['household_1', 'household_2', 'household_3', 'household_4', 'household_5']
 
@@ -32,14 +71,21 @@ def load_ontology_graph():
     Returns:
         Graph: The loaded RDF graph, or None if loading fails
     """
-    global KNOWLEDGE_GRAPH
+    global KNOWLEDGE_GRAPH, RULE_INDEX, TARIFF_SCHEDULE, ONTOLOGY_VERSION
     
-    ontology_path = os.path.join(os.path.dirname(__file__), 'smart_home_ontology.ttl')
+    ontology_path = ONTOLOGY_PATH
+    # Recorded before parsing so a broken file is not re-parsed on every request
+    ONTOLOGY_VERSION = _ontology_version(ontology_path)
     
     try:
-        KNOWLEDGE_GRAPH = Graph()
-        KNOWLEDGE_GRAPH.parse(ontology_path, format='turtle')
-        print(f"✓ Ontology loaded successfully: {len(KNOWLEDGE_GRAPH)} triples")
+        graph = Graph()
+        graph.parse(ontology_path, format='turtle')
+        RULE_INDEX = compile_rule_index(graph)
+        TARIFF_SCHEDULE = TariffSchedule(load_time_slots(graph, SMART_ENERGY))
+        KNOWLEDGE_GRAPH = graph
+        rule_count = sum(len(rules) for rules in RULE_INDEX.values())
+        print(f"✓ Ontology loaded successfully: {len(KNOWLEDGE_GRAPH)} triples, "
+              f"{rule_count} rules across {len(RULE_INDEX)} time slots")
         return KNOWLEDGE_GRAPH
     except FileNotFoundError:
         print(f"✗ Ontology file not found at {ontology_path}")
@@ -49,65 +95,98 @@ def load_ontology_graph():
         return None
 
 
-def get_current_time_slot():
+def _ontology_version(ontology_path):
+    try:
+        stat = os.stat(ontology_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def compile_rule_index(graph):
+    """
+    Run the rule query once per time slot and keep the results as plain
+    Python values.
+    
+    Args:
+        graph (Graph): Parsed ontology
+    
+    Returns:
+        dict: {time slot name: [CompiledRule, ...]} in query result order
+    """
+    slots = set(graph.subjects(RDF.type, SMART_ENERGY.TimeSlot))
+    slots.update(graph.objects(None, SMART_ENERGY.appliesTo))
+    
+    index = {}
+    for slot in slots:
+        slot_name = str(slot).replace(str(SMART_ENERGY), '', 1)
+        index[slot_name] = [
+            CompiledRule(
+                rule=str(row.rule),
+                description=str(row.description),
+                impact=str(row.impact),
+                category=str(row.category),
+                threshold_kwh=float(row.threshold) / 1000  # Convert Wh to kWh
+            )
+            for row in graph.query(RULES_QUERY, initBindings={'slot': slot})
+        ]
+    return index
+
+
+def refresh_ontology():
+    """Reload the ontology and rule index if the .ttl file changed since the last load."""
+    if _ontology_version(ONTOLOGY_PATH) != ONTOLOGY_VERSION:
+        load_ontology_graph()
+    return KNOWLEDGE_GRAPH
+
+
+def get_tariff_schedule(refresh=True):
+    """
+    Current time-of-use schedule, reloaded with the ontology when the .ttl
+    changes. Ingest prices readings with refresh=False: the schedule loaded
+    at startup (or by the last request), never parsing the file inside a
+    write transaction.
+    """
+    if refresh:
+        refresh_ontology()
+    return TARIFF_SCHEDULE
+
+
+def get_current_time_slot(moment=None):
     """
     Determine the current time slot based on ontology definitions.
     
-    Time slots:
-    - PeakHours: 17:00 - 21:00 (5 PM - 9 PM)
-    - ShoulderHours: 07:00 - 17:00 (7 AM - 5 PM)
-    - OffPeakHours: 21:00 - 07:00 (9 PM - 7 AM)
+    Slots come from the :TimeSlot entries in smart_home_ontology.ttl
+    (see tariffs.py), e.g. PeakHours 17:00 - 21:00 at 1.5x.
+    
+    Args:
+        moment (datetime): Time to look up (default: now)
     
     Returns:
         tuple: (slot_name, cost_multiplier)
     """
-    current_hour = datetime.now().hour
-    
-    if 17 <= current_hour < 21:
-        return ('PeakHours', 1.5)
-    elif 7 <= current_hour < 17:
-        return ('ShoulderHours', 1.2)
-    else:
-        return ('OffPeakHours', 1.0)
+    slot = get_tariff_schedule().slot_at(moment or datetime.now())
+    return (slot.name, slot.cost_multiplier)
 
 
 def query_optimization_rules(time_slot_name):
     """
-    Query the ontology for optimization rules applicable to the current time slot.
+    Look up the optimization rules applicable to a time slot.
+    
+    Rules come from the index compiled at ontology load time, so no SPARQL
+    is parsed or evaluated per request.
     
     Args:
         time_slot_name (str): Name of the current time slot (e.g., 'PeakHours')
     
     Returns:
-        list: Query results containing rule descriptions, impacts, and categories
+        list: CompiledRule entries with description, impact, category and threshold_kwh
     """
-    if KNOWLEDGE_GRAPH is None:
+    if refresh_ontology() is None:
         print("⚠ Warning: Ontology graph not loaded")
         return []
     
-    # SPARQL query to retrieve optimization rules for the current time slot
-    query_string = f"""
-    PREFIX : <http://smartenergy.org/ontology#>
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT ?rule ?description ?impact ?category ?threshold
-    WHERE {{
-        ?rule a :OptimizationRule ;
-              :appliesTo :{time_slot_name} ;
-              :ruleDescription ?description ;
-              :impact ?impact ;
-              :category ?category ;
-              :threshold ?threshold .
-    }}
-    """
-    
-    try:
-        results = KNOWLEDGE_GRAPH.query(query_string)
-        return list(results)
-    except Exception as e:
-        print(f"✗ SPARQL query error: {e}")
-        return []
+    return RULE_INDEX.get(time_slot_name, [])
 
 
 def get_optimization_suggestions(current_usage_data):
@@ -155,50 +234,25 @@ def get_optimization_suggestions(current_usage_data):
             'time_slot': time_slot_name
         }]
     
-    # Generate suggestions based on current usage and rules
-    # Group by rule + household to avoid exact duplicates but keep different households
-    rule_matches = {}
+    # Match every usage record against every rule threshold at once and keep
+    # one suggestion per rule-household combination (see rule_engine.py)
+    household_ids, energy = usage_arrays(current_usage_data)
+    thresholds = np.array([rule.threshold_kwh for rule in rule_results])
+    record_indices, rule_indices = first_rule_matches(household_ids, energy, thresholds)
     
-    for usage_record in current_usage_data:
-        household_id = usage_record.get('household_id')
-        energy_kwh = usage_record.get('energy_kwh', 0)
-        timestamp = usage_record.get('timestamp', datetime.now())
-        
-        # Check each rule against current usage
-        for rule_result in rule_results:
-            rule_id = str(rule_result.rule)
-            description = str(rule_result.description)
-            impact = str(rule_result.impact)
-            category = str(rule_result.category)
-            threshold_kwh = float(rule_result.threshold) / 1000  # Convert Wh to kWh
-            
-            # Only suggest if usage exceeds threshold
-            if energy_kwh > threshold_kwh:
-                # Create unique key: rule + household to keep suggestions for different households
-                match_key = f"{rule_id}_{household_id}"
-                
-                # Track only one suggestion per rule-household combination
-                if match_key not in rule_matches:
-                    rule_matches[match_key] = {
-                        'description': description,
-                        'impact': impact,
-                        'category': category,
-                        'threshold_kwh': threshold_kwh,
-                        'energy_kwh': energy_kwh,
-                        'household_id': household_id,
-                        'timestamp': timestamp
-                    }
+    savings_percentage = ((cost_multiplier - 1.0) / cost_multiplier) * 100 if cost_multiplier > 1.0 else 0
     
-    # Convert grouped matches to suggestions list
     suggestion_id = 1
-    for match_key, match_data in rule_matches.items():
-        energy_kwh = match_data['energy_kwh']
+    for record_index, rule_index in zip(record_indices.tolist(), rule_indices.tolist()):
+        usage_record = current_usage_data[record_index]
+        rule = rule_results[rule_index]
+        energy_kwh = usage_record.get('energy_kwh', 0)
+        timestamp = usage_record.get('timestamp', datetime.now())
         potential_savings_kwh = energy_kwh * (cost_multiplier - 1.0)
-        savings_percentage = ((cost_multiplier - 1.0) / cost_multiplier) * 100 if cost_multiplier > 1.0 else 0
         
         # Enhance description with specific data
         enhanced_description = (
-            f"{match_data['description']} "
+            f"{rule.description} "
             f"Current usage: {energy_kwh:.3f} kWh. "
             f"Potential savings: {potential_savings_kwh:.3f} kWh ({savings_percentage:.1f}% cost reduction)."
         )
@@ -206,15 +260,15 @@ def get_optimization_suggestions(current_usage_data):
         suggestions.append({
             'id': suggestion_id,
             'text': enhanced_description,
-            'impact': match_data['impact'],
-            'category': match_data['category'],
-            'household_id': match_data['household_id'],
+            'impact': rule.impact,
+            'category': rule.category,
+            'household_id': usage_record.get('household_id'),
             'current_usage_kwh': round(energy_kwh, 4),
-            'threshold_kwh': round(match_data['threshold_kwh'], 4),
+            'threshold_kwh': round(rule.threshold_kwh, 4),
             'time_slot': time_slot_name,
             'cost_multiplier': cost_multiplier,
             'potential_savings_kwh': round(potential_savings_kwh, 4),
-            'timestamp': match_data['timestamp'].isoformat() if hasattr(match_data['timestamp'], 'isoformat') else str(match_data['timestamp'])
+            'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
         })
         
         suggestion_id += 1
@@ -243,18 +297,26 @@ def get_time_slot_info():
     Returns:
         dict: Time slot information including name, cost multiplier, and recommendations
     """
-    time_slot_name, cost_multiplier = get_current_time_slot()
-    current_hour = datetime.now().hour
+    schedule = get_tariff_schedule()
+    now = datetime.now()
+    slot = schedule.slot_at(now)
+    time_slot_name, cost_multiplier = slot.name, slot.cost_multiplier
+    current_hour = now.hour
     
     # Determine next time slot transition
-    if time_slot_name == 'PeakHours':
-        next_transition = "9 PM (Off-Peak begins)"
+    transition_time, next_slot = schedule.next_transition(now)
+    if transition_time is None:
+        next_transition = "None (single tariff)"
+    else:
+        label = TRANSITION_LABELS.get(next_slot.name, f"{next_slot.label} begin")
+        next_transition = f"{format_clock(transition_time)} ({label})"
+    
+    # Recommendation by how expensive this slot is relative to the others
+    if cost_multiplier >= schedule.multipliers.max() and cost_multiplier > schedule.multipliers.min():
         recommendation = "Avoid running high-power appliances. Delay usage until off-peak hours."
-    elif time_slot_name == 'ShoulderHours':
-        next_transition = "5 PM (Peak Hours begin)"
+    elif cost_multiplier > schedule.multipliers.min():
         recommendation = "Complete heavy usage tasks before peak hours or wait until off-peak."
     else:
-        next_transition = "7 AM (Shoulder Hours begin)"
         recommendation = "Optimal time for running high-power appliances and charging batteries."
     
     return {
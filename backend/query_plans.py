@@ -0,0 +1,114 @@
+"""
+Query Plan Checks
+
+Calls each API endpoint through the Flask test client, records every query
+it sends to SQLite and runs EXPLAIN QUERY PLAN on it. A plan step that scans
+energy_readings or a rollup table (from start to end, even through an
+index) or sorts through a temporary B-tree is reported as a regression.
+tests/test_query_plans.py runs the same check in the test suite.
+
+Usage:
+    flask --app app check-query-plans
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+# Tables that must always be reached through an index
+CHECKED_TABLES = {
+    'energy_readings',
+    'energy_rollup_hourly',
+    'energy_rollup_daily',
+    'energy_rollup_weekly',
+}
+
+# "SCAN energy_readings" (SQLite >= 3.36) or "SCAN TABLE energy_readings"
+SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def default_endpoints(household_id=1):
+    """Representative requests covering every endpoint that touches the database."""
+    week_ago = (datetime.now() - timedelta(days=7)).date().isoformat()
+    return [
+        '/api/energy/current',
+        '/api/energy/usage?range=24h',
+        '/api/energy/usage?range=7d',
+        '/api/energy/usage?range=30d',
+        f'/api/energy/usage?range=24h&household_id={household_id}',
+        '/api/appliances',
+        f'/api/appliances/{household_id}/usage?range=7d',
+        '/api/appliances/breakdown',
+        '/api/predictions',
+        f'/api/v1/usage/historical?household_id={household_id}&start_date={week_ago}',
+        '/api/optimization/suggestions',
+    ]
+
+
+def full_scans(plan_rows):
+    """Plan details that scan a checked table or sort through a temporary B-tree."""
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = SCAN_PATTERN.match(detail)
+        if match and match.group(1) in CHECKED_TABLES:
+            problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append(detail)
+    return problems
+
+
+def capture_statements(app, engine, endpoints):
+    """
+    Request each endpoint and collect the queries (SELECT or WITH) it executed.
+
+    Returns:
+        list: [(endpoint, statement, parameters)]
+    """
+    captured = []
+    current = {'endpoint': None}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((current['endpoint'], statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        client = app.test_client()
+        for endpoint in endpoints:
+            current['endpoint'] = endpoint
+            # Read the body so streamed responses run their queries too
+            client.get(endpoint).get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+    return captured
+
+
+def check_query_plans(app, engine, endpoints=None):
+    """
+    Verify that no endpoint query does a full table scan.
+
+    Returns:
+        list: [(endpoint, statement, [offending plan details])], empty when all pass
+    """
+    statements = capture_statements(app, engine, endpoints or default_endpoints())
+    failures = []
+
+    with engine.connect() as conn:
+        for endpoint, statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            problems = full_scans(plan)
+            if problems:
+                failures.append((endpoint, statement, problems))
+
+    print(f"Checked {len(statements)} queries from {len(set(s[0] for s in statements))} endpoints")
+    for endpoint, statement, problems in failures:
+        print(f"\n✗ {endpoint}\n  {' '.join(statement.split())}")
+        for detail in problems:
+            print(f"  -> {detail}")
+    if not failures:
+        print("✓ All endpoint queries search an index without sorting")
+
+    return failures
@@ -0,0 +1,242 @@
+"""
+Energy Rollups Module
+
+Maintains per-household hourly, daily and weekly totals (kWh and
+time-of-use cost) alongside the raw 5-minute readings. Ingest adds each batch of new readings to the rollups in
+the same transaction; dashboard queries then read a handful of bucket rows
+instead of re-aggregating raw readings on every request.
+"""
+
+import time
+from datetime import timedelta
+import pandas as pd
+
+from models import db, EnergyReading, HourlyRollup, DailyRollup, WeeklyRollup, HouseholdWatermark
+from cost_engine import price_readings
+from optimization_rules import get_tariff_schedule
+from storage import get_storage
+
+
+def _hour_start(timestamps):
+    return timestamps.dt.floor('h')
+
+
+def _day_start(timestamps):
+    return timestamps.dt.normalize()
+
+
+def _week_start(timestamps):
+    days = timestamps.dt.normalize()
+    return days - pd.to_timedelta(days.dt.weekday, unit='D')
+
+
+# grain name -> (model, bucket width in seconds, bucket start function)
+ROLLUP_GRAINS = {
+    'hourly': (HourlyRollup, 3600, _hour_start),
+    'daily': (DailyRollup, 86400, _day_start),
+    'weekly': (WeeklyRollup, 7 * 86400, _week_start),
+}
+
+REBUILD_CHUNK_SIZE = 200000
+
+
+def apply_readings(storage, cursor, readings):
+    """
+    Add newly ingested readings to every rollup table.
+
+    Args:
+        storage: Storage backend of the database (see storage.py)
+        cursor: DBAPI cursor inside the ingest transaction
+        readings (DataFrame): Readings in ingest.prepare_chunk() layout that
+                              were actually inserted (duplicates excluded)
+    """
+    if not len(readings):
+        return
+
+    costs = pd.Series(
+        price_readings(
+            readings['timestamp'].values, readings['energy_kwh'].values, get_tariff_schedule(refresh=False)
+        ),
+        index=readings.index
+    )
+    for model, _, bucket_start in ROLLUP_GRAINS.values():
+        keys = [readings['household_id'], bucket_start(readings['timestamp'])]
+        grouped = readings['energy_kwh'].groupby(keys).agg(['sum', 'count'])
+        grouped['cost'] = costs.groupby(keys).sum()
+
+        storage.upsert_rollups(
+            cursor,
+            model.__tablename__,
+            grouped.index.get_level_values(0).tolist(),
+            grouped.index.get_level_values(1),
+            grouped['sum'].tolist(),
+            grouped['cost'].tolist(),
+            grouped['count'].tolist()
+        )
+
+
+def rebuild_rollups(storage, raw_conn, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recompute all rollup tables from energy_readings, repairing any drift
+    and repricing costs after a tariff change. Readings are streamed in
+    chunks, so memory stays bounded.
+
+    Args:
+        storage: Storage backend of the database (see storage.py)
+        raw_conn: DBAPI connection; the caller commits
+
+    Returns:
+        int: Number of readings rolled up
+    """
+    write_cursor = raw_conn.cursor()
+    for model, _, _ in ROLLUP_GRAINS.values():
+        storage.clear_table(write_cursor, model.__tablename__)
+
+    read_cursor = storage.read_cursor(raw_conn, 'rollup_rebuild')
+
+    read_cursor.execute("SELECT timestamp, household_id, energy_kwh FROM energy_readings")
+    rows_seen = 0
+    while True:
+        rows = read_cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        readings = pd.DataFrame(rows, columns=['timestamp', 'household_id', 'energy_kwh'])
+        readings['timestamp'] = pd.to_datetime(readings['timestamp'])
+        apply_readings(storage, write_cursor, readings)
+        rows_seen += len(readings)
+
+    read_cursor.close()
+    write_cursor.close()
+    return rows_seen
+
+
+def rebuild_all(engine):
+    """Rebuild every rollup table in one transaction and report timing."""
+    started = time.perf_counter()
+    raw_conn = engine.raw_connection()
+    try:
+        rows_seen = rebuild_rollups(get_storage(engine), raw_conn)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+    print(f"Rebuilt rollups from {rows_seen} readings in {time.perf_counter() - started:.2f}s")
+    return rows_seen
+
+
+def _grain_for(window_start, bucket_seconds):
+    """Coarsest rollup whose buckets tile the requested ones exactly."""
+    hour_aligned = (window_start.minute, window_start.second, window_start.microsecond) == (0, 0, 0)
+    day_aligned = hour_aligned and window_start.hour == 0
+    candidates = (
+        ('weekly', day_aligned and window_start.weekday() == 0),
+        ('daily', day_aligned),
+        ('hourly', hour_aligned),
+    )
+    for grain, aligned in candidates:
+        model, width, _ = ROLLUP_GRAINS[grain]
+        if aligned and bucket_seconds % width == 0:
+            return model
+    raise ValueError(f"No rollup grain fits buckets of {bucket_seconds}s from {window_start}")
+
+
+def usage_by_bucket(session, cutoff, window_start, bucket_seconds, bucket_count, household_id=None):
+    """
+    Sum readings into fixed-width buckets starting at `window_start`, from
+    the coarsest rollup table whose buckets tile them (see _grain_for).
+
+    Args:
+        session: SQLAlchemy session
+        cutoff (datetime): Only readings at or after this time are considered
+        window_start (datetime): Start of bucket 0 (hour-aligned at least)
+        bucket_seconds (int): Bucket width in seconds
+        bucket_count (int): Number of buckets returned
+        household_id (int): Optional household filter
+
+    Returns:
+        tuple: (found, totals, counts, costs) where `found` tells whether
+               any reading exists at or after `cutoff` and totals, counts
+               and time-of-use costs are per-bucket lists
+    """
+    found_query = session.query(EnergyReading.id).filter(EnergyReading.timestamp >= cutoff)
+    if household_id:
+        found_query = found_query.filter(EnergyReading.household_id == household_id)
+    found = session.query(found_query.exists()).scalar()
+
+    totals = [0.0] * bucket_count
+    counts = [0] * bucket_count
+    costs = [0.0] * bucket_count
+    if not found:
+        return False, totals, counts, costs
+
+    model = _grain_for(window_start, bucket_seconds)
+    window_end = window_start + timedelta(seconds=bucket_seconds * bucket_count)
+    query = session.query(
+        model.bucket_start,
+        db.func.sum(model.total_kwh),
+        db.func.sum(model.reading_count),
+        db.func.sum(model.total_cost)
+    ).filter(
+        model.bucket_start >= window_start,
+        model.bucket_start < window_end
+    )
+    if household_id:
+        query = query.filter(model.household_id == household_id)
+
+    for bucket_start, total_kwh, reading_count, total_cost in query.group_by(model.bucket_start).all():
+        index = int((bucket_start - window_start).total_seconds() // bucket_seconds)
+        totals[index] += total_kwh
+        counts[index] += reading_count
+        costs[index] += total_cost
+
+    return True, totals, counts, costs
+
+
+def household_totals_since(session, cutoff):
+    """
+    Total kWh per household from `cutoff` until now: hourly rollups for the
+    whole hours, raw readings only for the partial hour at the start.
+
+    Both sums are correlated subqueries per household (one row each in
+    household_watermarks), so each is an index range search on
+    (household_id, time) rather than a range over all households grouped
+    through a temporary B-tree.
+
+    Returns:
+        list: [(household_id, total_kwh)] ordered by household_id
+    """
+    first_full_hour = cutoff.replace(minute=0, second=0, microsecond=0)
+    if first_full_hour < cutoff:
+        first_full_hour += timedelta(hours=1)
+
+    rollup_total = db.select(db.func.sum(HourlyRollup.total_kwh)).where(
+        HourlyRollup.household_id == HouseholdWatermark.household_id,
+        HourlyRollup.bucket_start >= first_full_hour
+    ).scalar_subquery()
+
+    partial_total = db.select(db.func.sum(EnergyReading.energy_kwh)).where(
+        EnergyReading.household_id == HouseholdWatermark.household_id,
+        EnergyReading.timestamp >= cutoff,
+        EnergyReading.timestamp < first_full_hour
+    ).scalar_subquery()
+
+    # Households whose newest reading is older than the cutoff have nothing to sum
+    rows = session.query(HouseholdWatermark.household_id, rollup_total, partial_total).filter(
+        HouseholdWatermark.last_timestamp >= cutoff
+    ).order_by(HouseholdWatermark.household_id).all()
+
+    return [
+        (household_id, (rollup_kwh or 0.0) + (partial_kwh or 0.0))
+        for household_id, rollup_kwh, partial_kwh in rows
+        if rollup_kwh is not None or partial_kwh is not None
+    ]
+
+
+def total_cost_for_day(session, day_start):
+    """Time-of-use cost across all households for the day starting at `day_start`."""
+    total = session.query(db.func.sum(DailyRollup.total_cost)).filter(
+        DailyRollup.bucket_start == day_start
+    ).scalar()
+    return total or 0.0
@@ -0,0 +1,93 @@
+"""
+Rule Evaluation Module
+
+Array-based matching of usage readings against optimization rule thresholds.
+Readings and thresholds are compared in one broadcast per block of records,
+and the first matching reading for every (rule, household) pair is picked
+with array operations instead of a Python loop over records x rules.
+"""
+
+import numpy as np
+
+# Upper bound on cells in one (records x rules) match block, so millions of
+# readings against hundreds of rules stay within a few MB at a time
+MATCH_BLOCK_CELLS = 1 << 22
+
+# Stands in for readings without a household_id
+MISSING_HOUSEHOLD = -1
+
+
+def usage_arrays(usage_records):
+    """
+    Column arrays from usage dicts as returned by get_latest_usage_data.
+
+    Returns:
+        tuple: (household_ids int64 ndarray, energy_kwh float64 ndarray)
+    """
+    count = len(usage_records)
+    household_ids = np.fromiter(
+        (MISSING_HOUSEHOLD if record.get('household_id') is None else record['household_id']
+         for record in usage_records),
+        dtype=np.int64, count=count
+    )
+    energy_kwh = np.fromiter(
+        (record.get('energy_kwh', 0) for record in usage_records),
+        dtype=np.float64, count=count
+    )
+    return household_ids, energy_kwh
+
+
+def first_rule_matches(household_ids, energy_kwh, thresholds, block_cells=MATCH_BLOCK_CELLS):
+    """
+    Find the first reading above each rule's threshold for every household.
+
+    Equivalent to looping over readings (outer) and rules (inner) and keeping
+    the first match per (rule, household).
+
+    Args:
+        household_ids (ndarray): (N,) household of each reading
+        energy_kwh (ndarray): (N,) energy of each reading
+        thresholds (ndarray): (R,) rule thresholds in kWh
+        block_cells (int): Maximum size of one match block
+
+    Returns:
+        tuple: (record indices, rule indices) of the matches, ordered by
+               (record, rule) like the nested loop
+    """
+    energy = np.asarray(energy_kwh, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    record_indices = [np.empty(0, dtype=np.int64)]
+    rule_indices = [np.empty(0, dtype=np.int64)]
+
+    rule_count = len(thresholds)
+    if rule_count == 0 or len(energy) == 0:
+        return record_indices[0], rule_indices[0]
+
+    household_values, household_codes = np.unique(np.asarray(household_ids), return_inverse=True)
+    household_codes = household_codes.reshape(-1)
+    seen = np.zeros(len(household_values) * rule_count, dtype=bool)
+
+    # Readings at or below every threshold can never match
+    candidates = np.flatnonzero(energy > thresholds.min())
+    block_size = max(1, block_cells // rule_count)
+
+    for start in range(0, len(candidates), block_size):
+        rows = candidates[start:start + block_size]
+        matched = energy[rows, None] > thresholds[None, :]
+
+        # Row-major, so already sorted by (record, rule)
+        row_positions, rules = np.nonzero(matched)
+        keys = household_codes[rows[row_positions]] * rule_count + rules
+
+        unique_keys, first = np.unique(keys, return_index=True)
+        new = ~seen[unique_keys]
+        seen[unique_keys[new]] = True
+        first = np.sort(first[new])
+
+        record_indices.append(rows[row_positions[first]])
+        rule_indices.append(rules[first])
+
+        if seen.all():
+            break
+
+    return np.concatenate(record_indices), np.concatenate(rule_indices)
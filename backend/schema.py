@@ -0,0 +1,178 @@
+"""
+Schema Migration Module
+
+db.create_all() only creates missing tables; it never adds indexes to a
+table that already exists. These idempotent steps bring an existing
+refit_energy_data.db up to the current schema.
+
+On PostgreSQL, energy_readings is created by hand instead: a table
+range-partitioned by month on timestamp, or a hypertable when the
+TimescaleDB extension is installed. The other tables come from the models.
+"""
+
+from sqlalchemy import text
+
+from models import db, EnergyReading
+from rollups import rebuild_rollups
+from feature_store import rebuild_feature_store
+from storage import get_storage
+
+# Partitioned tables need the partition key in every unique constraint, so
+# id is not a primary key on its own here; (household_id, timestamp) is the key
+POSTGRES_READINGS_DDL = """
+    CREATE TABLE IF NOT EXISTS energy_readings (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+        timestamp TIMESTAMP NOT NULL,
+        household_id INTEGER NOT NULL,
+        energy_kwh DOUBLE PRECISION NOT NULL,
+        future_energy_kwh DOUBLE PRECISION,
+        CONSTRAINT ux_energy_readings_household_ts UNIQUE (household_id, timestamp)
+    ) {partitioning}
+"""
+
+POSTGRES_READINGS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_energy_readings_household_ts_kwh "
+    "ON energy_readings (household_id, timestamp) INCLUDE (energy_kwh)",
+    "CREATE INDEX IF NOT EXISTS ix_energy_readings_timestamp ON energy_readings (timestamp)",
+)
+
+# Chunk width of the TimescaleDB hypertable
+HYPERTABLE_CHUNK_INTERVAL = '7 days'
+
+
+def _index_exists(conn, index_name):
+    row = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"),
+        {'name': index_name}
+    ).first()
+    return row is not None
+
+
+def ensure_unique_reading_key(conn):
+    """
+    Add the unique (household_id, timestamp) index, removing duplicate
+    readings left by earlier full reloads first (the lowest id is kept).
+    """
+    if _index_exists(conn, 'ux_energy_readings_household_ts'):
+        return
+
+    removed = conn.execute(text("""
+        DELETE FROM energy_readings
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM energy_readings GROUP BY household_id, timestamp
+        )
+    """)).rowcount
+    if removed:
+        print(f"Removed {removed} duplicate readings")
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX ux_energy_readings_household_ts "
+        "ON energy_readings (household_id, timestamp)"
+    ))
+
+
+def ensure_covering_indexes(conn):
+    """
+    Add the covering (household_id, timestamp, energy_kwh) index and the
+    rollup bucket_start indexes. The single-column household_id index is a
+    prefix of the composite ones and is dropped.
+    """
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_energy_readings_household_ts_kwh "
+        "ON energy_readings (household_id, timestamp, energy_kwh)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_energy_readings_household_id"))
+
+    for table in ('energy_rollup_hourly', 'energy_rollup_daily', 'energy_rollup_weekly'):
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_bucket_start ON {table} (bucket_start)"
+        ))
+
+
+def ensure_rollup_cost_column(conn):
+    """
+    Add total_cost to rollup tables created before time-of-use pricing.
+
+    Returns:
+        bool: True if the column was added (the rollups need a rebuild)
+    """
+    added = False
+    for table in ('energy_rollup_hourly', 'energy_rollup_daily', 'energy_rollup_weekly'):
+        columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+        if 'total_cost' not in columns:
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN total_cost FLOAT NOT NULL DEFAULT 0"
+            ))
+            added = True
+    return added
+
+
+def rebuild_watermarks(conn):
+    """Recompute household_watermarks from the readings table."""
+    conn.execute(text("DELETE FROM household_watermarks"))
+    conn.execute(text("""
+        INSERT INTO household_watermarks (household_id, last_timestamp)
+        SELECT household_id, MAX(timestamp) FROM energy_readings GROUP BY household_id
+    """))
+
+
+def fill_derived_tables(conn, rebuild=False):
+    """Rebuild watermarks, rollups and the feature store when they are empty (or `rebuild` is set)."""
+    watermark_count = conn.execute(text("SELECT COUNT(*) FROM household_watermarks")).scalar()
+    if watermark_count == 0:
+        rebuild_watermarks(conn)
+
+    rollup_count = conn.execute(text("SELECT COUNT(*) FROM energy_rollup_hourly")).scalar()
+    if rollup_count == 0 or rebuild:
+        rebuild_rollups(get_storage(conn), conn.connection)
+
+    feature_count = conn.execute(text("SELECT COUNT(*) FROM features")).scalar()
+    if feature_count == 0:
+        rebuild_feature_store(conn)
+
+
+def upgrade_schema(engine):
+    """Apply all pending SQLite schema upgrades in one transaction."""
+    with engine.begin() as conn:
+        ensure_unique_reading_key(conn)
+        ensure_covering_indexes(conn)
+        cost_column_added = ensure_rollup_cost_column(conn)
+        fill_derived_tables(conn, rebuild=cost_column_added)
+
+        # Refresh planner statistics for the new indexes
+        conn.execute(text("PRAGMA optimize"))
+
+
+def create_postgres_schema(engine):
+    """Create the PostgreSQL schema (idempotent) in one transaction."""
+    with engine.begin() as conn:
+        has_timescale = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+        )).scalar()
+        conn.execute(text(POSTGRES_READINGS_DDL.format(
+            partitioning='' if has_timescale else 'PARTITION BY RANGE (timestamp)'
+        )))
+        if has_timescale:
+            conn.execute(text(
+                "SELECT create_hypertable('energy_readings', 'timestamp', "
+                f"chunk_time_interval => INTERVAL '{HYPERTABLE_CHUNK_INTERVAL}', "
+                "create_default_indexes => FALSE, if_not_exists => TRUE)"
+            ))
+        for statement in POSTGRES_READINGS_INDEXES:
+            conn.execute(text(statement))
+
+        other_tables = [table for table in db.metadata.sorted_tables
+                        if table is not EnergyReading.__table__]
+        db.metadata.create_all(conn, tables=other_tables)
+
+        fill_derived_tables(conn)
+        conn.execute(text("ANALYZE"))
+
+
+def create_schema(engine):
+    """Create missing tables and bring existing ones up to date, for either backend."""
+    if get_storage(engine).name == 'postgresql':
+        create_postgres_schema(engine)
+    else:
+        db.metadata.create_all(engine)
+        upgrade_schema(engine)
@@ -0,0 +1,497 @@
+"""
+Storage Backend Module
+
+Database-specific parts of the reading, rollup and latest-value access
+paths. ORM queries stay portable; the few SQL functions whose spelling
+differs between databases are the constructs below and compile per dialect.
+Raw DBAPI writes (reading inserts, rollup, watermark, feature store and
+forecast upserts, file offsets) go through a storage backend chosen from the engine's dialect:
+
+- SQLiteStorage: executemany with INSERT OR IGNORE, as before
+- PostgresStorage: COPY into a staging table, then one INSERT ... SELECT
+  with ON CONFLICT DO NOTHING. energy_readings is range-partitioned by month
+  (or a TimescaleDB hypertable, see schema.py); monthly partitions are
+  created as readings for them arrive.
+
+Usage:
+    storage = get_storage(engine)
+    with storage.write_connection(engine) as (raw_conn, cursor):
+        storage.insert_readings(cursor, readings)
+"""
+
+import io
+from contextlib import contextmanager
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from models import db, HouseholdFeatures, SQLITE_DATETIME_FORMAT
+
+READING_COLUMNS = ['timestamp', 'household_id', 'energy_kwh', 'future_energy_kwh']
+
+FEATURE_STORE_COLUMNS = [column.name for column in HouseholdFeatures.__table__.columns]
+
+WINDOW_KWH_COLUMNS = [name for name in FEATURE_STORE_COLUMNS if name.startswith('kwh_')]
+
+# Household ids per IN (...) list when reading feature store windows
+IN_LIST_SIZE = 500
+
+# The dedupe key stays in place during bulk loads; INSERT OR IGNORE and
+# ON CONFLICT DO NOTHING rely on it
+READINGS_KEY_INDEX = 'ux_energy_readings_household_ts'
+
+
+def _upsert_features_sql(placeholder):
+    return (
+        f"INSERT INTO features ({', '.join(FEATURE_STORE_COLUMNS)}) "
+        f"VALUES ({', '.join([placeholder] * len(FEATURE_STORE_COLUMNS))}) "
+        "ON CONFLICT (household_id) DO UPDATE SET "
+        + ', '.join(f"{name} = excluded.{name}" for name in FEATURE_STORE_COLUMNS[1:])
+    )
+
+
+def _upsert_forecasts_sql(placeholder):
+    return (
+        "INSERT INTO forecasts (household_id, timestamp, predicted_kwh, generated_at, model_version) "
+        f"VALUES ({', '.join([placeholder] * 5)}) "
+        "ON CONFLICT (household_id, timestamp) DO UPDATE SET "
+        "predicted_kwh = excluded.predicted_kwh, generated_at = excluded.generated_at, "
+        "model_version = excluded.model_version"
+    )
+
+
+class epoch_seconds(FunctionElement):
+    """Whole seconds since the epoch of a naive DateTime column."""
+    type = db.Integer()
+    name = 'epoch_seconds'
+    inherit_cache = True
+
+
+@compiles(epoch_seconds, 'sqlite')
+def _sqlite_epoch_seconds(element, compiler, **kw):
+    column, = element.clauses
+    return compiler.process(db.cast(db.func.strftime('%s', column), db.Integer), **kw)
+
+
+@compiles(epoch_seconds, 'postgresql')
+def _postgres_epoch_seconds(element, compiler, **kw):
+    column, = element.clauses
+    return compiler.process(db.cast(db.extract('epoch', column), db.BigInteger), **kw)
+
+
+class days_before(FunctionElement):
+    """A DateTime column shifted back by a whole number of days."""
+    type = db.DateTime()
+    name = 'days_before'
+    inherit_cache = True
+
+    def __init__(self, column, days):
+        super().__init__(column, db.literal(days, db.Integer))
+
+
+@compiles(days_before, 'sqlite')
+def _sqlite_days_before(element, compiler, **kw):
+    column, days = element.clauses
+    return "datetime({}, '-' || {} || ' days')".format(
+        compiler.process(column, **kw), compiler.process(days, **kw)
+    )
+
+
+@compiles(days_before, 'postgresql')
+def _postgres_days_before(element, compiler, **kw):
+    column, days = element.clauses
+    return "({} - make_interval(days => {}))".format(
+        compiler.process(column, **kw), compiler.process(days, **kw)
+    )
+
+
+class SQLiteStorage:
+    """Single-file storage; timestamps are stored as formatted strings."""
+
+    name = 'sqlite'
+
+    PLACEHOLDER = '?'
+
+    INSERT_READINGS_SQL = (
+        "INSERT OR IGNORE INTO energy_readings "
+        "(timestamp, household_id, energy_kwh, future_energy_kwh) "
+        "VALUES (?, ?, ?, ?)"
+    )
+
+    UPSERT_WATERMARK_SQL = (
+        "INSERT INTO household_watermarks (household_id, last_timestamp) VALUES (?, ?) "
+        "ON CONFLICT(household_id) DO UPDATE SET "
+        "last_timestamp = MAX(last_timestamp, excluded.last_timestamp)"
+    )
+
+    UPSERT_ROLLUP_SQL = (
+        "INSERT INTO {table} (household_id, bucket_start, total_kwh, total_cost, reading_count) "
+        "VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(household_id, bucket_start) DO UPDATE SET "
+        "total_kwh = total_kwh + excluded.total_kwh, "
+        "total_cost = total_cost + excluded.total_cost, "
+        "reading_count = reading_count + excluded.reading_count"
+    )
+
+    UPSERT_FILE_OFFSET_SQL = (
+        "INSERT INTO ingested_files (path, header, byte_offset, ingested_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(path) DO UPDATE SET header = excluded.header, "
+        "byte_offset = excluded.byte_offset, ingested_at = excluded.ingested_at"
+    )
+
+    FILE_OFFSET_SQL = "SELECT header, byte_offset FROM ingested_files WHERE path = ?"
+
+    UPSERT_FEATURES_SQL = _upsert_features_sql('?')
+
+    UPSERT_FORECASTS_SQL = _upsert_forecasts_sql('?')
+
+    FEATURE_WINDOWS_SQL = (
+        f"SELECT household_id, {', '.join(WINDOW_KWH_COLUMNS)} FROM features "
+        "WHERE household_id IN ({placeholders})"
+    )
+
+    # Readings in (household, time) order for training.py, all or newer than a timestamp
+    ORDERED_READINGS_SQL = (
+        "SELECT household_id, timestamp, energy_kwh, future_energy_kwh FROM energy_readings "
+        "ORDER BY household_id, timestamp"
+    )
+    ORDERED_READINGS_SINCE_SQL = (
+        "SELECT household_id, timestamp, energy_kwh, future_energy_kwh FROM energy_readings "
+        "WHERE timestamp > ? ORDER BY household_id, timestamp"
+    )
+    # ...and all of some households' readings, for those training has not seen yet
+    HOUSEHOLD_READINGS_SQL = (
+        "SELECT household_id, timestamp, energy_kwh, future_energy_kwh FROM energy_readings "
+        "WHERE household_id IN ({placeholders}) ORDER BY household_id, timestamp"
+    )
+    WATERMARK_HOUSEHOLDS_SQL = "SELECT household_id FROM household_watermarks ORDER BY household_id"
+
+    SECONDARY_INDEXES_SQL = (
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name = 'energy_readings' AND sql IS NOT NULL AND name <> ?"
+    )
+
+    # Relaxed settings for a full reload only (bulk_load_csv with replace),
+    # restored when its transaction ends. With synchronous = OFF a power
+    # loss or OS crash during the load can corrupt the whole database file,
+    # not just lose the load; the file then has to be deleted and reloaded.
+    # Every other write keeps the connection settings from database.py
+    # (synchronous = NORMAL).
+    BULK_LOAD_PRAGMAS = (
+        ('synchronous', 'OFF'),
+        ('temp_store', 'MEMORY'),
+        ('cache_size', '-65536'),
+    )
+
+    def timestamp_params(self, timestamps):
+        """
+        Bind values for a column of timestamps, in the ORM's storage format
+        (SQLITE_DATETIME_FORMAT). numpy's ISO formatting with the 'T'
+        swapped for a space is several times faster than strftime.
+        """
+        values = pd.DatetimeIndex(timestamps).values.astype('datetime64[us]')
+        return np.char.replace(np.datetime_as_string(values, unit='us'), 'T', ' ').tolist()
+
+    def reading_params(self, readings):
+        """executemany parameters for prepared readings."""
+        future = readings['future_energy_kwh'].to_numpy(dtype=np.float64)
+        future_values = future.astype(object)
+        future_values[np.isnan(future)] = None
+        return zip(
+            self.timestamp_params(readings['timestamp']),
+            readings['household_id'].tolist(),
+            readings['energy_kwh'].tolist(),
+            future_values.tolist()
+        )
+
+    @contextmanager
+    def write_connection(self, engine, bulk_load=False):
+        """
+        Raw DBAPI connection and cursor for one write transaction; commits
+        on success. `bulk_load` relaxes durability for a full reload (see
+        BULK_LOAD_PRAGMAS).
+        """
+        raw_conn = engine.raw_connection()
+        cursor = raw_conn.cursor()
+        try:
+            restore = self._prepare_writes(cursor) if bulk_load else []
+            try:
+                yield raw_conn, cursor
+                raw_conn.commit()
+            except Exception:
+                raw_conn.rollback()
+                raise
+            finally:
+                for statement in restore:
+                    cursor.execute(statement)
+        finally:
+            cursor.close()
+            raw_conn.close()
+
+    def _prepare_writes(self, cursor):
+        """Apply the bulk load settings; returns statements that restore the previous ones."""
+        restore = []
+        for name, value in self.BULK_LOAD_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}")
+            restore.append(f"PRAGMA {name} = {cursor.fetchone()[0]}")
+            cursor.execute(f"PRAGMA {name} = {value}")
+        return restore
+
+    def read_cursor(self, raw_conn, name):
+        """Cursor for reading a large result with fetchmany() in bounded memory."""
+        return raw_conn.cursor()
+
+    def clear_table(self, cursor, table):
+        cursor.execute(f"DELETE FROM {table}")
+
+    def insert_readings(self, cursor, readings):
+        """
+        Insert prepared readings, skipping (household_id, timestamp) pairs already stored.
+
+        Returns:
+            int: Readings inserted
+        """
+        cursor.executemany(self.INSERT_READINGS_SQL, self.reading_params(readings))
+        return cursor.rowcount
+
+    def drop_secondary_indexes(self, cursor):
+        """
+        Drop the energy_readings indexes other than the dedupe key, so a bulk
+        load into the emptied table maintains one index instead of three.
+
+        Returns:
+            list: CREATE INDEX statements that rebuild them after the load
+        """
+        cursor.execute(self.SECONDARY_INDEXES_SQL, (READINGS_KEY_INDEX,))
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {name}")
+        return [statement for _, statement in indexes]
+
+    def upsert_rollups(self, cursor, table, household_ids, bucket_starts, totals, costs, counts):
+        """Add per-bucket totals to a rollup table."""
+        cursor.executemany(self.UPSERT_ROLLUP_SQL.format(table=table), zip(
+            household_ids, self.timestamp_params(bucket_starts), totals, costs, counts
+        ))
+
+    def upsert_watermarks(self, cursor, watermarks):
+        """Raise household_watermarks to the given {household_id: timestamp} marks."""
+        household_ids = [int(household_id) for household_id in watermarks]
+        cursor.executemany(self.UPSERT_WATERMARK_SQL, zip(
+            household_ids, self.timestamp_params(list(watermarks.values()))
+        ))
+
+    def file_offset(self, cursor, path):
+        """(header, byte_offset) recorded for an ingested CSV, or None."""
+        cursor.execute(self.FILE_OFFSET_SQL, (path,))
+        return cursor.fetchone()
+
+    def save_file_offset(self, cursor, path, header, byte_offset, ingested_at):
+        cursor.execute(self.UPSERT_FILE_OFFSET_SQL, (
+            path, header, byte_offset, self.timestamp_params([ingested_at])[0]
+        ))
+
+    def feature_windows(self, cursor, household_ids):
+        """{household_id: [kwh_1 .. kwh_6]} of the households in the feature store."""
+        windows = {}
+        for first in range(0, len(household_ids), IN_LIST_SIZE):
+            batch = [int(household_id) for household_id in household_ids[first:first + IN_LIST_SIZE]]
+            placeholders = ', '.join([self.PLACEHOLDER] * len(batch))
+            cursor.execute(self.FEATURE_WINDOWS_SQL.format(placeholders=placeholders), batch)
+            for row in cursor.fetchall():
+                windows[row[0]] = row[1:]
+        return windows
+
+    def upsert_features(self, cursor, household_ids, timestamps, features, windows):
+        """
+        Replace the feature store rows of the given households.
+
+        Args:
+            features (ndarray): (n, 10) in features.FEATURE_COLUMNS order
+            windows (ndarray): (n, 6) readings, oldest first, NaN-padded
+        """
+        window_values = pd.DataFrame(windows).astype(object)
+        window_values = window_values.where(window_values.notna(), None).values.tolist()
+        cursor.executemany(self.UPSERT_FEATURES_SQL, [
+            (int(household_id), timestamp, *feature_row, *window_row)
+            for household_id, timestamp, feature_row, window_row in zip(
+                household_ids, self.timestamp_params(timestamps), features.tolist(), window_values
+            )
+        ])
+
+    def upsert_forecasts(self, cursor, household_ids, timestamps, hourly_kwh, generated_at, model_version):
+        """
+        Store hourly forecasts, replacing any stored for the same
+        household and hour.
+
+        Args:
+            household_ids (list): n households
+            timestamps (list): The forecast's hours
+            hourly_kwh (ndarray): (n, hours) predicted kWh
+        """
+        hours = len(timestamps)
+        cursor.executemany(self.UPSERT_FORECASTS_SQL, zip(
+            np.repeat(np.asarray(household_ids, dtype=np.int64), hours).tolist(),
+            self.timestamp_params(timestamps) * len(household_ids),
+            np.asarray(hourly_kwh, dtype=np.float64).ravel().tolist(),
+            repeat(self.timestamp_params([generated_at])[0]),
+            repeat(model_version)
+        ))
+
+    def delete_forecasts(self, cursor, household_ids):
+        """Drop the stored forecasts of households whose readings changed."""
+        for first in range(0, len(household_ids), IN_LIST_SIZE):
+            batch = [int(household_id) for household_id in household_ids[first:first + IN_LIST_SIZE]]
+            placeholders = ', '.join([self.PLACEHOLDER] * len(batch))
+            cursor.execute(f"DELETE FROM forecasts WHERE household_id IN ({placeholders})", batch)
+
+
+class PostgresStorage(SQLiteStorage):
+    """PostgreSQL (or TimescaleDB) storage with COPY ingest into monthly partitions."""
+
+    name = 'postgresql'
+
+    PLACEHOLDER = '%s'
+
+    STAGING_TABLE = 'energy_readings_staging'
+
+    # Session-local; ON COMMIT DELETE ROWS empties it after every load
+    CREATE_STAGING_SQL = (
+        f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ("
+        "timestamp TIMESTAMP, household_id INTEGER, "
+        "energy_kwh DOUBLE PRECISION, future_energy_kwh DOUBLE PRECISION"
+        ") ON COMMIT DELETE ROWS"
+    )
+
+    COPY_STAGING_SQL = (
+        f"COPY {STAGING_TABLE} (timestamp, household_id, energy_kwh, future_energy_kwh) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+
+    INSERT_READINGS_SQL = (
+        "INSERT INTO energy_readings (timestamp, household_id, energy_kwh, future_energy_kwh) "
+        f"SELECT timestamp, household_id, energy_kwh, future_energy_kwh FROM {STAGING_TABLE} "
+        "ON CONFLICT (household_id, timestamp) DO NOTHING"
+    )
+
+    UPSERT_WATERMARK_SQL = (
+        "INSERT INTO household_watermarks (household_id, last_timestamp) VALUES (%s, %s) "
+        "ON CONFLICT (household_id) DO UPDATE SET "
+        "last_timestamp = GREATEST(household_watermarks.last_timestamp, excluded.last_timestamp)"
+    )
+
+    UPSERT_ROLLUP_SQL = (
+        "INSERT INTO {table} (household_id, bucket_start, total_kwh, total_cost, reading_count) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        "ON CONFLICT (household_id, bucket_start) DO UPDATE SET "
+        "total_kwh = {table}.total_kwh + excluded.total_kwh, "
+        "total_cost = {table}.total_cost + excluded.total_cost, "
+        "reading_count = {table}.reading_count + excluded.reading_count"
+    )
+
+    UPSERT_FILE_OFFSET_SQL = (
+        "INSERT INTO ingested_files (path, header, byte_offset, ingested_at) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (path) DO UPDATE SET header = excluded.header, "
+        "byte_offset = excluded.byte_offset, ingested_at = excluded.ingested_at"
+    )
+
+    FILE_OFFSET_SQL = "SELECT header, byte_offset FROM ingested_files WHERE path = %s"
+
+    ORDERED_READINGS_SINCE_SQL = (
+        "SELECT household_id, timestamp, energy_kwh, future_energy_kwh FROM energy_readings "
+        "WHERE timestamp > %s ORDER BY household_id, timestamp"
+    )
+
+    UPSERT_FEATURES_SQL = _upsert_features_sql('%s')
+
+    UPSERT_FORECASTS_SQL = _upsert_forecasts_sql('%s')
+
+    SECONDARY_INDEXES_SQL = (
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE tablename = 'energy_readings' AND indexname <> %s"
+    )
+
+    IS_PARTITIONED_SQL = (
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('energy_readings'))"
+    )
+
+    def timestamp_params(self, timestamps):
+        return pd.DatetimeIndex(timestamps).to_pydatetime().tolist()
+
+    def _prepare_writes(self, cursor):
+        # Unlike synchronous = OFF on SQLite, a crash can lose the last
+        # commits but never corrupts them. SET LOCAL ends with the transaction.
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        return []
+
+    def read_cursor(self, raw_conn, name):
+        # Named cursors are server-side, so fetchmany() streams
+        return raw_conn.cursor(name)
+
+    def clear_table(self, cursor, table):
+        cursor.execute(f"TRUNCATE {table}")
+
+    def ensure_partitions(self, cursor, timestamps):
+        """Create the monthly energy_readings partitions covering `timestamps`."""
+        cursor.execute(self.IS_PARTITIONED_SQL)
+        if not cursor.fetchone()[0]:
+            # Plain table or hypertable: nothing to create
+            return
+
+        months = pd.DatetimeIndex(timestamps).to_period('M').unique()
+        for month in months:
+            partition = f"energy_readings_{month.strftime('%Y%m')}"
+            cursor.execute("SELECT to_regclass(%s)", (partition,))
+            if cursor.fetchone()[0] is None:
+                start = month.start_time.strftime('%Y-%m-%d')
+                end = (month + 1).start_time.strftime('%Y-%m-%d')
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF energy_readings "
+                    f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                )
+
+    def insert_readings(self, cursor, readings):
+        if not len(readings):
+            return 0
+        self.ensure_partitions(cursor, readings['timestamp'])
+
+        buffer = io.StringIO()
+        readings[READING_COLUMNS].to_csv(
+            buffer, header=False, index=False, date_format=SQLITE_DATETIME_FORMAT
+        )
+        buffer.seek(0)
+
+        cursor.execute(self.CREATE_STAGING_SQL)
+        # Earlier batches in the same transaction are still staged
+        cursor.execute(f"TRUNCATE {self.STAGING_TABLE}")
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(self.COPY_STAGING_SQL, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(self.COPY_STAGING_SQL) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(self.INSERT_READINGS_SQL)
+        return cursor.rowcount
+
+
+STORAGE_BACKENDS = {
+    'sqlite': SQLiteStorage(),
+    'postgresql': PostgresStorage(),
+}
+
+
+def get_storage(bind):
+    """
+    Storage backend for an engine or connection.
+
+    Raises:
+        ValueError: If the database is neither SQLite nor PostgreSQL
+    """
+    dialect = bind.dialect.name
+    if dialect not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported database '{dialect}'; expected one of {sorted(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[dialect]
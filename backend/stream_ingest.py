@@ -0,0 +1,377 @@
+"""
+Streaming Ingest Module
+
+Continuous ingestion of meter readings. Producers (the POST endpoint and the
+optional line-protocol socket listener) parse readings into prepared
+DataFrames and put them on a bounded queue. A single background writer
+drains the queue and flushes micro-batches, when enough readings are
+waiting or the oldest has waited long enough, each in one transaction
+through ingest.append_readings. Watermark and duplicate rules are the same
+as for incremental CSV loads, so late or repeated readings are skipped.
+
+When the queue is full, submit() refuses (or blocks, for the socket
+listener), which pushes back on producers instead of growing memory.
+
+A micro-batch rejected for its data (a constraint or a value the database
+will not take) is split in halves until the readings that cannot be written
+are isolated; those are dropped and counted, and the rest of the batch is
+written. Any other failure, such as a locked or unreachable database, is
+retried with backoff and then fails the whole batch once.
+"""
+
+import socketserver
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+from sqlalchemy import exc
+
+from ingest import append_readings, prepare_chunk
+
+# Readings waiting to be written before producers are refused
+MAX_QUEUED_READINGS = 200000
+
+# Flush when this many readings are waiting...
+FLUSH_BATCH_SIZE = 5000
+
+# ...or when the oldest waiting reading is this old
+FLUSH_INTERVAL_SECONDS = 0.25
+
+# Lines parsed per submit by the socket listener
+LINE_BATCH_SIZE = 1000
+
+# Attempts at writing a micro-batch when the database fails, and the pause
+# before the first retry, doubled for each one after (a locked database
+# usually clears quickly)
+WRITE_ATTEMPTS = 3
+WRITE_RETRY_SECONDS = 0.5
+
+# Accepted field names -> prepare_chunk() CSV column names
+FIELD_ALIASES = {
+    'energy_kwh': 'energy_consumption_kWh',
+    'future_energy_kwh': 'future_consumption_kWh',
+}
+
+CSV_FIELDS = ['timestamp', 'household_id', 'energy_consumption_kWh', 'future_consumption_kWh']
+
+
+def parse_readings(records):
+    """
+    Validate and prepare readings posted as JSON objects.
+
+    Args:
+        records (list): Dicts with timestamp, household_id, energy_kwh
+                        (or energy_consumption_kWh) and optionally future_energy_kwh
+
+    Returns:
+        DataFrame: Readings in ingest.prepare_chunk() layout (empty for an
+                   empty list)
+
+    Raises:
+        ValueError: If a required field is missing or a value cannot be parsed
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Expected a list of reading objects")
+
+    df = pd.DataFrame.from_records(records, columns=None if records else CSV_FIELDS)
+    df = df.rename(columns=FIELD_ALIASES)
+    missing = [field for field in CSV_FIELDS[:3] if field not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    if df['timestamp'].isna().any() or df['household_id'].isna().any():
+        raise ValueError("timestamp and household_id are required on every reading")
+    # astype('int64') would truncate 3.7 to household 3
+    household_ids = pd.to_numeric(df['household_id'], errors='coerce')
+    if household_ids.isna().any() or (household_ids % 1 != 0).any():
+        raise ValueError("household_id must be an integer")
+
+    try:
+        return prepare_chunk(df)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid reading values: {e}") from e
+
+
+def parse_lines(lines):
+    """
+    Prepare readings from line-protocol input: one CSV line per reading,
+    'timestamp,household_id,energy_kwh[,future_energy_kwh]'.
+
+    Raises:
+        ValueError: If a line cannot be parsed
+    """
+    rows = [line.strip().split(',') for line in lines if line.strip()]
+    for row in rows:
+        if len(row) < 3:
+            raise ValueError(f"Expected at least 3 fields, got: {','.join(row)}")
+        if len(row) == 3:
+            row.append('')
+
+    df = pd.DataFrame(rows, columns=CSV_FIELDS)
+    df['future_consumption_kWh'] = pd.to_numeric(df['future_consumption_kWh'], errors='coerce')
+    try:
+        return prepare_chunk(df)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid reading values: {e}") from e
+
+
+class MicroBatchWriter:
+    """Bounded reading queue with a background thread that writes micro-batches."""
+
+    def __init__(self, engine, on_flush=None, max_queued=MAX_QUEUED_READINGS,
+                 batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS):
+        """
+        Args:
+            engine: SQLAlchemy engine bound to the energy database
+            on_flush (callable): Called with each DataFrame of appended readings
+                                 after its transaction commits
+            max_queued (int): Queue capacity in readings
+            batch_size (int): Readings that trigger an immediate flush
+            flush_interval (float): Maximum seconds a reading waits before a flush
+        """
+        self.engine = engine
+        self.on_flush = on_flush
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._batches = deque()
+        self._queued = 0
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.skipped = 0
+        self.flushes = 0
+        self.errors = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def queued(self):
+        with self._condition:
+            return self._queued
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Flush what is queued and stop the writer thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, readings, block=False, timeout=None):
+        """
+        Queue prepared readings for writing.
+
+        Args:
+            readings (DataFrame): Readings in ingest.prepare_chunk() layout
+            block (bool): Wait for room instead of refusing when full
+            timeout (float): Maximum seconds to wait when blocking
+
+        Returns:
+            bool: False if the queue had no room (the readings were not queued)
+        """
+        count = len(readings)
+        if count == 0:
+            return True
+        if count > self.max_queued:
+            raise ValueError(f"Batch of {count} readings exceeds the queue capacity of {self.max_queued}")
+
+        with self._condition:
+            if block:
+                has_room = self._condition.wait_for(
+                    lambda: self._queued + count <= self.max_queued or not self._running, timeout
+                )
+            else:
+                has_room = self._queued + count <= self.max_queued
+            if not has_room or not self._running:
+                self.rejected += count
+                return False
+
+            self._batches.append(readings)
+            self._queued += count
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self.accepted += count
+            if self._queued >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def _take_batch(self):
+        """Wait for a flush trigger, then remove and return queued readings (None to stop)."""
+        with self._condition:
+            while True:
+                if self._queued >= self.batch_size:
+                    break
+                if self._queued and time.monotonic() - self._oldest >= self.flush_interval:
+                    break
+                if not self._running:
+                    if self._queued:
+                        break
+                    return None
+                wait = self.flush_interval
+                if self._oldest is not None:
+                    wait = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                self._condition.wait(wait)
+
+            batches = []
+            taken = 0
+            while self._batches and taken < self.batch_size:
+                batch = self._batches.popleft()
+                batches.append(batch)
+                taken += len(batch)
+            self._queued -= taken
+            self._oldest = time.monotonic() if self._batches else None
+            # Producers blocked on a full queue can continue
+            self._condition.notify_all()
+
+        return pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+
+    def _is_data_error(self, error):
+        """Whether the readings themselves were rejected, rather than the write."""
+        dbapi = self.engine.dialect.loaded_dbapi
+        return isinstance(error, (ValueError, TypeError, exc.IntegrityError, exc.DataError,
+                                  dbapi.IntegrityError, dbapi.DataError))
+
+    def _write(self, readings):
+        """
+        Append a micro-batch. Data errors split it so only the readings that
+        cannot be written are dropped; other errors are retried with backoff
+        and then drop the whole batch.
+
+        Returns:
+            list: DataFrames of the readings appended
+        """
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                return [append_readings(self.engine, readings)]
+            except Exception as e:
+                self.errors += 1
+                if self._is_data_error(e):
+                    return self._split(readings, e)
+                if attempt == WRITE_ATTEMPTS - 1:
+                    self.failed += len(readings)
+                    print(f"Dropped {len(readings)} streamed readings after {WRITE_ATTEMPTS} attempts: {e}")
+                    return []
+                print(f"Error writing {len(readings)} streamed readings, retrying: {e}")
+                time.sleep(WRITE_RETRY_SECONDS * 2 ** attempt)
+
+    def _split(self, readings, error):
+        """Write the halves of a batch rejected for its data separately."""
+        if len(readings) == 1:
+            self.failed += 1
+            print(f"Dropped streamed reading {readings.iloc[0].to_dict()}: {error}")
+            return []
+
+        # Halves go in time order, so the later half does not fall behind
+        # the watermarks the earlier one advances
+        readings = readings.sort_values('timestamp', kind='stable')
+        middle = len(readings) // 2
+        return self._write(readings.iloc[:middle]) + self._write(readings.iloc[middle:])
+
+    def _run(self):
+        while True:
+            readings = self._take_batch()
+            if readings is None:
+                return
+
+            started = time.perf_counter()
+            failed = self.failed
+            appended = self._write(readings)
+            if len(appended) == 1:
+                new_rows = appended[0]
+            elif appended:
+                new_rows = pd.concat(appended, ignore_index=True)
+            else:
+                new_rows = readings.iloc[:0]
+
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushes += 1
+            self.written += len(new_rows)
+            self.skipped += len(readings) - len(new_rows) - (self.failed - failed)
+
+            if self.on_flush is not None and len(new_rows):
+                try:
+                    self.on_flush(new_rows)
+                except Exception as e:
+                    print(f"Error in ingest flush callback: {e}")
+
+    def stats(self):
+        return {
+            'running': self._running,
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'skipped': self.skipped,
+            'flushes': self.flushes,
+            'errors': self.errors,
+            'failed': self.failed,
+            'last_flush_ms': round(self.last_flush_seconds * 1000, 2)
+        }
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    """Reads CSV lines from one connection and submits them in batches."""
+
+    def handle(self):
+        writer = self.server.writer
+        lines = []
+        for raw_line in self.rfile:
+            lines.append(raw_line.decode('utf-8'))
+            if len(lines) >= LINE_BATCH_SIZE:
+                if not self._submit(writer, lines):
+                    return
+                lines = []
+        if lines:
+            self._submit(writer, lines)
+
+    def _submit(self, writer, lines):
+        try:
+            readings = parse_lines(lines)
+        except ValueError as e:
+            self.wfile.write(f"ERROR {e}\n".encode('utf-8'))
+            return False
+        # Blocking here stops reading the socket, so TCP flow control
+        # slows the sender down while the queue is full
+        if not writer.submit(readings, block=True):
+            self.wfile.write(b"ERROR ingest queue unavailable\n")
+            return False
+        return True
+
+
+class LineProtocolServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, writer):
+        self.writer = writer
+        super().__init__(address, _LineHandler)
+
+
+def start_line_listener(writer, host='127.0.0.1', port=5001):
+    """
+    Accept line-protocol readings on a local TCP socket in a background thread.
+
+    Returns:
+        LineProtocolServer: Call shutdown() to stop it
+    """
+    server = LineProtocolServer((host, port), writer)
+    thread = threading.Thread(target=server.serve_forever, name='ingest-listener', daemon=True)
+    thread.start()
+    print(f"Line-protocol ingest listening on {host}:{port}")
+    return server
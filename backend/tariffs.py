@@ -0,0 +1,199 @@
+"""
+Tariff Schedule Module
+
+Time-of-use slots and cost multipliers loaded from the ontology's
+:TimeSlot definitions and precomputed into a (month x minute-of-week)
+lookup table. Finding the slot or multiplier for a timestamp is one array
+index, and pricing an array of timestamps is a single gather.
+
+Besides :startTime, :endTime and :costMultiplier a slot may declare
+    :dayType "weekday" | "weekend"
+    :startMonth / :endMonth (1-12, inclusive, may wrap past December)
+to define weekday/weekend or seasonal variants. More specific slots take
+precedence over general ones where they overlap.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from rdflib.namespace import RDF
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Multiplier for minutes no slot covers
+DEFAULT_MULTIPLIER = 1.0
+
+DAY_TYPES = {
+    'weekday': (0, 1, 2, 3, 4),
+    'weekend': (5, 6),
+}
+
+TimeSlot = namedtuple('TimeSlot', [
+    'name', 'label', 'start_minute', 'end_minute', 'cost_multiplier', 'day_type', 'months'
+])
+
+UNSCHEDULED = TimeSlot('Unscheduled', 'Unscheduled', 0, 0, DEFAULT_MULTIPLIER, None, None)
+
+# Used until the ontology is loaded (matches smart_home_ontology.ttl)
+DEFAULT_SLOTS = [
+    TimeSlot('PeakHours', 'Peak Hours', 17 * 60, 21 * 60, 1.5, None, None),
+    TimeSlot('ShoulderHours', 'Shoulder Hours', 7 * 60, 17 * 60, 1.2, None, None),
+    TimeSlot('OffPeakHours', 'Off-Peak Hours', 21 * 60, 7 * 60, 1.0, None, None),
+]
+
+
+def parse_clock(value):
+    """Minutes after midnight for an 'HH:MM' or 'HH:MM:SS' time."""
+    parts = str(value).split(':')
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def _minute_mask(start_minute, end_minute):
+    """Minutes of the day in [start, end), wrapping past midnight when end <= start."""
+    minutes = np.arange(MINUTES_PER_DAY)
+    if end_minute > start_minute:
+        return (minutes >= start_minute) & (minutes < end_minute)
+    return (minutes >= start_minute) | (minutes < end_minute)
+
+
+def _month_mask(months):
+    if months is None:
+        return np.ones(12, dtype=bool)
+    start_month, end_month = months
+    month_numbers = np.arange(1, 13)
+    if end_month >= start_month:
+        return (month_numbers >= start_month) & (month_numbers <= end_month)
+    return (month_numbers >= start_month) | (month_numbers <= end_month)
+
+
+class TariffSchedule:
+    """Slot lookup by (month, minute of week) for scalars and arrays of timestamps."""
+
+    def __init__(self, slots):
+        self.slots = list(slots) + [UNSCHEDULED]
+        unscheduled = len(self.slots) - 1
+
+        self.lookup = np.full((12, MINUTES_PER_WEEK), unscheduled, dtype=np.int16)
+        # Paint general slots first so seasonal / day-type variants override them
+        ordered = sorted(range(unscheduled), key=lambda i: (
+            (self.slots[i].day_type is not None) + (self.slots[i].months is not None),
+            self.slots[i].name
+        ))
+        for index in ordered:
+            slot = self.slots[index]
+            if slot.day_type is None:
+                days = range(7)
+            elif slot.day_type in DAY_TYPES:
+                days = DAY_TYPES[slot.day_type]
+            else:
+                raise ValueError(f"Unknown day type {slot.day_type!r} for time slot {slot.name}")
+            week_mask = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+            week_mask[list(days)] = _minute_mask(slot.start_minute, slot.end_minute)
+            mask = _month_mask(slot.months)[:, None] & week_mask.reshape(1, -1)
+            self.lookup[mask] = index
+
+        self.multipliers = np.array([slot.cost_multiplier for slot in self.slots], dtype=np.float64)
+        self.multiplier_table = self.multipliers[self.lookup]
+
+    @staticmethod
+    def positions(timestamps):
+        """(month index, minute of week) arrays for datetime64-compatible timestamps."""
+        minutes = np.asarray(timestamps, dtype='datetime64[m]')
+        days = minutes.astype('datetime64[D]')
+        minute_of_day = (minutes - days).astype(np.int64)
+        # 1970-01-01 was a Thursday (Monday=0 convention gives 3)
+        day_of_week = (days.astype(np.int64) + 3) % 7
+        month = minutes.astype('datetime64[M]').astype(np.int64) % 12
+        return month, day_of_week * MINUTES_PER_DAY + minute_of_day
+
+    def slot_indices(self, timestamps):
+        month, minute_of_week = self.positions(timestamps)
+        return self.lookup[month, minute_of_week]
+
+    def multipliers_for(self, timestamps):
+        """Cost multiplier of every timestamp in one gather."""
+        month, minute_of_week = self.positions(timestamps)
+        return self.multiplier_table[month, minute_of_week]
+
+    def _index_at(self, moment):
+        minute_of_week = moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+        return self.lookup[moment.month - 1, minute_of_week]
+
+    def slot_at(self, moment):
+        """TimeSlot in effect at a datetime."""
+        return self.slots[self._index_at(moment)]
+
+    def next_transition(self, moment):
+        """
+        First time after `moment` when a different slot starts.
+
+        Returns:
+            tuple: (datetime, TimeSlot), or (None, None) if the slot never changes
+        """
+        start = moment.replace(second=0, microsecond=0)
+        current = self._index_at(start)
+
+        # A week ahead finds daily changes; a year covers seasonal ones
+        for horizon_days in (8, 366):
+            offsets = np.arange(1, horizon_days * MINUTES_PER_DAY + 1)
+            changed = np.flatnonzero(self.slot_indices(np.datetime64(start, 'm') + offsets) != current)
+            if len(changed):
+                at = start + timedelta(minutes=int(offsets[changed[0]]))
+                return at, self.slot_at(at)
+        return None, None
+
+
+def load_time_slots(graph, namespace):
+    """
+    Read :TimeSlot definitions from the ontology graph.
+
+    Slots with a :dayType other than those in DAY_TYPES are skipped with a
+    warning.
+
+    Returns:
+        list: TimeSlot entries, or DEFAULT_SLOTS when the graph defines none
+    """
+    slots = []
+    for subject in graph.subjects(RDF.type, namespace.TimeSlot):
+        start = graph.value(subject, namespace.startTime)
+        end = graph.value(subject, namespace.endTime)
+        if start is None or end is None:
+            continue
+
+        name = str(subject).replace(str(namespace), '', 1)
+        day_type = graph.value(subject, namespace.dayType)
+        if day_type is not None and str(day_type).lower() not in DAY_TYPES:
+            # Painting it on every day would override the general slots
+            print(f"Warning: skipping time slot {name} with unknown dayType '{day_type}'")
+            continue
+        multiplier = graph.value(subject, namespace.costMultiplier)
+        label = graph.value(subject, namespace.slotName)
+        start_month = graph.value(subject, namespace.startMonth)
+        end_month = graph.value(subject, namespace.endMonth)
+
+        slots.append(TimeSlot(
+            name=name,
+            label=str(label) if label is not None else name,
+            start_minute=parse_clock(start),
+            end_minute=parse_clock(end),
+            cost_multiplier=float(multiplier) if multiplier is not None else DEFAULT_MULTIPLIER,
+            day_type=str(day_type).lower() if day_type is not None else None,
+            months=(int(start_month), int(end_month))
+                   if start_month is not None and end_month is not None else None
+        ))
+
+    return slots or list(DEFAULT_SLOTS)
+
+
+def format_clock(moment):
+    """'9 PM' / '7:30 AM' style time of day."""
+    hour = moment.hour % 12 or 12
+    suffix = 'AM' if moment.hour < 12 else 'PM'
+    if moment.minute:
+        return f"{hour}:{moment.minute:02d} {suffix}"
+    return f"{hour} {suffix}"
+
+
+DEFAULT_SCHEDULE = TariffSchedule(DEFAULT_SLOTS)
@@ -0,0 +1,79 @@
+"""
+Shared fixtures: synthetic readings in the energy_data.csv layout, an
+empty scratch SQLite database and the app bound to one.
+"""
+
+import importlib
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from schema import create_schema
+
+READINGS_PER_DAY = 288
+
+
+def synthetic_readings(households=3, days=2, end=None, seed=0):
+    """5-minute readings per household ending at `end` (default: now), CSV layout."""
+    end = pd.Timestamp.now().floor('5min') if end is None else pd.Timestamp(end)
+    times = pd.date_range(end=end, periods=days * READINGS_PER_DAY, freq='5min')
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'timestamp': np.tile(times.values, households),
+        'household_id': np.repeat(np.arange(1, households + 1), len(times)),
+        'energy_consumption_kWh': rng.gamma(2.0, 0.1, households * len(times)).round(4),
+    })
+    df['future_consumption_kWh'] = df.groupby('household_id')['energy_consumption_kWh'].shift(-1)
+    return df
+
+
+@pytest.fixture(scope='session')
+def make_readings():
+    """synthetic_readings, for tests that need the DataFrame itself."""
+    return synthetic_readings
+
+
+@pytest.fixture(scope='session')
+def readings_csv(tmp_path_factory):
+    """Write synthetic_readings(**kwargs) to a new CSV and return its path."""
+    def write(**kwargs):
+        path = tmp_path_factory.mktemp('csv') / 'energy_data.csv'
+        synthetic_readings(**kwargs).to_csv(path, index=False)
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine of an empty SQLite database with the current schema."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'energy.db'}")
+    create_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """
+    The app module bound to a fresh SQLite database, imported with the
+    working directory in a scratch folder so model files land there.
+    """
+    workdir = tmp_path_factory.mktemp('app')
+    previous_url = os.environ.get('DATABASE_URL')
+    previous_cwd = os.getcwd()
+    os.environ['DATABASE_URL'] = f"sqlite:///{workdir / 'energy.db'}"
+    os.chdir(workdir)
+    try:
+        module = importlib.import_module('app')
+        module.init_db()
+        yield module
+    finally:
+        os.chdir(previous_cwd)
+        if previous_url is None:
+            os.environ.pop('DATABASE_URL', None)
+        else:
+            os.environ['DATABASE_URL'] = previous_url
@@ -0,0 +1,96 @@
+"""
+Batch forecasts are written by the parent through one engine and served
+only when a single run covers every household at every hour.
+"""
+
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.orm import Session
+
+import batch_forecast
+from ingest import append_readings, bulk_load_csv
+from storage import get_storage
+
+START = datetime(2026, 10, 12, 13)
+
+
+@pytest.fixture
+def engine(engine, readings_csv):
+    bulk_load_csv(engine, readings_csv(households=3, days=1, end='2026-10-12 12:55'))
+    return engine
+
+
+def write(engine, household_ids, hourly_kwh, generated_at, start_time=START):
+    storage = get_storage(engine)
+    with storage.write_connection(engine) as (_, cursor):
+        batch_forecast.write_forecasts(
+            storage, cursor, household_ids, start_time, np.asarray(hourly_kwh, dtype=np.float64), generated_at, 'v1'
+        )
+
+
+def stored(engine, **kwargs):
+    with Session(engine) as session:
+        return batch_forecast.stored_forecast(session, START, hours=2, **kwargs)
+
+
+def test_serves_the_mean_of_a_complete_run(engine):
+    run = datetime(2026, 10, 12, 12, 58)
+    write(engine, [1, 2, 3], [[1.0, 2.0], [2.0, 3.0], [3.0, 4.0]], run)
+
+    assert stored(engine) == pytest.approx([2.0, 3.0])
+    assert stored(engine, household_id=2) == pytest.approx([2.0, 3.0])
+    assert stored(engine, model_version='v2') is None
+
+
+def test_partial_run_is_not_served(engine):
+    write(engine, [1, 2], [[1.0, 2.0], [2.0, 3.0]], datetime(2026, 10, 12, 12, 58))
+
+    assert stored(engine) is None
+    assert stored(engine, household_id=1) == pytest.approx([1.0, 2.0])
+
+
+def test_new_readings_retire_the_household_forecasts(engine):
+    write(engine, [1, 2, 3], [[1.0, 2.0], [2.0, 3.0], [3.0, 4.0]], datetime(2026, 10, 12, 12, 58))
+    append_readings(engine, pd.DataFrame({
+        'timestamp': [pd.Timestamp('2026-10-12 13:00')],
+        'household_id': [2],
+        'energy_kwh': [0.4],
+        'future_energy_kwh': [float('nan')],
+    }))
+
+    assert stored(engine) is None
+    assert stored(engine, household_id=2) is None
+    assert stored(engine, household_id=1) == pytest.approx([1.0, 2.0])
+
+
+def test_run_in_progress_is_not_mixed_with_the_previous_one(engine):
+    write(engine, [1, 2, 3], [[1.0, 1.0]] * 3, datetime(2026, 10, 12, 12, 58))
+    # The next run has replaced household 1 only so far
+    write(engine, [1], [[4.0, 4.0]], datetime(2026, 10, 12, 13, 2))
+
+    assert stored(engine) is None
+    assert stored(engine, household_id=1) == pytest.approx([4.0, 4.0])
+
+    write(engine, [2, 3], [[4.0, 4.0]] * 2, datetime(2026, 10, 12, 13, 2))
+    assert stored(engine) == pytest.approx([4.0, 4.0])
+
+
+def test_run_batch_forecast_stores_every_household(engine, tmp_path):
+    from sklearn.linear_model import LinearRegression
+
+    model_path = str(tmp_path / 'model.joblib')
+    rng = np.random.default_rng(0)
+    joblib.dump(LinearRegression().fit(rng.random((50, 10)), rng.random(50)), model_path)
+
+    stats = batch_forecast.run_batch_forecast(
+        engine, model_path, workers=1, hours=2, start_time=START, models_dir=str(tmp_path / 'models')
+    )
+
+    assert stats['households'] == 3
+    forecast = stored(engine)
+    assert forecast is not None and len(forecast) == 2
+    assert all(np.isfinite(forecast))
@@ -0,0 +1,43 @@
+"""Vectorized time-of-use pricing against pricing one reading at a time."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cost_engine
+from tariffs import DEFAULT_SCHEDULE, DEFAULT_SLOTS, TariffSchedule, TimeSlot
+
+SEASONAL_SCHEDULE = TariffSchedule(DEFAULT_SLOTS + [
+    TimeSlot('WeekendDay', 'Weekend Day', 8 * 60, 20 * 60, 0.9, 'weekend', None),
+    TimeSlot('WinterPeak', 'Winter Peak', 16 * 60 + 30, 21 * 60, 1.8, None, (11, 2)),
+])
+
+
+@pytest.mark.parametrize('schedule', [DEFAULT_SCHEDULE, SEASONAL_SCHEDULE])
+def test_price_readings_matches_price_at(schedule):
+    rng = np.random.default_rng(11)
+    # A year of random minutes plus every slot boundary on one day
+    random_minutes = pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 365 * 1440, 2000), unit='min')
+    boundaries = pd.to_datetime([
+        '2026-12-05 06:59', '2026-12-05 07:00', '2026-12-05 16:30', '2026-12-05 16:59',
+        '2026-12-05 17:00', '2026-12-05 20:59', '2026-12-05 21:00', '2026-12-07 08:00',
+    ])
+    timestamps = random_minutes.append(boundaries)
+    energy = rng.gamma(2.0, 0.1, len(timestamps))
+
+    costs = cost_engine.price_readings(timestamps.values, energy, schedule)
+    expected = [
+        cost_engine.price_at(moment.to_pydatetime(), kwh, schedule)
+        for moment, kwh in zip(timestamps, energy)
+    ]
+    assert costs == pytest.approx(expected, rel=1e-12)
+
+
+def test_price_readings_of_nothing():
+    assert cost_engine.price_readings([], [], DEFAULT_SCHEDULE).shape == (0,)
+
+
+def test_rates_follow_the_default_slots():
+    timestamps = pd.to_datetime(['2026-10-14 06:59', '2026-10-14 07:00', '2026-10-14 17:00', '2026-10-14 21:00'])
+    costs = cost_engine.price_readings(timestamps.values, [1.0] * 4, DEFAULT_SCHEDULE)
+    assert costs == pytest.approx([0.12, 0.144, 0.18, 0.12])
@@ -0,0 +1,44 @@
+"""Read/write separation: a read-only pool and a single WAL writer."""
+
+import pytest
+from sqlalchemy import exc, text
+
+from database import get_writer_engine
+from models import db
+
+INSERT_WATERMARK = text(
+    "INSERT INTO household_watermarks (household_id, last_timestamp) VALUES (:household, '2026-10-12 12:00:00')"
+)
+
+
+def test_read_pool_rejects_writes(app_module):
+    with app_module.app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+            with pytest.raises(exc.OperationalError, match='readonly'):
+                conn.execute(INSERT_WATERMARK, {'household': 9001})
+
+        with db.engine.connect() as conn:
+            assert conn.execute(text(
+                "SELECT COUNT(*) FROM household_watermarks WHERE household_id = 9001"
+            )).scalar() == 0
+
+
+def test_writer_commits_are_visible_to_readers(app_module):
+    with app_module.app.app_context():
+        writer = get_writer_engine()
+        assert writer.pool.size() == 1
+        with writer.begin() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+            assert conn.execute(text("PRAGMA query_only")).scalar() == 0
+            conn.execute(INSERT_WATERMARK, {'household': 9002})
+
+        with db.engine.connect() as conn:
+            # NORMAL on both engines
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text(
+                "SELECT COUNT(*) FROM household_watermarks WHERE household_id = 9002"
+            )).scalar() == 1
+
+        with writer.begin() as conn:
+            conn.execute(text("DELETE FROM household_watermarks WHERE household_id = 9002"))
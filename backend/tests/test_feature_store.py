@@ -0,0 +1,86 @@
+"""
+The feature store must match features.notebook_features() on raw readings
+after a bulk load and after incremental CSV and streamed appends.
+"""
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+import feature_store
+from ingest import append_readings, bulk_load_csv, incremental_load_csv, prepare_chunk
+from models import HouseholdFeatures
+
+
+def stored_households(engine):
+    with Session(bind=engine) as session:
+        return [row[0] for row in session.query(HouseholdFeatures.household_id).order_by(HouseholdFeatures.household_id)]
+
+
+def assert_parity(engine, households):
+    with Session(bind=engine) as session:
+        result = feature_store.check_parity(session, households)
+    assert result['mismatches'] == []
+    return result
+
+
+def test_feature_store_matches_notebook_after_appends(engine, tmp_path, make_readings):
+    readings = make_readings(households=4, days=1, end='2026-10-12 12:00')
+    timestamps = pd.to_datetime(readings['timestamp'])
+    first_cut, second_cut = pd.Timestamp('2026-10-12 00:00'), pd.Timestamp('2026-10-12 06:00')
+
+    # Bulk load: households 1-3 up to the first cut
+    csv_path = tmp_path / 'energy_data.csv'
+    bulk = readings[(timestamps < first_cut) & (readings['household_id'] <= 3)]
+    bulk.to_csv(csv_path, index=False)
+    bulk_load_csv(engine, str(csv_path))
+    assert stored_households(engine) == [1, 2, 3]
+    assert_parity(engine, [1, 2, 3])
+
+    # Incremental CSV append: every household, household 4 for the first time
+    appended = readings[(timestamps >= first_cut) & (timestamps < second_cut)]
+    appended.to_csv(csv_path, mode='a', header=False, index=False)
+    assert incremental_load_csv(engine, str(csv_path))['rows'] == len(appended)
+    assert_parity(engine, [1, 2, 3, 4])
+
+    # Streamed appends, a few readings at a time, plus a household with too
+    # few readings for the notebook's features
+    streamed = readings[timestamps >= second_cut]
+    for start in range(0, len(streamed), 7):
+        append_readings(engine, prepare_chunk(streamed.iloc[start:start + 7]))
+    newcomer = pd.DataFrame({
+        'timestamp': ['2026-10-12 11:55:00', '2026-10-12 12:00:00'],
+        'household_id': [5, 5],
+        'energy_consumption_kWh': [0.2, 0.3],
+    })
+    append_readings(engine, prepare_chunk(newcomer))
+
+    assert stored_households(engine) == [1, 2, 3, 4, 5]
+    result = assert_parity(engine, [1, 2, 3, 4, 5])
+    assert result['checked'] == 4
+    assert result['skipped'] == 1
+
+
+def test_parity_reports_a_tampered_feature(engine, readings_csv):
+    bulk_load_csv(engine, readings_csv(households=2, days=1, end='2026-10-12 12:00'))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE features SET lag_1 = lag_1 + 1 WHERE household_id = 2")
+
+    with Session(bind=engine) as session:
+        result = feature_store.check_parity(session, [1, 2])
+    assert [(m['household_id'], m['column']) for m in result['mismatches']] == [(2, 'lag_1')]
+
+
+def test_rebuild_reads_past_a_gap_in_readings(engine, tmp_path, make_readings):
+    # A meter that was offline for three days before its last two readings
+    readings = make_readings(households=2, days=1, end='2026-10-09 12:00')
+    resumed = pd.DataFrame({
+        'timestamp': ['2026-10-12 11:55:00', '2026-10-12 12:00:00'],
+        'household_id': [1, 1],
+        'energy_consumption_kWh': [0.2, 0.3],
+    })
+    csv_path = tmp_path / 'energy_data.csv'
+    pd.concat([readings, resumed]).to_csv(csv_path, index=False)
+    bulk_load_csv(engine, str(csv_path))
+
+    result = assert_parity(engine, [1, 2])
+    assert result['checked'] == 2
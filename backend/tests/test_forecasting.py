@@ -0,0 +1,50 @@
+"""Batched recursive forecasts against the notebook's features, one step at a time."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import forecasting
+from features import FEATURE_COLUMNS, HISTORY_LENGTH, notebook_features
+
+START = datetime(2026, 10, 16, 22, 0)
+STEPS = 36
+
+
+def stepwise_forecast(history, model):
+    """Append one predicted reading at a time and recompute notebook_features."""
+    times = [START - forecasting.READING_INTERVAL * (HISTORY_LENGTH - i) for i in range(HISTORY_LENGTH)]
+    readings = pd.DataFrame({'household_id': 1, 'timestamp': times, 'energy_kwh': history})
+    predictions = []
+    for step in range(STEPS):
+        features = notebook_features(readings)[FEATURE_COLUMNS].iloc[[-1]]
+        predicted = max(float(model.predict(features.to_numpy())[0]), 0.0)
+        predictions.append(predicted)
+        readings.loc[len(readings)] = [1, START + timedelta(minutes=5 * step), predicted]
+    return predictions
+
+
+@pytest.fixture
+def models():
+    rng = np.random.default_rng(7)
+    return [
+        LinearRegression().fit(rng.random((200, len(FEATURE_COLUMNS))), rng.gamma(2.0, 0.1, 200))
+        for _ in range(3)
+    ]
+
+
+def test_batch_matches_stepwise_notebook_features(models):
+    history = np.random.default_rng(8).gamma(2.0, 0.1, size=(3, HISTORY_LENGTH))
+    expected = np.array([stepwise_forecast(row, model) for row, model in zip(history, models)])
+
+    coef = np.array([model.coef_ for model in models])
+    intercept = np.array([model.intercept_ for model in models])
+    batched = forecasting.forecast_batch(history, START, coef, intercept, steps=STEPS)
+    assert batched == pytest.approx(expected, abs=1e-9)
+
+    # The per-step predict() fallback for estimators without coefficients
+    fallback = forecasting.forecast_batch(history[:1], START, None, None, steps=STEPS, model=models[0])
+    assert fallback[0] == pytest.approx(expected[0], abs=1e-9)
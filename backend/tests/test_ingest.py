@@ -0,0 +1,38 @@
+"""Loading paths in ingest."""
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingest import append_readings, bulk_load_csv, incremental_load_csv, prepare_chunk
+from storage import SQLiteStorage
+
+PRAGMAS = ('synchronous', 'temp_store', 'cache_size')
+
+
+def pragma_values(engine):
+    with engine.connect() as conn:
+        return {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in PRAGMAS}
+
+
+def test_bulk_load_restores_connection_pragmas(engine, readings_csv):
+    before = pragma_values(engine)
+    bulk_load_csv(engine, readings_csv(households=2, days=1, end='2026-10-12 12:00'))
+    assert pragma_values(engine) == before
+
+
+def test_only_a_full_reload_relaxes_durability(engine, readings_csv, make_readings, monkeypatch):
+    path = readings_csv(households=2, days=1, end='2026-10-12 12:00')
+    bulk_load_csv(engine, path)
+
+    def fail(self, cursor):
+        raise AssertionError('relaxed pragmas outside a full reload')
+
+    monkeypatch.setattr(SQLiteStorage, '_prepare_writes', fail)
+    later = make_readings(households=2, days=1, end='2026-10-12 13:00')
+    append_readings(engine, prepare_chunk(later[pd.to_datetime(later['timestamp']) > pd.Timestamp('2026-10-12 12:00')]))
+    incremental_load_csv(engine, path)
+    bulk_load_csv(engine, path, replace=False)
+
+    with pytest.raises(AssertionError, match='full reload'):
+        bulk_load_csv(engine, path)
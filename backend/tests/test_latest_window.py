@@ -0,0 +1,26 @@
+"""In-memory latest-readings window."""
+
+import numpy as np
+import pandas as pd
+
+from latest_window import LatestWindow
+from rule_engine import first_rule_matches, usage_arrays
+
+
+def test_window_keeps_database_energy_values_for_rule_thresholds():
+    window = LatestWindow(window_size=4)
+    window.append(pd.DataFrame({
+        'timestamp': pd.to_datetime(['2026-10-12 12:00', '2026-10-12 12:05']),
+        'household_id': [1, 1],
+        'energy_kwh': [0.15, 0.1500001],
+        'future_energy_kwh': [float('nan')] * 2,
+    }))
+
+    usage = window.recent(limit=10)
+    assert [reading['energy_kwh'] for reading in usage] == [0.1500001, 0.15]
+    assert window.latest(1)[1] == 0.1500001
+
+    # A 150 Wh rule matches readings above 0.15 kWh, not at it
+    record_indices, _ = first_rule_matches(*usage_arrays(usage), np.array([0.15]))
+    assert record_indices.tolist() == [0]
+    assert not first_rule_matches(*usage_arrays(usage[1:]), np.array([0.15]))[0].size
@@ -0,0 +1,26 @@
+"""Live dashboard events published after ingest."""
+
+import warnings
+
+import pandas as pd
+
+
+def test_readings_event_lists_the_newest_readings(app_module):
+    readings = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2026-10-17 04:15:00', '2026-10-17 04:10:00.250000'], format='ISO8601'),
+        'household_id': [2, 1],
+        'energy_kwh': [0.3, 0.2],
+        'future_energy_kwh': [float('nan')] * 2,
+    })
+    subscriber = app_module.live_events.subscribe()
+    try:
+        with app_module.app.app_context(), warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            app_module.publish_live_updates(readings)
+    finally:
+        app_module.live_events.unsubscribe(subscriber)
+
+    events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+    readings_event = next(event for event in events if '\nevent: readings\n' in event)
+    assert '"timestamp":"2026-10-17T04:10:00.250000"' in readings_event
+    assert readings_event.index('04:10:00.250000') < readings_event.index('04:15:00')
@@ -0,0 +1,90 @@
+"""Load-shifting schedules: cheapest starts, deadlines and the power limit."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import load_shifting
+from tariffs import DEFAULT_SCHEDULE
+
+START = datetime(2026, 10, 14, 14, 0)
+STEPS = 24 * load_shifting.STEPS_PER_HOUR
+MAX_KW = 12.0
+
+APPLIANCES = [
+    {'name': 'Dishwasher', 'power_kw': 1.8, 'duration_minutes': 120, 'preferred_start': '18:00'},
+    {'name': 'Washing Machine', 'power_kw': 0.5, 'duration_minutes': 90, 'preferred_start': '17:30',
+     'deadline': '23:00'},
+    {'name': 'Electric Vehicle', 'power_kw': 7.2, 'duration_minutes': 240,
+     'earliest': '18:00', 'deadline': '07:00', 'preferred_start': '18:00'},
+]
+
+
+@pytest.fixture
+def base_kwh():
+    return np.random.default_rng(0).gamma(2.0, 0.05, size=(200, STEPS))
+
+
+def household_load_kw(runs, starts, mask, base_kw):
+    load = base_kw.copy()
+    for run in np.flatnonzero(mask):
+        start = starts[run]
+        load[runs.households[run], start:start + runs.durations[run]] += runs.power_kw[run]
+    return load
+
+
+def test_limited_starts_keep_base_load_plus_runs_under_the_limit(base_kwh):
+    household_ids = np.arange(1, len(base_kwh) + 1)
+    _, runs = load_shifting.build_runs(APPLIANCES, household_ids, START, STEPS)
+    prices = load_shifting.step_prices(START, STEPS, DEFAULT_SCHEDULE)
+    base_kw = base_kwh * load_shifting.STEPS_PER_HOUR
+
+    starts, placed = load_shifting.limited_starts(runs, base_kw, MAX_KW, prices)
+
+    assert placed.mean() > 0.95
+    assert household_load_kw(runs, starts, placed, base_kw).max() <= MAX_KW + 1e-9
+    assert (starts >= runs.earliest).all() and (starts <= runs.latest_start).all()
+
+
+def test_cheapest_starts_match_a_search_over_every_start(base_kwh):
+    household_ids = np.arange(1, 4)
+    _, runs = load_shifting.build_runs(APPLIANCES, household_ids, START, STEPS)
+    prices = load_shifting.step_prices(START, STEPS, DEFAULT_SCHEDULE)
+
+    starts = load_shifting.cheapest_starts(runs, prices)
+    for run, start in enumerate(starts):
+        candidates = range(runs.earliest[run], runs.latest_start[run] + 1)
+        costs = [prices[c:c + runs.durations[run]].sum() for c in candidates]
+        assert prices[start:start + runs.durations[run]].sum() == pytest.approx(min(costs))
+
+
+@pytest.mark.parametrize('max_kw', [None, MAX_KW])
+def test_simulation_meets_deadlines_and_the_limit(base_kwh, max_kw):
+    household_ids = np.arange(1, len(base_kwh) + 1)
+    result = load_shifting.simulate_load_shifting(
+        household_ids, base_kwh, APPLIANCES, START, max_kw=max_kw, schedule=DEFAULT_SCHEDULE
+    )
+
+    deadlines = {'Washing Machine': START.replace(hour=23), 'Electric Vehicle': START.replace(hour=7) + timedelta(days=1)}
+    load = base_kwh * load_shifting.STEPS_PER_HOUR
+    for run in result['runs']:
+        start = datetime.fromisoformat(run['optimized_start'])
+        end = start + timedelta(minutes=run['duration_minutes'])
+        assert START <= start and end <= START + timedelta(minutes=5 * STEPS)
+        if run['appliance'] in deadlines:
+            assert end <= deadlines[run['appliance']]
+        if run['appliance'] == 'Electric Vehicle':
+            assert start >= START.replace(hour=18)
+        if run['placed']:
+            first = int((start - START) / timedelta(minutes=5))
+            power_kw = next(a['power_kw'] for a in APPLIANCES if a['name'] == run['appliance'])
+            load[run['household_id'] - 1, first:first + run['duration_minutes'] // 5] += power_kw
+
+    totals = result['totals']
+    assert totals['optimized_cost'] <= totals['baseline_cost']
+    if max_kw is None:
+        assert totals['unplaced_runs'] == 0
+    else:
+        assert load.max() <= max_kw + 1e-9
+        assert totals['unplaced_runs'] < len(result['runs']) * 0.05
@@ -0,0 +1,89 @@
+"""Model registry: lazy loading, the LRU byte budget and hot reload."""
+
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from features import FEATURE_COLUMNS
+from model_registry import ModelRegistry, household_model_path, pack_household_models
+
+
+def fitted(intercept):
+    model = LinearRegression().fit(np.eye(len(FEATURE_COLUMNS)), np.zeros(len(FEATURE_COLUMNS)))
+    model.intercept_ = float(intercept)
+    return model
+
+
+def save(path, model, bump_seconds=0):
+    """Write under another name and rename into place, as the registry expects."""
+    joblib.dump(model, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    if bump_seconds:
+        # Later than anything written this second, whatever the mtime resolution
+        for touched in (path, os.path.dirname(path)):
+            stat = os.stat(touched)
+            os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump_seconds * 10 ** 9))
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    directory = tmp_path / 'models'
+    directory.mkdir()
+    save(str(tmp_path / 'default.joblib'), fitted(0.0))
+    for household_id in (1, 2, 3):
+        save(household_model_path(str(directory), household_id), fitted(household_id))
+    return str(directory)
+
+
+def registry_for(models_dir, **kwargs):
+    return ModelRegistry(os.path.join(os.path.dirname(models_dir), 'default.joblib'), models_dir, **kwargs)
+
+
+def test_least_recently_used_model_is_evicted(models_dir):
+    model_bytes = os.path.getsize(household_model_path(models_dir, 1))
+    registry = registry_for(models_dir, max_bytes=2 * model_bytes)
+
+    assert registry.get(1).intercept_ == 1.0
+    assert registry.get(2).intercept_ == 2.0
+    registry.get(1)
+    registry.get(3)
+
+    stats = registry.stats()
+    assert (stats['loads'], stats['hits'], stats['evictions']) == (3, 1, 1)
+    assert stats['loaded_bytes'] <= registry.max_bytes
+    # 2 was the least recently used, so 1 is still cached
+    registry.get(1)
+    registry.get(2)
+    assert (registry.stats()['hits'], registry.stats()['loads']) == (2, 4)
+
+
+def test_replaced_and_added_models_are_picked_up(models_dir):
+    registry = registry_for(models_dir)
+    generation = registry.generation
+    assert registry.get(2).intercept_ == 2.0
+    assert registry.get(4).intercept_ == 0.0
+    assert registry.refresh() is False
+
+    save(household_model_path(models_dir, 2), fitted(20.0), bump_seconds=1)
+    save(household_model_path(models_dir, 4), fitted(4.0), bump_seconds=2)
+    assert registry.refresh() is True
+    assert registry.generation != generation
+
+    assert registry.get(2).intercept_ == 20.0
+    assert registry.get(4).intercept_ == 4.0
+    assert registry.stats()['reloads'] == 1
+
+
+def test_packed_matrix_serves_the_households_it_packs(models_dir):
+    registry = registry_for(models_dir)
+    pack_household_models(models_dir)
+    registry.refresh()
+
+    assert registry.model_path(2) is None
+    coef, intercept, estimators = registry.household_parameters([3, 1, 9])
+    assert intercept.tolist() == [3.0, 1.0, 0.0]
+    assert coef.shape == (3, len(FEATURE_COLUMNS))
+    assert estimators == []
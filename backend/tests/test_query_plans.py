@@ -0,0 +1,62 @@
+"""
+Endpoint queries must search an index: no SCAN of energy_readings or a
+rollup table and no temporary B-tree sort (see query_plans.py).
+"""
+
+import pytest
+
+import training
+from query_plans import capture_statements, check_query_plans, full_scans
+
+COVERING_INDEX = 'COVERING INDEX ix_energy_readings_household_ts_kwh'
+
+
+@pytest.fixture(scope='module')
+def loaded_app(app_module, readings_csv, tmp_path_factory):
+    app_module.load_energy_data(readings_csv(households=3, days=2))
+    state_path = str(tmp_path_factory.mktemp('training') / 'training_state.npz')
+    with app_module.app.app_context():
+        training.train_model(app_module.get_writer_engine(), app_module.MODEL_PATH, state_path=state_path)
+    return app_module
+
+
+def explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def test_endpoint_queries_search_indexes(loaded_app):
+    # Reload the latest window so its startup query is captured as well
+    loaded_app.latest_window.loaded = False
+    with loaded_app.app.app_context():
+        failures = check_query_plans(loaded_app.app, loaded_app.db.engine)
+    assert failures == []
+
+
+@pytest.mark.parametrize('endpoint', [
+    '/api/energy/current',
+    '/api/energy/usage?range=24h&household_id=1',
+    '/api/appliances/1/usage?range=7d',
+    '/api/appliances/breakdown',
+])
+def test_household_reads_use_covering_index(loaded_app, endpoint):
+    loaded_app.latest_window.loaded = False
+    with loaded_app.app.app_context():
+        engine = loaded_app.db.engine
+        plans = [
+            explain(engine, statement, parameters)
+            for _, statement, parameters in capture_statements(loaded_app.app, engine, [endpoint])
+        ]
+    reading_steps = [detail for plan in plans for detail in plan if 'energy_readings' in detail]
+    assert reading_steps
+    assert all(COVERING_INDEX in detail for detail in reading_steps), reading_steps
+
+
+def test_full_scans_flags_scans_and_temp_btrees():
+    plan = [
+        (2, 0, 0, 'SCAN energy_readings USING COVERING INDEX ix_energy_readings_household_ts_kwh'),
+        (3, 0, 0, 'SEARCH energy_rollup_hourly USING INDEX ix_rollup_hourly (household_id=?)'),
+        (4, 0, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+        (5, 0, 0, 'SCAN household_watermarks'),
+    ]
+    assert full_scans(plan) == [plan[0][-1], plan[2][-1]]
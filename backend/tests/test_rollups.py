@@ -0,0 +1,25 @@
+"""Rollups kept by ingest."""
+
+import pandas as pd
+from sqlalchemy import text
+
+import optimization_rules
+from ingest import append_readings, bulk_load_csv, prepare_chunk
+
+
+def test_ingest_never_parses_the_ontology(engine, readings_csv, make_readings, monkeypatch):
+    def fail():
+        raise AssertionError('ontology parsed during ingest')
+
+    # Looks changed on disk, so any refresh would reload it
+    monkeypatch.setattr(optimization_rules, 'ONTOLOGY_VERSION', ('stale', 0))
+    monkeypatch.setattr(optimization_rules, 'load_ontology_graph', fail)
+
+    bulk_load_csv(engine, readings_csv(households=2, days=1, end='2026-10-12 12:00'))
+    later = make_readings(households=2, days=1, end='2026-10-12 13:00')
+    append_readings(engine, prepare_chunk(later[pd.to_datetime(later['timestamp']) > pd.Timestamp('2026-10-12 12:00')]))
+
+    with engine.connect() as conn:
+        hourly = conn.execute(text("SELECT SUM(reading_count), SUM(total_cost) FROM energy_rollup_hourly")).one()
+    assert hourly[0] == 2 * 288 + 24
+    assert hourly[1] > 0
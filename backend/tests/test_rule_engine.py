@@ -0,0 +1,59 @@
+"""Broadcast rule matching against the nested readings x rules loop it replaced."""
+
+import numpy as np
+import pytest
+
+from rule_engine import MISSING_HOUSEHOLD, first_rule_matches, usage_arrays
+
+
+def loop_matches(household_ids, energy_kwh, thresholds):
+    """The original loop: first reading above each rule's threshold per household."""
+    matches = {}
+    for record_index, (household_id, energy) in enumerate(zip(household_ids, energy_kwh)):
+        for rule_index, threshold in enumerate(thresholds):
+            if energy > threshold and (rule_index, household_id) not in matches:
+                matches[(rule_index, household_id)] = record_index
+    return [(record_index, rule_index) for (rule_index, _), record_index in matches.items()]
+
+
+def vector_matches(household_ids, energy_kwh, thresholds, **kwargs):
+    records, rules = first_rule_matches(
+        np.asarray(household_ids), np.asarray(energy_kwh), np.asarray(thresholds), **kwargs
+    )
+    return list(zip(records.tolist(), rules.tolist()))
+
+
+@pytest.mark.parametrize('block_cells', [1 << 22, 7])
+def test_matches_the_loop_including_ties(block_cells):
+    rng = np.random.default_rng(5)
+    # Thresholds as compiled from the ontology's Wh values
+    thresholds = [wh / 1000 for wh in (150, 100, 200, 150, 50)]
+    household_ids = rng.integers(1, 6, size=400).tolist()
+    # Half the readings sit exactly on a threshold
+    energy = np.where(
+        rng.random(400) < 0.5, rng.choice(thresholds, size=400), rng.uniform(0.0, 0.25, size=400)
+    ).tolist()
+
+    expected = loop_matches(household_ids, energy, thresholds)
+    assert vector_matches(household_ids, energy, thresholds, block_cells=block_cells) == expected
+
+
+def test_reading_at_the_threshold_does_not_match():
+    usage = [
+        {'household_id': 1, 'energy_kwh': 0.15},
+        {'household_id': None, 'energy_kwh': 0.2},
+        {'household_id': 1, 'energy_kwh': 0.1500001},
+    ]
+    household_ids, energy = usage_arrays(usage)
+    assert household_ids.tolist() == [1, MISSING_HOUSEHOLD, 1]
+
+    thresholds = [150 / 1000]
+    assert vector_matches(household_ids, energy, thresholds) == [(1, 0), (2, 0)]
+    assert vector_matches(household_ids, energy, thresholds) == loop_matches(
+        household_ids.tolist(), energy.tolist(), thresholds
+    )
+
+
+def test_no_rules_or_no_readings():
+    assert vector_matches([1, 2], [0.3, 0.4], []) == []
+    assert vector_matches([], [], [0.1]) == []
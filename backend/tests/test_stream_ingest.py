@@ -0,0 +1,127 @@
+"""Streaming ingest: the bounded queue and the micro-batch writer."""
+
+import sqlite3
+import threading
+
+import pytest
+
+import stream_ingest
+from ingest import append_readings, prepare_chunk
+from stream_ingest import MicroBatchWriter, parse_readings
+
+
+@pytest.fixture
+def readings(make_readings):
+    return prepare_chunk(make_readings(households=2, days=1, end='2026-10-12 12:00'))
+
+
+@pytest.fixture
+def no_retry_pause(monkeypatch):
+    monkeypatch.setattr(stream_ingest, 'WRITE_RETRY_SECONDS', 0)
+
+
+def write_all(writer, readings):
+    writer.start()
+    assert writer.submit(readings)
+    writer.stop()
+    return writer.stats()
+
+
+def test_full_queue_refuses_producers(engine, readings, monkeypatch):
+    taken = threading.Event()
+    release = threading.Event()
+
+    def slow_append(engine, batch):
+        taken.set()
+        release.wait(5)
+        return append_readings(engine, batch)
+
+    monkeypatch.setattr(stream_ingest, 'append_readings', slow_append)
+    writer = MicroBatchWriter(engine, max_queued=10, batch_size=5, flush_interval=0.01)
+    writer.start()
+    try:
+        assert writer.submit(readings.iloc[:5])
+        assert taken.wait(5)
+        assert writer.submit(readings.iloc[5:15])
+        assert not writer.submit(readings.iloc[15:16])
+        assert not writer.submit(readings.iloc[15:16], block=True, timeout=0.05)
+        with pytest.raises(ValueError):
+            writer.submit(readings.iloc[:11])
+    finally:
+        release.set()
+        writer.stop()
+
+    stats = writer.stats()
+    assert stats['rejected'] == 2
+    assert stats['written'] == 15
+    assert stats['queued'] == 0
+
+
+def test_data_error_drops_only_the_bad_reading(engine, readings, monkeypatch, no_retry_pause):
+    bad_timestamp = readings['timestamp'].iloc[7]
+
+    def append(engine, batch):
+        if (batch['timestamp'] == bad_timestamp).any() and (batch['household_id'] == 1).any():
+            raise sqlite3.IntegrityError('CHECK constraint failed')
+        return append_readings(engine, batch)
+
+    monkeypatch.setattr(stream_ingest, 'append_readings', append)
+    stats = write_all(MicroBatchWriter(engine, batch_size=len(readings)), readings)
+
+    assert stats['failed'] == 1
+    assert stats['written'] == len(readings) - 1
+
+
+def test_database_error_fails_the_whole_batch_once(engine, readings, monkeypatch, no_retry_pause):
+    calls = []
+
+    def append(engine, batch):
+        calls.append(len(batch))
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(stream_ingest, 'append_readings', append)
+    stats = write_all(MicroBatchWriter(engine, batch_size=len(readings)), readings)
+
+    # Retried whole, never split into a query per reading
+    assert calls == [len(readings)] * stream_ingest.WRITE_ATTEMPTS
+    assert stats['failed'] == len(readings)
+    assert stats['written'] == 0
+    assert stats['skipped'] == 0
+
+
+def test_database_error_that_clears_is_retried(engine, readings, monkeypatch, no_retry_pause):
+    calls = []
+
+    def append(engine, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        return append_readings(engine, batch)
+
+    monkeypatch.setattr(stream_ingest, 'append_readings', append)
+    stats = write_all(MicroBatchWriter(engine, batch_size=len(readings)), readings)
+
+    assert calls == [len(readings)] * 2
+    assert stats['failed'] == 0
+    assert stats['written'] == len(readings)
+
+
+def test_empty_post_is_accepted_as_a_no_op(app_module):
+    response = app_module.app.test_client().post('/api/v1/readings', json=[])
+    assert response.status_code == 202
+    assert response.get_json()['accepted'] == 0
+
+
+@pytest.mark.parametrize('household_id', [3.7, 'three', None])
+def test_household_id_must_be_an_integer(app_module, household_id):
+    reading = {'timestamp': '2026-10-12T12:00:00', 'household_id': household_id, 'energy_kwh': 0.2}
+    response = app_module.app.test_client().post('/api/v1/readings', json=[reading])
+    assert response.status_code == 400
+
+
+def test_integral_household_ids_are_accepted():
+    readings = parse_readings([
+        {'timestamp': '2026-10-12T12:00:00', 'household_id': 3.0, 'energy_kwh': 0.2},
+        {'timestamp': '2026-10-12T12:00:00', 'household_id': '4', 'energy_kwh': 0.3},
+    ])
+    assert readings['household_id'].tolist() == [3, 4]
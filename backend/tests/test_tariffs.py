@@ -0,0 +1,51 @@
+"""Time-of-use slots from the ontology."""
+
+from datetime import datetime
+
+import pytest
+from rdflib import Graph, Literal
+from rdflib.namespace import RDF
+
+import optimization_rules
+from optimization_rules import SMART_ENERGY
+from tariffs import DEFAULT_SLOTS, TariffSchedule, load_time_slots
+
+
+def slot_graph(**day_types):
+    graph = Graph()
+    for name, day_type in day_types.items():
+        subject = SMART_ENERGY[name]
+        graph.add((subject, RDF.type, SMART_ENERGY.TimeSlot))
+        graph.add((subject, SMART_ENERGY.startTime, Literal('17:00')))
+        graph.add((subject, SMART_ENERGY.endTime, Literal('21:00')))
+        graph.add((subject, SMART_ENERGY.costMultiplier, Literal(2.0)))
+        graph.add((subject, SMART_ENERGY.dayType, Literal(day_type)))
+    return graph
+
+
+def test_unknown_day_type_is_skipped(capsys):
+    slots = load_time_slots(slot_graph(WeekendPeak='Weekend', HolidayPeak='holiday'), SMART_ENERGY)
+
+    assert [(slot.name, slot.day_type) for slot in slots] == [('WeekendPeak', 'weekend')]
+    assert "HolidayPeak with unknown dayType 'holiday'" in capsys.readouterr().out
+
+
+def test_schedule_rejects_unknown_day_type():
+    holiday = DEFAULT_SLOTS[0]._replace(name='HolidayPeak', day_type='holiday')
+    with pytest.raises(ValueError, match='holiday'):
+        TariffSchedule(DEFAULT_SLOTS + [holiday])
+
+
+@pytest.mark.parametrize('hour, expected', [
+    (18, '9 PM (Off-Peak begins)'),
+    (12, '5 PM (Peak Hours begin)'),
+    (23, '7 AM (Shoulder Hours begin)'),
+])
+def test_next_transition_keeps_the_api_wording(monkeypatch, hour, expected):
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 10, 14, hour, 30)
+
+    monkeypatch.setattr(optimization_rules, 'datetime', FixedDatetime)
+    assert optimization_rules.get_time_slot_info()['next_transition'] == expected
@@ -0,0 +1,43 @@
+"""Chunked and incremental training against a full refit and the notebook."""
+
+import joblib
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import training
+from features import FEATURE_COLUMNS, notebook_features
+from ingest import append_readings, prepare_chunk
+
+
+def fit(engine, tmp_path, name, full=False):
+    model_path = str(tmp_path / f'{name}.joblib')
+    stats = training.train_model(engine, model_path, str(tmp_path / 'state.npz'), full=full, chunk_rows=97)
+    return joblib.load(model_path), stats
+
+
+def test_incremental_fit_matches_full_refit(engine, tmp_path, make_readings):
+    readings = make_readings(households=3, days=4, end='2026-10-12 12:00')
+    timestamps = pd.to_datetime(readings['timestamp'])
+    cut = pd.Timestamp('2026-10-11 03:00')
+    # Household 3 only arrives with the second batch
+    first = readings[(timestamps < cut) & (readings['household_id'] < 3)]
+    append_readings(engine, prepare_chunk(first))
+    fit(engine, tmp_path, 'first')
+
+    append_readings(engine, prepare_chunk(readings.drop(first.index)))
+    incremental, incremental_stats = fit(engine, tmp_path, 'incremental')
+    full, full_stats = fit(engine, tmp_path, 'full', full=True)
+
+    assert incremental_stats['rows'] < full_stats['rows']
+    assert incremental_stats['samples'] == full_stats['samples']
+    assert incremental.coef_ == pytest.approx(full.coef_, rel=1e-7, abs=1e-9)
+    assert incremental.intercept_ == pytest.approx(full.intercept_, rel=1e-7)
+
+    # The notebook: all readings in one DataFrame, pandas features, sklearn fit
+    df = notebook_features(readings.rename(columns={
+        'energy_consumption_kWh': 'energy_kwh', 'future_consumption_kWh': 'future_energy_kwh'
+    }).assign(timestamp=timestamps)).dropna(subset=['future_energy_kwh'])
+    notebook = LinearRegression().fit(df[FEATURE_COLUMNS].to_numpy(), df['future_energy_kwh'])
+    assert full.coef_ == pytest.approx(notebook.coef_, rel=1e-6, abs=1e-9)
+    assert full.intercept_ == pytest.approx(notebook.intercept_, rel=1e-6)
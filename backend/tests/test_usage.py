@@ -0,0 +1,79 @@
+"""/api/energy/usage from the rollups against the original per-reading scan."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import cost_engine
+from database import get_writer_engine
+from ingest import append_readings, prepare_chunk
+from models import EnergyReading
+
+NOW = datetime(2026, 10, 14, 12, 34)
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls.combine(NOW.date(), NOW.time(), tz)
+
+
+@pytest.fixture(scope='module')
+def client(app_module, make_readings):
+    readings = make_readings(households=2, days=35, end='2026-10-14 12:30', seed=3)
+    readings['household_id'] += 100
+    with app_module.app.app_context():
+        append_readings(get_writer_engine(), prepare_chunk(readings))
+    return app_module.app.test_client()
+
+
+def legacy_usage(time_range, household_id):
+    """The endpoint before rollups: every reading scanned once per bucket."""
+    today = NOW.replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff, buckets = {
+        '24h': (NOW - timedelta(hours=24), [
+            (f"{i}:00", NOW.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23 - i), timedelta(hours=1))
+            for i in range(24)
+        ]),
+        '7d': (NOW - timedelta(days=7), [
+            (None, today - timedelta(days=6 - i), timedelta(days=1)) for i in range(7)
+        ]),
+        '30d': (NOW - timedelta(days=30), [
+            (f"Week {week + 1}", today - timedelta(days=28 - week * 7), timedelta(days=7)) for week in range(4)
+        ]),
+    }[time_range]
+    query = EnergyReading.query.filter(EnergyReading.timestamp >= cutoff)
+    if household_id:
+        query = query.filter(EnergyReading.household_id == household_id)
+    readings = query.order_by(EnergyReading.timestamp).all()
+
+    result = []
+    for label, start, width in buckets:
+        bucket = [r for r in readings if start <= r.timestamp < start + width]
+        consumption = sum(r.energy_kwh for r in bucket)
+        cost = sum(cost_engine.price_at(r.timestamp, r.energy_kwh) for r in bucket)
+        if time_range == '24h':
+            mean = consumption / len(bucket) if bucket else 0
+            result.append({'time': label, 'consumption': round(mean, 3),
+                           'cost': round(cost / len(bucket), 2) if bucket else 0})
+        elif time_range == '7d':
+            day = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'][start.weekday()]
+            result.append({'day': day, 'consumption': round(consumption, 2), 'cost': round(cost, 2)})
+        else:
+            result.append({'week': label, 'consumption': round(consumption, 2), 'cost': round(cost, 2)})
+    return result
+
+
+@pytest.mark.parametrize('household_id', [None, 101])
+@pytest.mark.parametrize('time_range', ['24h', '7d', '30d'])
+def test_usage_matches_the_per_reading_scan(app_module, client, monkeypatch, time_range, household_id):
+    monkeypatch.setattr(app_module, 'datetime', FixedDatetime)
+    query = {'range': time_range}
+    if household_id:
+        query['household_id'] = household_id
+    response = client.get('/api/energy/usage', query_string=query)
+
+    assert response.status_code == 200
+    with app_module.app.app_context():
+        expected = legacy_usage(time_range, household_id)
+    assert response.get_json() == expected
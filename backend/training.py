@@ -0,0 +1,352 @@
+"""
+Model Training Module
+
+Trains the energy prediction model from the readings table, replacing the
+steps of model_training.ipynb. Readings stream in (household, time) order
+in chunks. Features are computed with features.py, the same code the
+forecasts and the feature store use. The linear model is fit from
+accumulated normal equations: XᵀX and Xᵀy over the 10 features plus an
+intercept column.
+
+Memory is bounded by the chunk size plus a small carry per household: its
+last 6 readings, so windows continue across chunks and runs, and the
+household's newest timestamp. The accumulators and carry are saved with
+the model, so a later run reads only readings newer than each household's
+carry, and all readings of households it has not seen, and adds them to
+the fit. Use --full after readings were replaced
+(e.g. a bulk CSV reload).
+
+The target is a reading's future_energy_kwh, as in the notebook, or the
+household's next reading when that column is empty. Rows without a target
+yet (the newest streamed reading) wait in the carry until the next one
+arrives. Like the notebook's dropna(), rows with fewer than 3 earlier
+readings are not trained on.
+
+Usage:
+    flask --app app train-model
+    flask --app app train-model --full --chunk-size 200000
+"""
+
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, HISTORY_LENGTH, MIN_HISTORY, feature_matrix, household_windows
+from storage import IN_LIST_SIZE, get_storage
+
+# Fetching rows dominates; larger chunks buy little speed for their memory
+# (about 0.7 KB per row: 1M readings train in ~2.5s either way with 50000
+# or 100000, with a 34 or 68 MB peak; python benchmarks.py training)
+DEFAULT_CHUNK_ROWS = 50000
+
+STATE_PATH = 'training_state.npz'
+
+FEATURE_COUNT = len(FEATURE_COLUMNS)
+
+
+class TrainingState:
+    """
+    Normal equations of the fit so far plus each household's carry.
+
+    gram and moment hold XᵀX and Xᵀy with the intercept as the last column;
+    household_ids is sorted, and tails[i] holds household i's last readings
+    (oldest first, NaN-padded).
+    """
+
+    def __init__(self):
+        self.gram = np.zeros((FEATURE_COUNT + 1, FEATURE_COUNT + 1))
+        self.moment = np.zeros(FEATURE_COUNT + 1)
+        self.count = 0
+        self.target_sum = 0.0
+        self.target_squares = 0.0
+        self.household_ids = np.empty(0, dtype=np.int64)
+        self.tails = np.empty((0, HISTORY_LENGTH))
+        self.last_timestamps = np.empty(0, dtype='datetime64[us]')
+        self.pending = np.empty(0, dtype=bool)
+
+    @classmethod
+    def load(cls, path):
+        """State saved by save(), or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        state = cls()
+        with np.load(path) as saved:
+            state.gram = saved['gram']
+            state.moment = saved['moment']
+            state.count = int(saved['count'])
+            state.target_sum = float(saved['target_sum'])
+            state.target_squares = float(saved['target_squares'])
+            state.household_ids = saved['household_ids']
+            state.tails = saved['tails']
+            state.last_timestamps = saved['last_timestamps']
+            state.pending = saved['pending']
+        return state
+
+    def save(self, path):
+        """Write the state beside `path` and rename it into place."""
+        temp_path = path + '.tmp.npz'
+        np.savez(
+            temp_path,
+            gram=self.gram, moment=self.moment, count=self.count,
+            target_sum=self.target_sum, target_squares=self.target_squares,
+            household_ids=self.household_ids, tails=self.tails,
+            last_timestamps=self.last_timestamps, pending=self.pending
+        )
+        os.replace(temp_path, path)
+
+    def since(self):
+        """Oldest household carry timestamp; newer readings are unseen (None: read all)."""
+        if len(self.last_timestamps) == 0:
+            return None
+        return pd.Timestamp(self.last_timestamps.min()).to_pydatetime()
+
+    def accumulate(self, features, targets):
+        design = np.column_stack([features, np.ones(len(features))])
+        self.gram += design.T @ design
+        self.moment += design.T @ targets
+        self.count += len(targets)
+        self.target_sum += float(targets.sum())
+        self.target_squares += float(targets @ targets)
+
+    def carry(self, household_ids):
+        """(row in state or -1, tails, last timestamps, pending) for sorted household ids."""
+        rows = np.full(len(household_ids), -1, dtype=np.int64)
+        if len(self.household_ids):
+            positions = np.minimum(np.searchsorted(self.household_ids, household_ids), len(self.household_ids) - 1)
+            rows = np.where(self.household_ids[positions] == household_ids, positions, -1)
+        known = rows >= 0
+
+        tails = np.full((len(household_ids), HISTORY_LENGTH), np.nan)
+        tails[known] = self.tails[rows[known]]
+        last_timestamps = np.full(len(household_ids), np.datetime64('NaT'), dtype='datetime64[us]')
+        last_timestamps[known] = self.last_timestamps[rows[known]]
+        pending = np.zeros(len(household_ids), dtype=bool)
+        pending[known] = self.pending[rows[known]]
+        return rows, tails, last_timestamps, pending
+
+    def update_carry(self, household_ids, rows, tails, last_timestamps, pending):
+        known = rows >= 0
+        self.tails[rows[known]] = tails[known]
+        self.last_timestamps[rows[known]] = last_timestamps[known]
+        self.pending[rows[known]] = pending[known]
+        if known.all():
+            return
+
+        new = ~known
+        household_order = np.concatenate([self.household_ids, household_ids[new]])
+        order = np.argsort(household_order, kind='stable')
+        self.household_ids = household_order[order]
+        self.tails = np.concatenate([self.tails, tails[new]])[order]
+        self.last_timestamps = np.concatenate([self.last_timestamps, last_timestamps[new]])[order]
+        self.pending = np.concatenate([self.pending, pending[new]])[order]
+
+    def solve(self):
+        """
+        Least-squares solution of the accumulated normal equations.
+
+        Returns:
+            tuple: (coef (10,), intercept, metrics) with in-sample r2 and rmse
+        """
+        solution = np.linalg.lstsq(self.gram, self.moment, rcond=None)[0]
+        coef, intercept = solution[:-1], float(solution[-1])
+
+        # Residual and total sums of squares from the accumulators alone
+        residual = self.target_squares - 2 * solution @ self.moment + solution @ self.gram @ solution
+        total = self.target_squares - self.target_sum ** 2 / self.count
+        metrics = {
+            'samples': self.count,
+            'r2': 1 - residual / total if total > 0 else 0.0,
+            'rmse': float(np.sqrt(max(residual, 0.0) / self.count))
+        }
+        return coef, intercept, metrics
+
+
+def chunk_arrays(rows):
+    """
+    Columns of fetched (household_id, timestamp, energy_kwh,
+    future_energy_kwh) rows as arrays, converted through one object array
+    rather than a DataFrame (about half the cost per chunk).
+
+    Returns:
+        tuple: household_ids int64, timestamps datetime64[us], energy
+               float64, future float64 (NaN where empty)
+    """
+    columns = np.array(rows, dtype=object)
+    return (
+        columns[:, 0].astype(np.int64),
+        # SQLite returns 'YYYY-MM-DD HH:MM:SS[.ffffff]' text, PostgreSQL datetimes
+        columns[:, 1].astype('datetime64[us]'),
+        columns[:, 2].astype(np.float64),
+        columns[:, 3].astype(np.float64)
+    )
+
+
+def unseen_readings(state, household_ids, timestamps):
+    """Mask of readings newer than their household's carry (all readings of new households)."""
+    segment_ids, segment = np.unique(household_ids, return_inverse=True)
+    _, _, last_timestamps, _ = state.carry(segment_ids)
+    last_timestamps = last_timestamps[segment]
+    return np.isnat(last_timestamps) | (timestamps > last_timestamps)
+
+
+def chunk_features(state, household_ids, timestamps, energy, future):
+    """
+    Feature rows of one chunk, continuing each household's carry, and
+    advance the carry past the chunk.
+
+    Args:
+        state (TrainingState): Carry is read and updated in place
+        household_ids, timestamps, energy, future (ndarray): Readings sorted
+            by household and time (see chunk_arrays)
+
+    Returns:
+        tuple: (features (n, 10), targets (n,)) of the rows ready to train on
+    """
+    segment_ids = np.unique(household_ids)
+    rows, tails, last_timestamps, pending = state.carry(segment_ids)
+    windows, starts, ends = household_windows(household_ids, energy, tails)
+
+    # Target: future_energy_kwh, else the household's next reading
+    next_energy = np.r_[energy[1:], np.nan]
+    next_energy[ends] = np.nan
+    targets = np.where(np.isnan(future), next_energy, future)
+
+    state.update_carry(
+        segment_ids, rows,
+        windows[ends],
+        timestamps[ends],
+        np.isnan(targets[ends])
+    )
+
+    # A carried reading still waiting for a target gets the household's
+    # first new reading
+    windows = np.concatenate([tails[pending], windows])
+    timestamps = np.concatenate([last_timestamps[pending], timestamps])
+    targets = np.concatenate([energy[starts[pending]], targets])
+
+    ready = ((~np.isnan(windows)).sum(axis=1) >= MIN_HISTORY) & ~np.isnan(targets)
+    return feature_matrix(timestamps[ready], windows[ready]), targets[ready]
+
+
+def linear_model(coef, intercept):
+    """A fitted sklearn LinearRegression with the given parameters."""
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = FEATURE_COUNT
+    return model
+
+
+def accumulate_readings(state, storage, raw_conn, chunk_rows, sql, params=(), carried_ids=None):
+    """
+    Stream the readings of an ORDERED_READINGS query in chunks into the
+    accumulators.
+
+    Args:
+        carried_ids (ndarray): If given, keep only readings of these
+            households that are newer than their carry
+
+    Returns:
+        int: Readings read
+    """
+    cursor = storage.read_cursor(raw_conn, 'training_readings')
+    cursor.execute(sql, params)
+    rows_read = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        rows_read += len(rows)
+        chunk = chunk_arrays(rows)
+        if carried_ids is not None:
+            keep = np.isin(chunk[0], carried_ids) & unseen_readings(state, chunk[0], chunk[1])
+            chunk = tuple(column[keep] for column in chunk)
+        if len(chunk[0]):
+            features, targets = chunk_features(state, *chunk)
+            state.accumulate(features, targets)
+    cursor.close()
+    return rows_read
+
+
+def train_model(engine, model_path, state_path=STATE_PATH, full=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Fit the prediction model from the readings table, continuing the saved
+    state unless `full`, and save the model and state.
+
+    The model file is written under another name and renamed into place,
+    so the running app's model registry picks it up on its next refresh.
+
+    Args:
+        engine: SQLAlchemy engine to read readings from
+        model_path (str): joblib file to write
+        state_path (str): Accumulators and carry from earlier runs
+        full (bool): Ignore the saved state and read every reading
+        chunk_rows (int): Readings per fetchmany() chunk
+
+    Returns:
+        dict: rows read, samples added, samples, r2 and rmse
+
+    Raises:
+        ValueError: If no reading has a target to train on
+    """
+    started = time.perf_counter()
+    state = None if full else TrainingState.load(state_path)
+    if state is None:
+        state = TrainingState()
+    previous_count = state.count
+    since = state.since()
+
+    storage = get_storage(engine)
+    raw_conn = engine.raw_connection()
+    rows_read = 0
+    try:
+        if since is None:
+            rows_read += accumulate_readings(state, storage, raw_conn, chunk_rows, storage.ORDERED_READINGS_SQL)
+        else:
+            # Households in the carry: readings newer than the oldest carry,
+            # of which those newer than the household's own. Households new
+            # since the last run may have readings older than `since`, so
+            # they are read whole afterwards.
+            carried_ids = state.household_ids.copy()
+            rows_read += accumulate_readings(
+                state, storage, raw_conn, chunk_rows, storage.ORDERED_READINGS_SINCE_SQL,
+                storage.timestamp_params([since]), carried_ids
+            )
+            cursor = raw_conn.cursor()
+            cursor.execute(storage.WATERMARK_HOUSEHOLDS_SQL)
+            new_ids = np.setdiff1d(np.array([row[0] for row in cursor.fetchall()], dtype=np.int64), carried_ids)
+            cursor.close()
+            for first in range(0, len(new_ids), IN_LIST_SIZE):
+                batch = [int(household_id) for household_id in new_ids[first:first + IN_LIST_SIZE]]
+                placeholders = ', '.join([storage.PLACEHOLDER] * len(batch))
+                rows_read += accumulate_readings(
+                    state, storage, raw_conn, chunk_rows,
+                    storage.HOUSEHOLD_READINGS_SQL.format(placeholders=placeholders), batch
+                )
+        raw_conn.rollback()
+    finally:
+        raw_conn.close()
+
+    if state.count == 0:
+        raise ValueError('No readings to train on')
+
+    coef, intercept, metrics = state.solve()
+    temp_path = model_path + '.tmp'
+    joblib.dump(linear_model(coef, intercept), temp_path)
+    os.replace(temp_path, model_path)
+    state.save(state_path)
+
+    added = state.count - previous_count
+    print(f"Read {rows_read} readings, trained on {added} new samples "
+          f"({state.count} total) in {time.perf_counter() - started:.2f}s")
+    print(f"R² = {metrics['r2']:.4f}, RMSE = {metrics['rmse'] * 1000:.1f} Wh (in-sample)")
+    for feature, value in zip(FEATURE_COLUMNS, coef):
+        print(f"  {feature}: {value:.4f}")
+    print(f"  Intercept: {intercept:.4f}")
+    print(f"Model saved to {model_path}")
+    return dict(metrics, rows=rows_read, added=added)
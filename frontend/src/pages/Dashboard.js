@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import StatCard from '../components/common/StatCard';
 import EnergyUsageChart from '../components/charts/EnergyUsageChart';
-import { getCurrentConsumption, getEnergyUsage, getPredictions, checkBackendStatus } from '../services/api';
+import { getCurrentConsumption, getEnergyUsage, getPredictions, checkBackendStatus, subscribeToLiveUpdates } from '../services/api';
 import { mockCurrentConsumption, mockEnergyUsage, mockPredictions, mockQuickStats } from '../utils/mockData';
 import { formatCurrency, formatPower, formatDateTime } from '../utils/formatters';
 import './Dashboard.css';
@@ -25,6 +25,16 @@ const Dashboard = () => {
     }
   }, [timeRange, backendAvailable]);
 
+  // Push updates of current consumption instead of polling
+  useEffect(() => {
+    if (!backendAvailable) return undefined;
+    return subscribeToLiveUpdates({
+      onCurrent: (current) => {
+        setQuickStats((stats) => ({ ...stats, currentConsumption: current.current }));
+      }
+    });
+  }, [backendAvailable]);
+
   const checkBackend = async () => {
     const isAvailable = await checkBackendStatus();
     setBackendAvailable(isAvailable);
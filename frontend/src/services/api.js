@@ -134,4 +134,35 @@ export const getHistoricalUsage = async (params = {}) => {
   }
 };
 
+// Live updates (Server-Sent Events)
+// handlers: { onReadings, onCurrent, onSuggestions, onError }
+// Returns a function that closes the stream.
+export const subscribeToLiveUpdates = (handlers = {}) => {
+  if (typeof EventSource === 'undefined') {
+    return () => {};
+  }
+
+  const source = new EventSource(`${API_BASE_URL}/v1/stream`);
+  const listen = (eventName, handler) => {
+    if (!handler) return;
+    source.addEventListener(eventName, (event) => {
+      try {
+        handler(JSON.parse(event.data));
+      } catch (error) {
+        console.error(`Error handling ${eventName} event:`, error);
+      }
+    });
+  };
+
+  listen('readings', handlers.onReadings);
+  listen('current', handlers.onCurrent);
+  listen('suggestions', handlers.onSuggestions);
+  source.onerror = (error) => {
+    // EventSource reconnects on its own; just report
+    if (handlers.onError) handlers.onError(error);
+  };
+
+  return () => source.close();
+};
+
 export default api;